@@ -0,0 +1,40 @@
+document.addEventListener("DOMContentLoaded", function () {
+    const kindSelect = document.getElementById("conditionKind");
+    const termInput = document.getElementById("conditionTerm");
+    const suggestions = document.getElementById("conditionSuggestions");
+
+    if (!kindSelect || !termInput || !suggestions) {
+        return;
+    }
+
+    let pending = null;
+
+    // Fetch suggestions from the server-side trie as the user types
+    termInput.addEventListener("input", function () {
+        clearTimeout(pending);
+        const prefix = termInput.value.trim();
+        if (prefix === "") {
+            suggestions.innerHTML = "";
+            return;
+        }
+
+        pending = setTimeout(async function () {
+            const params = new URLSearchParams({ kind: kindSelect.value, q: prefix });
+            try {
+                const response = await fetch(`/terms/autocomplete?${params}`);
+                if (!response.ok) {
+                    return;
+                }
+                const data = await response.json();
+                suggestions.innerHTML = "";
+                data.suggestions.forEach(function (name) {
+                    const option = document.createElement("option");
+                    option.value = name;
+                    suggestions.appendChild(option);
+                });
+            } catch (error) {
+                console.error("Error fetching suggestions:", error);
+            }
+        }, 150);
+    });
+});
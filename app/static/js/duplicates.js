@@ -0,0 +1,60 @@
+document.addEventListener("DOMContentLoaded", function () {
+    const warning = document.getElementById("duplicateWarning");
+    const form = warning && warning.closest("form");
+
+    if (!form) {
+        return;
+    }
+
+    // Form inputs and the fields the duplicate check reads from them
+    const fields = {
+        first_name: "first_name",
+        last_name: "last_name",
+        birth_date: "birth_date",
+        health_insurance_number: "health_insurance_number",
+        email: "email_address",
+        phone_number: "phone_number",
+    };
+
+    let pending = null;
+
+    // Ask the server for likely duplicates once the doctor pauses typing
+    form.addEventListener("input", function (event) {
+        if (!(event.target.name in fields)) {
+            return;
+        }
+        clearTimeout(pending);
+
+        pending = setTimeout(async function () {
+            const params = new URLSearchParams();
+            Object.entries(fields).forEach(function ([input, field]) {
+                const value = form.elements[input].value.trim();
+                if (value !== "") {
+                    params.append(field, value);
+                }
+            });
+            try {
+                const response = await fetch(`/patients/duplicates?${params}`);
+                if (!response.ok) {
+                    return;
+                }
+                const data = await response.json();
+                warning.innerHTML = "";
+                warning.classList.toggle("d-none", data.duplicates.length === 0);
+                if (data.duplicates.length === 0) {
+                    return;
+                }
+                warning.append("This patient may already be registered: ");
+                data.duplicates.forEach(function (patient, index) {
+                    const link = document.createElement("a");
+                    link.href = patient.url;
+                    link.textContent = `${patient.first_name} ${patient.last_name}`
+                        + ` (${patient.birth_date})`;
+                    warning.append(index ? ", " : "", link);
+                });
+            } catch (error) {
+                console.error("Error checking for duplicates:", error);
+            }
+        }, 400);
+    });
+});
@@ -44,28 +44,79 @@ function initMain() {
         });
 
         // Calendar
-        const today = new Date();
-        const currentMonth = today.getMonth();
-        const currentYear = today.getFullYear();
-
-        $('#calendar-prev').datetimepicker({
-            viewDate: new Date(currentYear, currentMonth - 1, 1),
-            format: 'L',
-            inline: true,
-            useCurrent: false
-        });
+        // Only pages with calendars (the dashboard) load tempusdominus, so
+        // skip the setup everywhere else
+        const calendars = $("#calendar-prev, #calendar-current, #calendar-next");
+        if (calendars.length && $.fn.datetimepicker) {
+            initCalendars();
+        }
 
-        $('#calendar-current').datetimepicker({
-            format: 'L',
-            inline: true
-        });
+        function initCalendars() {
+            const today = new Date();
+            const currentMonth = today.getMonth();
+            const currentYear = today.getFullYear();
 
-        $('#calendar-next').datetimepicker({
-            viewDate: new Date(currentYear, currentMonth + 1, 1),
-            format: 'L',
-            inline: true,
-            useCurrent: false
-        });
+            $('#calendar-prev').datetimepicker({
+                viewDate: new Date(currentYear, currentMonth - 1, 1),
+                format: 'L',
+                inline: true,
+                useCurrent: false
+            });
+
+            $('#calendar-current').datetimepicker({
+                format: 'L',
+                inline: true
+            });
+
+            $('#calendar-next').datetimepicker({
+                viewDate: new Date(currentYear, currentMonth + 1, 1),
+                format: 'L',
+                inline: true,
+                useCurrent: false
+            });
+
+            markAppointments(calendars, new Date(currentYear, currentMonth - 5, 1),
+                new Date(currentYear, currentMonth + 6, 1));
+        }
+
+        // Highlight days with appointments. The calendars redraw their days
+        // when paging through months, so the marks are put back after each
+        // redraw.
+        async function markAppointments(containers, from, to) {
+            const month = (date) => moment(date).format("YYYY-MM");
+            let days;
+            try {
+                const response = await fetch(
+                    `/appointments/calendar?from=${month(from)}&to=${month(to)}`);
+                if (!response.ok) {
+                    return;
+                }
+                days = (await response.json()).days;
+            } catch (error) {
+                console.error("Error fetching appointments:", error);
+                return;
+            }
+
+            const byDataDay = {};
+            Object.entries(days).forEach(([day, count]) => {
+                byDataDay[moment(day, "YYYY-MM-DD").format("L")] = count;
+            });
+
+            const mark = (container) => {
+                container.querySelectorAll("td.day[data-day]").forEach((cell) => {
+                    const count = byDataDay[cell.dataset.day];
+                    cell.classList.toggle("has-appointments", Boolean(count));
+                    if (count) {
+                        cell.title = `${count} appointment${count > 1 ? "s" : ""}`;
+                    }
+                });
+            };
+            containers.each(function () {
+                mark(this);
+                new MutationObserver(() => mark(this))
+                    .observe(this, { childList: true, subtree: true });
+            });
+        }
     })(jQuery);
 
     // POPUPS
@@ -222,6 +273,21 @@ function initMain() {
 
     passwordInput?.addEventListener("input", checkPasswordStrength);
 
+    // Service Worker: offline shell, instant repeat visits, queued registrations
+    if ("serviceWorker" in navigator) {
+        navigator.serviceWorker.register("/sw.js");
+
+        window.addEventListener("online", function () {
+            navigator.serviceWorker.controller?.postMessage("replay-queue");
+        });
+
+        navigator.serviceWorker.addEventListener("message", function (event) {
+            if (event.data?.type === "register-patient-synced") {
+                alert(event.data.count + " patient(s) saved while offline have now been registered.");
+            }
+        });
+    }
+
     // Get Current Year
     const currentYearElement = document.getElementById("currentYear");
     if (currentYearElement) {
@@ -0,0 +1,232 @@
+// Service worker, served from /sw.js with PRECACHE and VERSION prepended.
+//
+// - The static shell (stylesheets, scripts, images) is precached on install
+//   and served cache-first.
+// - The dashboard and patient list are served stale-while-revalidate: the
+//   cached page renders at once while a fresh copy is fetched for next time.
+// - Patient registrations submitted while offline are queued in IndexedDB
+//   and replayed by background sync (or when the page reports it is online).
+//   Each entry carries the doctor who submitted it, and the server refuses
+//   it under anyone else's session.
+//
+// Cached pages contain patient data, so they are dropped on every write,
+// on sign-in and on logout. Logging out also drops the queue.
+
+const SHELL_CACHE = `shell-${VERSION}`;
+const PAGE_CACHE = "pages";
+const RUNTIME_CACHE = "runtime";
+const SWR_PAGES = ["/dashboard", "/my-patients"];
+const QUEUE_DB = "medixbridge-offline";
+const QUEUE_STORE = "register-patient";
+const SYNC_TAG = "register-patient";
+
+self.addEventListener("install", (event) => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then((cache) => cache.addAll(PRECACHE))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener("activate", (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((keys) => Promise.all(
+                keys
+                    .filter((key) => key.startsWith("shell-") && key !== SHELL_CACHE)
+                    .map((key) => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+            .then(replayQueue)
+    );
+});
+
+self.addEventListener("fetch", (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        // Versioned CDN libraries never change under the same URL
+        if (request.method === "GET") {
+            event.respondWith(cacheFirst(request, RUNTIME_CACHE));
+        }
+        return;
+    }
+
+    if (request.method !== "GET") {
+        if (url.pathname === "/register-patient") {
+            event.respondWith(submitOrQueue(request));
+        } else {
+            event.respondWith(fetchAndDropPages(request));
+        }
+        return;
+    }
+
+    if (url.pathname === "/logout") {
+        event.respondWith(
+            Promise.all([caches.delete(PAGE_CACHE), clearQueue()]).then(() => fetch(request))
+        );
+    } else if (PRECACHE.includes(url.pathname) || url.pathname.startsWith("/static/dist/")) {
+        event.respondWith(cacheFirst(request, SHELL_CACHE));
+    } else if (SWR_PAGES.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, request));
+    }
+});
+
+self.addEventListener("sync", (event) => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(replayQueue());
+    }
+});
+
+self.addEventListener("message", (event) => {
+    if (event.data === "replay-queue") {
+        event.waitUntil(replayQueue());
+    }
+});
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+function cacheable(response) {
+    // Logged-out visits are redirected to the sign-in page; never keep those,
+    // nor pages showing one-off messages (no-store)
+    return response.ok && !response.redirected && response.type === "basic"
+        && !(response.headers.get("Cache-Control") || "").includes("no-store");
+}
+
+async function staleWhileRevalidate(event, request) {
+    const cache = await caches.open(PAGE_CACHE);
+    const cached = await cache.match(request);
+    const network = fetch(request).then(async (response) => {
+        if (cacheable(response)) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    });
+
+    if (cached) {
+        event.waitUntil(network.catch(() => undefined));
+        return cached;
+    }
+    return network;
+}
+
+async function fetchAndDropPages(request) {
+    const response = await fetch(request);
+    // Any write (or sign-in) can change what the cached pages show
+    await caches.delete(PAGE_CACHE);
+    return response;
+}
+
+async function submitOrQueue(request) {
+    const queued = request.clone();
+    try {
+        return await fetchAndDropPages(request);
+    } catch (error) {
+        const body = await queued.text();
+        await enqueue({
+            body: body,
+            contentType: queued.headers.get("Content-Type"),
+            user: new URLSearchParams(body).get("submitted_by"),
+            queuedAt: Date.now(),
+        });
+        if (self.registration.sync) {
+            await self.registration.sync.register(SYNC_TAG);
+        }
+        return new Response(
+            "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">" +
+            "<title>Saved Offline | MedixBridge</title></head><body>" +
+            "<h3>You are offline</h3><p>The patient has been saved on this device " +
+            "and will be registered automatically when the connection is back.</p>" +
+            "<p><a href=\"/dashboard\">Back to Dashboard</a></p></body></html>",
+            { status: 202, headers: { "Content-Type": "text/html; charset=utf-8" } }
+        );
+    }
+}
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(QUEUE_DB, 1);
+        open.onupgradeneeded = () => {
+            open.result.createObjectStore(QUEUE_STORE, { autoIncrement: true });
+        };
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+function withStore(mode, callback) {
+    return openQueue().then((db) => new Promise((resolve, reject) => {
+        const transaction = db.transaction(QUEUE_STORE, mode);
+        const result = callback(transaction.objectStore(QUEUE_STORE));
+        transaction.oncomplete = () => resolve(result.result);
+        transaction.onerror = () => reject(transaction.error);
+    }));
+}
+
+function enqueue(entry) {
+    return withStore("readwrite", (store) => store.add(entry));
+}
+
+function clearQueue() {
+    return withStore("readwrite", (store) => store.clear());
+}
+
+// Sync, message and activate events can arrive together; one replay at a
+// time, or an entry could be posted twice before it is deleted
+let replaying = null;
+
+function replayQueue() {
+    if (!replaying) {
+        replaying = replayEntries().finally(() => {
+            replaying = null;
+        });
+    }
+    return replaying;
+}
+
+async function replayEntries() {
+    const keys = await withStore("readonly", (store) => store.getAllKeys());
+    let synced = 0;
+    for (const key of keys) {
+        const entry = await withStore("readonly", (store) => store.get(key));
+        let response;
+        try {
+            response = await fetchAndDropPages(new Request("/register-patient", {
+                method: "POST",
+                body: entry.body,
+                headers: { "Content-Type": entry.contentType },
+                credentials: "same-origin",
+            }));
+        } catch (error) {
+            // Still offline; the next sync or online event retries
+            return;
+        }
+        if (response.status === 409) {
+            // Queued by another doctor; kept until they sign in here again
+            continue;
+        }
+        if (!response.ok || new URL(response.url).pathname === "/signin") {
+            // Session expired: keep the entry until the user signs in again
+            return;
+        }
+        await withStore("readwrite", (store) => store.delete(key));
+        synced += 1;
+    }
+
+    if (synced) {
+        const clients = await self.clients.matchAll({ type: "window" });
+        clients.forEach((client) => client.postMessage({ type: "register-patient-synced", count: synced }));
+    }
+}
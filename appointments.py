@@ -0,0 +1,226 @@
+"""Appointments between a doctor and their patients.
+
+Appointments live on the doctor's shard with the patients, in the
+``appointments`` table indexed on ``(doctor_id, starts_at)``. Every query
+is bounded on that index from both sides: an appointment overlaps
+``[start, end)`` when it starts before ``end`` and ends after ``start``,
+and since no appointment is longer than :data:`MAX_DURATION` it must also
+start after ``start - MAX_DURATION``. So a month of the calendar or a
+conflict check reads one short index range, however many years of history
+the doctor has.
+
+The rows of that range are loaded into an :class:`IntervalIndex`, which
+answers the overlap and free-slot questions in memory.
+"""
+
+import bisect
+from datetime import datetime, timedelta
+
+SCHEDULED = "scheduled"
+CANCELLED = "cancelled"
+
+MAX_DURATION = timedelta(hours=8)
+MIN_DURATION = timedelta(minutes=5)
+
+COLUMNS = "id, patient_id, starts_at, ends_at, status, notes"
+
+# Locks the index range read by a booking, gaps included, so a concurrent
+# booking of the same period waits for the first one to commit
+LOCK_CLAUSE = "FOR UPDATE"
+
+
+class IntervalIndex:
+    """Half-open ``[start, end)`` intervals, sorted by start, with overlap
+    queries in ``O(log n + k)``.
+
+    Beside the sorted starts it keeps the running maximum of the ends. That
+    is non-decreasing, so one bisection finds the first interval that could
+    still reach past a given time, and everything before it is skipped.
+    For a schedule, where few intervals nest inside a long one, the
+    intervals left to check are about the ones that overlap.
+    """
+
+    def __init__(self, items=()):
+        """`items` is an iterable of ``(start, end, value)``"""
+        items = sorted(items, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in items]
+        self.ends = [item[1] for item in items]
+        self.values = [item[2] for item in items]
+        self.reach = []
+        self._update_reach(0)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _update_reach(self, i):
+        del self.reach[i:]
+        reach = self.reach[-1] if self.reach else None
+        for end in self.ends[i:]:
+            reach = end if reach is None or end > reach else reach
+            self.reach.append(reach)
+
+    def add(self, start, end, value=None):
+        """Insert one interval, keeping the order"""
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.values.insert(i, value)
+        self._update_reach(i)
+
+    def overlapping(self, start, end):
+        """``(start, end, value)`` of every interval overlapping
+        ``[start, end)``, by start"""
+        # Intervals from `first` on may end after `start`; those before
+        # `last` start before `end`
+        first = bisect.bisect_right(self.reach, start)
+        last = bisect.bisect_left(self.starts, end)
+        return [
+            (self.starts[i], self.ends[i], self.values[i])
+            for i in range(first, last)
+            if self.ends[i] > start
+        ]
+
+    def busy(self, start, end):
+        """Merged busy periods within ``[start, end)``"""
+        merged = []
+        for s, e, _ in self.overlapping(start, end):
+            s, e = max(s, start), min(e, end)
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        return [tuple(period) for period in merged]
+
+    def free_slots(self, start, end, duration, step=None):
+        """Start times of free ``duration`` slots in ``[start, end)``.
+
+        Slots start on multiples of `step` (default `duration`) from
+        `start`, so they line up however the busy periods fall.
+        """
+        step = step or duration
+        slots = []
+        cursor = start
+        for busy_start, busy_end in [*self.busy(start, end), (end, end)]:
+            while cursor + duration <= busy_start:
+                slots.append(cursor)
+                cursor += step
+            if busy_end > cursor:
+                # Round up to the next slot boundary after the busy period
+                cursor += -((cursor - busy_end) // step) * step
+        return slots
+
+
+def month_bounds(first, last):
+    """``[start, end)`` datetimes from the start of month `first` to the
+    end of month `last`, both ``date`` objects"""
+    start = datetime(first.year, first.month, 1)
+    year, month = divmod(last.year * 12 + last.month, 12)
+    return start, datetime(year, month + 1, 1)
+
+
+def fetch(cur, doctor_id, start, end, lock=False):
+    """A doctor's scheduled appointments overlapping ``[start, end)``.
+
+    With `lock`, the range stays locked until the transaction ends.
+    """
+    cur.execute(
+        f"""
+        SELECT {COLUMNS} FROM appointments
+        WHERE doctor_id = %s AND starts_at > %s AND starts_at < %s
+          AND ends_at > %s AND status = %s
+        ORDER BY starts_at
+        {LOCK_CLAUSE if lock else ""}
+        """,
+        (doctor_id, start - MAX_DURATION, end, start, SCHEDULED),
+    )
+    return cur.fetchall()
+
+
+def load_index(cur, doctor_id, start, end, lock=False):
+    """:class:`IntervalIndex` of the appointments overlapping ``[start, end)``"""
+    return IntervalIndex(
+        (row["starts_at"], row["ends_at"], row)
+        for row in fetch(cur, doctor_id, start, end, lock)
+    )
+
+
+def validate(starts_at, ends_at):
+    """Reason an appointment time is unacceptable, or ``None``"""
+    if ends_at - starts_at < MIN_DURATION:
+        return f"Appointments must last at least {MIN_DURATION.seconds // 60} minutes."
+    if ends_at - starts_at > MAX_DURATION:
+        return (
+            f"Appointments cannot last longer than "
+            f"{MAX_DURATION.seconds // 3600} hours."
+        )
+    return None
+
+
+def book(cur, doctor_id, patient_id, starts_at, ends_at, notes=None):
+    """Insert an appointment unless it overlaps another one.
+
+    Returns ``(appointment_id, [])`` on success and ``(None, conflicts)``
+    otherwise. The overlap check and the insert must run in the same
+    transaction, which the caller commits.
+    """
+    index = load_index(cur, doctor_id, starts_at, ends_at, lock=True)
+    conflicts = [value for _, _, value in index.overlapping(starts_at, ends_at)]
+    if conflicts:
+        return None, conflicts
+    now = datetime.now()
+    cur.execute(
+        """
+        INSERT INTO appointments
+        (doctor_id, patient_id, starts_at, ends_at, status, notes, created_at,
+         updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (doctor_id, patient_id, starts_at, ends_at, SCHEDULED, notes, now, now),
+    )
+    return cur.lastrowid, []
+
+
+def cancel(cur, doctor_id, appointment_id):
+    """Cancel a scheduled appointment; returns whether there was one"""
+    cur.execute(
+        """
+        UPDATE appointments SET status = %s, updated_at = %s
+        WHERE id = %s AND doctor_id = %s AND status = %s
+        """,
+        (CANCELLED, datetime.now(), appointment_id, doctor_id, SCHEDULED),
+    )
+    return cur.rowcount > 0
+
+
+def calendar(index, start, end):
+    """Appointments per day within ``[start, end)``, for the calendars.
+
+    Returns ``{"YYYY-MM-DD": count}``; an appointment spanning midnight
+    counts on each of its days.
+    """
+    days = {}
+    for s, e, _ in index.overlapping(start, end):
+        day = max(s, start).date()
+        # Ends are exclusive, so one ending at midnight is not on the next day
+        last = (min(e, end) - timedelta(microseconds=1)).date()
+        while day <= last:
+            days[day.isoformat()] = days.get(day.isoformat(), 0) + 1
+            day += timedelta(days=1)
+    return days
+
+
+def serialize(row):
+    """JSON-friendly appointment"""
+    return {
+        "id": row["id"],
+        "patient_id": row["patient_id"],
+        "starts_at": row["starts_at"].isoformat(timespec="minutes"),
+        "ends_at": row["ends_at"].isoformat(timespec="minutes"),
+        "status": row["status"],
+        "notes": row["notes"],
+    }
+
+
+def parse_month(value):
+    """``date`` of the first day of a ``YYYY-MM`` month"""
+    return datetime.strptime(value, "%Y-%m").date()
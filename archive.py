@@ -0,0 +1,143 @@
+"""Archiving inactive patients out of ``patients_db``.
+
+``patients_archive`` has the same columns as ``patients_db``. Patients
+not updated since the cutoff and with no appointment since then are moved
+there, attachment included, by ``flask archive-patients``. Pages listing
+and searching patients only read ``patients_db``, which stays the size of
+the active caseload. Opening an archived patient moves it back with
+:func:`restore`. Rows are copied by their stored columns, since MySQL
+refuses values for the generated ``bmi``.
+
+An archived patient leaves the dashboard counters and returns to them on
+restore. Its clinical term links stay in place; condition search joins
+them to ``patients_db`` and so skips archived patients.
+"""
+
+from datetime import datetime, timedelta
+
+import records
+import schema
+import stats
+import sync
+
+# Locks the candidates so an edit racing the archiver waits for it; the
+# edit then finds the patient archived and restores it
+LOCK_CLAUSE = "FOR UPDATE"
+
+
+def _ids_clause(ids):
+    return f"({', '.join(['%s'] * len(ids))})"
+
+
+def archive_inactive(
+    connection, cutoff, chunk_size=500, skip_doctors=frozenset(), log=print
+):
+    """Archive patients of one shard inactive since `cutoff`.
+
+    Walks ``patients_db`` in primary key order and commits per chunk, so it
+    can run against a live database. Doctors in `skip_doctors` (being moved
+    to another shard) are left alone. Returns the number of patients moved.
+    """
+    cur = connection.cursor()
+    done = last_id = 0
+    try:
+        columns = ", ".join(schema.stored_columns(cur, "patients_db"))
+        while True:
+            cur.execute(
+                f"""
+                SELECT p.id, p.doctor_id, {", ".join(stats.STATS_FIELDS)}
+                FROM patients_db p
+                WHERE p.id > %s AND p.updated_at < %s AND p.deleted_at IS NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM appointments a
+                      WHERE a.doctor_id = p.doctor_id AND a.patient_id = p.id
+                        AND a.ends_at >= %s
+                  )
+                ORDER BY p.id LIMIT %s
+                {LOCK_CLAUSE}
+                """,
+                (last_id, cutoff, cutoff, chunk_size),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                connection.commit()
+                return done
+            last_id = rows[-1]["id"]
+            rows = [row for row in rows if row["doctor_id"] not in skip_doctors]
+            if rows:
+                ids = [row["id"] for row in rows]
+                cur.execute(
+                    f"INSERT INTO patients_archive ({columns}) "
+                    f"SELECT {columns} FROM patients_db "
+                    f"WHERE id IN {_ids_clause(ids)}",
+                    ids,
+                )
+                cur.execute(
+                    f"DELETE FROM patients_db WHERE id IN {_ids_clause(ids)}", ids
+                )
+                for row in rows:
+                    stats.record_deleted(cur, row["doctor_id"], row)
+                # Sync clients drop archived patients like deleted ones
+                sync.record_deleted(
+                    cur, [(row["doctor_id"], row["id"]) for row in rows]
+                )
+            connection.commit()
+            done += len(rows)
+            log(f"Archived {done} patients.")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def restore(cur, doctor_id, patient_id):
+    """Move an archived patient back; returns whether it was archived.
+
+    Runs inside the caller's transaction on the doctor's shard.
+    """
+    cur.execute(
+        f"""
+        SELECT id, {", ".join(stats.STATS_FIELDS)} FROM patients_archive
+        WHERE id = %s AND doctor_id = %s
+        {LOCK_CLAUSE}
+        """,
+        (patient_id, doctor_id),
+    )
+    row = cur.fetchone()
+    if not row:
+        return False
+    columns = ", ".join(schema.stored_columns(cur, "patients_db"))
+    cur.execute(
+        f"INSERT INTO patients_db ({columns}) "
+        f"SELECT {columns} FROM patients_archive WHERE id = %s",
+        (patient_id,),
+    )
+    # Counts as activity, so the next archiving run leaves it alone, and
+    # sync clients receive the patient again
+    cur.execute(
+        "UPDATE patients_db SET updated_at = NOW() WHERE id = %s", (patient_id,)
+    )
+    cur.execute("DELETE FROM patients_archive WHERE id = %s", (patient_id,))
+    sync.forget_deleted(cur, doctor_id, patient_id)
+    stats.apply_delta(cur, doctor_id, stats.patient_buckets(row), 1)
+    return True
+
+
+def cutoff_for(inactive_days, now=None):
+    """Last-activity time before which patients are archived"""
+    return (now or datetime.now()) - timedelta(days=inactive_days)
+
+
+def list_archived(cur, doctor_id):
+    """A doctor's archived patients, as My Patients rows"""
+    cur.execute(
+        """
+        SELECT id AS patient_id, first_name, last_name, birth_date, gender,
+               email_address, health_insurance_number
+        FROM patients_archive
+        WHERE doctor_id = %s
+        """,
+        (doctor_id,),
+    )
+    return records.fetch_records(cur, records.PatientListRow)
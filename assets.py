@@ -0,0 +1,671 @@
+"""Front-end asset build: purged stylesheets and per-page critical CSS.
+
+``flask build-assets`` scans the templates, the scripts that toggle classes
+and ``frontend/index.html`` for the selectors they use, and writes
+
+* one purged, minified, content-hashed stylesheet for the app and one for
+  the static homepage, containing only rules whose classes, ids and tags
+  occur somewhere in those sources;
+* per page, the subset of those rules that match the first
+  ``CRITICAL_ELEMENTS`` elements of the body (the sidebar, navbar and top
+  of the content), which is inlined in a ``<style>`` tag so the page can
+  render before the full stylesheet, which is then loaded asynchronously.
+
+It also bundles the scripts each template lists in its
+``{{ scripts(...) }}`` call into one minified, content-hashed file per page.
+
+The app picks the build up through :class:`Assets`; without a build the
+templates fall back to the original stylesheets and scripts.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from html.parser import HTMLParser
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+CRITICAL_ELEMENTS = 150
+
+APP_STYLESHEETS = ("app/static/css/bootstrap.min.css", "app/static/css/styles.css")
+APP_TEMPLATES = "app/templates"
+APP_SCRIPTS = "app/static/js"
+APP_DIST = "app/static/dist"
+
+# Images in the sidebar and tab of every page
+SHELL_IMAGES = ["img/logo.png", "img/favicon.png"]
+
+FRONTEND = "frontend"
+FRONTEND_PURGED = ("css/bootstrap.min.css", "css/bootstrap-icons.css", "css/styles.css")
+# Carousel markup is generated by owl.carousel.js, so these are kept whole
+FRONTEND_KEPT = ("css/owl.carousel.min.css", "css/owl.theme.default.min.css")
+FRONTEND_SCRIPTS = ("js/custom.js",)
+FRONTEND_DIST = "frontend/dist"
+
+# State classes added at runtime by Bootstrap's collapse, dropdown and
+# carousel plugins, and classes built from template variables
+# (``alert-{{ category }}``)
+SAFELIST = re.compile(
+    r"^(show|showing|hiding|fade|active|disabled|collapsing|pointer-event"
+    r"|carousel-item-(start|end|next|prev)|dropdown-menu-(start|end)"
+    r"|was-validated|is-valid|is-invalid|alert-\w+)$"
+)
+
+# Block at-rules whose content is a list of rules to purge recursively
+_NESTED_AT_RULES = ("@media", "@supports", "@layer", "@container")
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_JINJA_BLOCK = re.compile(r"{%.*?%}|{#.*?#}", re.DOTALL)
+_JINJA_EXPRESSION = re.compile(r"{{.*?}}", re.DOTALL)
+_WORD = re.compile(r"[A-Za-z0-9_-]+")
+_PSEUDO = re.compile(r"::?[A-Za-z-]+(\((?:[^()]|\([^()]*\))*\))?")
+_ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+_CLASS = re.compile(r"\.(-?[_A-Za-z][\w-]*)")
+_ID = re.compile(r"#(-?[_A-Za-z][\w-]*)")
+_TAG = re.compile(r"(?:^|[\s>+~(])([A-Za-z][\w-]*)")
+_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_KEYFRAMES = re.compile(r"@(?:-\w+-)?keyframes\s+([\w-]+)")
+_SCRIPTS_CALL = re.compile(r"{{\s*scripts\(([^)]*)\)\s*}}")
+_STRING_LITERAL = re.compile(r"[\"']([^\"']+)[\"']")
+_FONT_FAMILY = re.compile(r"font-family\s*:\s*['\"]?([^;'\",}!]+)")
+_STRING = re.compile(r"(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')")
+
+# "Fast 3G" as modelled by browser dev tools, for the first render estimate
+MODEL_RTT = 0.5625
+MODEL_BANDWIDTH = 1.44e6 / 8
+
+
+def _skip_string(css, pos):
+    quote = css[pos]
+    pos += 1
+    while pos < len(css) and css[pos] != quote:
+        pos += 2 if css[pos] == "\\" else 1
+    return pos + 1
+
+
+def _read_prelude(css, pos):
+    """Text up to the next ``{``, ``;`` or ``}`` outside strings"""
+    start = pos
+    while pos < len(css):
+        char = css[pos]
+        if char in "'\"":
+            pos = _skip_string(css, pos)
+            continue
+        if char in "{;}":
+            return css[start:pos], pos, char
+        pos += 1
+    return css[start:], pos, None
+
+
+def _read_block(css, pos):
+    """Body of the block opened at `pos` - 1, and the position after it"""
+    start, depth = pos, 1
+    while pos < len(css):
+        char = css[pos]
+        if char in "'\"":
+            pos = _skip_string(css, pos)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if not depth:
+                return css[start:pos], pos + 1
+        pos += 1
+    return css[start:], pos
+
+
+def parse_css(css):
+    """Parse a stylesheet into nodes.
+
+    Nodes are ``("rule", selectors, body)``, ``("block", prelude,
+    children)`` for ``@media`` and friends, ``("at", prelude, body)`` for
+    other block at-rules and ``("statement", text)`` for ``@import`` and
+    ``@charset``.
+    """
+    return _parse(_COMMENT.sub("", css), 0)[0]
+
+
+def _parse(css, pos):
+    nodes = []
+    while pos < len(css):
+        prelude, pos, stop = _read_prelude(css, pos)
+        prelude = prelude.strip()
+        if stop is None:
+            break
+        pos += 1
+        if stop == "}":
+            return nodes, pos
+        if stop == ";":
+            if prelude:
+                nodes.append(("statement", prelude))
+        elif prelude.startswith(_NESTED_AT_RULES):
+            children, pos = _parse(css, pos)
+            nodes.append(("block", prelude, children))
+        else:
+            body, pos = _read_block(css, pos)
+            kind = "at" if prelude.startswith("@") else "rule"
+            nodes.append((kind, prelude, body))
+    return nodes, pos
+
+
+def split_selectors(selectors):
+    """Split a selector list on commas outside parentheses"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(selectors):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and not depth:
+            parts.append(selectors[start:i].strip())
+            start = i + 1
+    parts.append(selectors[start:].strip())
+    return [part for part in parts if part]
+
+
+def selector_used(selector, tokens, safelist=SAFELIST):
+    """Whether every class, id and tag in `selector` occurs in `tokens`
+    (classes may also match `safelist`).
+
+    Pseudo-classes and attribute selectors are ignored, so a rule is kept
+    when the element it targets can exist, whatever state it is in.
+    Escaped selectors are always kept.
+    """
+    if "\\" in selector:
+        return True
+    core = _ATTRIBUTE.sub("", _PSEUDO.sub("", selector))
+    for name in _CLASS.findall(core):
+        if name not in tokens and not (safelist and safelist.match(name)):
+            return False
+    for name in _ID.findall(core):
+        if name not in tokens:
+            return False
+    core = _CLASS.sub("", _ID.sub("", core))
+    return all(tag.lower() in tokens for tag in _TAG.findall(core))
+
+
+def purge(nodes, tokens, drop_media=(), safelist=SAFELIST):
+    """Nodes with only the selectors used according to `tokens`.
+
+    ``@keyframes`` and ``@font-face`` rules are kept when a kept rule
+    refers to them. Blocks whose prelude contains one of `drop_media` (such
+    as ``print``) are left out.
+    """
+    kept = _purge(nodes, tokens, drop_media, safelist)
+    text = serialize([node for node in kept if node[0] != "at"])
+    animations = set(_WORD.findall(text))
+    fonts = {name.strip() for name in _FONT_FAMILY.findall(text)}
+    return [node for node in kept if _at_rule_used(node, animations, fonts)]
+
+
+def _purge(nodes, tokens, drop_media, safelist):
+    kept = []
+    for node in nodes:
+        if node[0] == "rule":
+            selectors = [
+                selector
+                for selector in split_selectors(node[1])
+                if selector_used(selector, tokens, safelist)
+            ]
+            if selectors:
+                kept.append(("rule", ",".join(selectors), node[2]))
+        elif node[0] == "block":
+            if any(media in node[1] for media in drop_media):
+                continue
+            children = _purge(node[2], tokens, drop_media, safelist)
+            if children:
+                kept.append(("block", node[1], children))
+        else:
+            kept.append(node)
+    return kept
+
+
+def _at_rule_used(node, animations, fonts):
+    if node[0] != "at":
+        return True
+    keyframes = _KEYFRAMES.match(node[1])
+    if keyframes:
+        return keyframes.group(1) in animations
+    if node[1].startswith("@font-face"):
+        family = _FONT_FAMILY.search(node[2])
+        return not family or family.group(1).strip() in fonts
+    return True
+
+
+def _minify_body(body):
+    # Odd parts are string literals, which are left untouched
+    parts = _STRING.split(body)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s*([;:{},])\s*", r"\1", re.sub(r"\s+", " ", parts[i]))
+    return "".join(parts).strip().rstrip(";")
+
+
+def _minify_prelude(prelude):
+    prelude = re.sub(r"\s+", " ", prelude).strip()
+    return re.sub(r"\s*([,>])\s*", r"\1", prelude)
+
+
+def serialize(nodes):
+    """Minified CSS text for parsed nodes"""
+    out = []
+    for node in nodes:
+        if node[0] == "statement":
+            out.append(_minify_prelude(node[1]) + ";")
+        elif node[0] == "block":
+            out.append(f"{_minify_prelude(node[1])}{{{serialize(node[2])}}}")
+        elif node[0] == "at" and _KEYFRAMES.match(node[1]):
+            # Keyframe selectors (from, 50%) are kept as written
+            out.append(f"{_minify_prelude(node[1])}{{{serialize(parse_css(node[2]))}}}")
+        else:
+            out.append(f"{_minify_prelude(node[1])}{{{_minify_body(node[2])}}}")
+    return "".join(out)
+
+
+def rebase_urls(css, source_dir, target_dir):
+    """Rewrite relative ``url()`` references of a stylesheet moved from
+    `source_dir` to `target_dir`"""
+
+    def rebase(match):
+        url = match.group(2).strip()
+        if re.match(r"^(data:|[a-z]+://|/|#)", url):
+            return match.group(0)
+        path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+        target = os.path.relpath(os.path.join(source_dir, path), target_dir)
+        return f'url("{target.replace(os.sep, "/")}{suffix}")'
+
+    return _URL.sub(rebase, css)
+
+
+def strip_jinja(html):
+    """Template source with Jinja tags removed and expressions blanked"""
+    return _JINJA_EXPRESSION.sub(" ", _JINJA_BLOCK.sub(" ", html))
+
+
+def used_tokens(texts):
+    """Every word in `texts` that could be a class, id or tag name.
+
+    Deliberately broad: a word that only appears in a script string or a
+    comment still counts, which keeps classes toggled from JavaScript.
+    """
+    tokens = {"html", "body"}
+    for text in texts:
+        tokens.update(_WORD.findall(text))
+        tokens.update(word.lower() for word in _WORD.findall(text))
+    return tokens
+
+
+class _AboveTheFold(HTMLParser):
+    """Collects tags, classes and ids of the first elements of the body"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.seen = 0
+        self.in_body = False
+        self.tokens = {"html", "body", ":root"}
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.in_body = True
+        if not self.in_body or self.seen >= self.limit:
+            return
+        self.seen += 1
+        self.tokens.add(tag)
+        for name, value in attrs:
+            if name == "class" and value:
+                self.tokens.update(value.split())
+            elif name == "id" and value:
+                self.tokens.add(value)
+
+
+def critical_tokens(html, limit=CRITICAL_ELEMENTS):
+    parser = _AboveTheFold(limit)
+    parser.feed(strip_jinja(html))
+    return parser.tokens
+
+
+def critical_css(nodes, html, limit=CRITICAL_ELEMENTS):
+    """Rules needed to render the top of `html` before the full stylesheet
+    arrives. Runtime state classes are left to the full stylesheet."""
+    tokens = critical_tokens(html, limit)
+    return serialize(purge(nodes, tokens, drop_media=("print",), safelist=None))
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _hashed_name(stem, text):
+    return f"{stem}.{hashlib.sha256(text.encode()).hexdigest()[:10]}.css"
+
+
+def _gzip_size(text):
+    return len(gzip.compress(text.encode(), 9))
+
+
+def _first_render(requests, text):
+    """Modelled seconds until first render: one round trip for the HTML
+    plus one per blocking stylesheet, and the transfer of their bytes"""
+    return MODEL_RTT * (1 + requests) + _gzip_size(text) / MODEL_BANDWIDTH
+
+
+def _bundle(root, paths, target_dir):
+    return "\n".join(
+        rebase_urls(
+            _read(os.path.join(root, path)),
+            os.path.dirname(os.path.join(root, path)),
+            target_dir,
+        )
+        for path in paths
+    )
+
+
+def _async_stylesheet(href):
+    return (
+        f'<link rel="preload" href="{href}" as="style" '
+        "onload=\"this.onload=null;this.rel='stylesheet'\">"
+        f'<noscript><link rel="stylesheet" href="{href}"></noscript>'
+    )
+
+
+def _report_row(page, before, critical, async_bytes, blocking_requests):
+    return {
+        "page": page,
+        "before_bytes": len(before.encode()),
+        "after_blocking_bytes": len(critical.encode()),
+        "after_async_bytes": async_bytes,
+        "before_first_render": round(_first_render(blocking_requests, before), 3),
+        "after_first_render": round(_first_render(0, critical), 3),
+    }
+
+
+def build_app_css(root, manifest):
+    """Purged app stylesheet and critical CSS per template"""
+    dist = os.path.join(root, APP_DIST)
+    css_dir = os.path.join(dist, "css")
+    original = _bundle(root, APP_STYLESHEETS, css_dir)
+
+    template_dir = os.path.join(root, APP_TEMPLATES)
+    pages = {
+        name: _read(os.path.join(template_dir, name))
+        for name in sorted(os.listdir(template_dir))
+        if name.endswith(".html")
+    }
+    script_dir = os.path.join(root, APP_SCRIPTS)
+    scripts = [
+        _read(os.path.join(script_dir, name))
+        for name in sorted(os.listdir(script_dir))
+        if name.endswith(".js")
+    ]
+    nodes = purge(
+        parse_css(original),
+        used_tokens([strip_jinja(html) for html in pages.values()] + scripts),
+    )
+    purged = serialize(nodes)
+    stylesheet = _hashed_name("app", purged)
+    _write(os.path.join(css_dir, stylesheet), purged)
+
+    manifest["css"] = {"app": f"dist/css/{stylesheet}"}
+    manifest["critical"] = {}
+    report = []
+    for name, html in pages.items():
+        critical = critical_css(nodes, html)
+        critical_path = f"dist/critical/{name[:-5]}.css"
+        _write(os.path.join(root, "app/static", critical_path), critical)
+        manifest["critical"][name] = critical_path
+        report.append(
+            _report_row(
+                name, original, critical, len(purged.encode()), len(APP_STYLESHEETS)
+            )
+        )
+
+    return report
+
+
+def script_entries(html):
+    """Script paths a template passes to ``{{ scripts(page, *paths) }}``"""
+    match = _SCRIPTS_CALL.search(html)
+    return _STRING_LITERAL.findall(match.group(1))[1:] if match else []
+
+
+def bundle_scripts(sources):
+    """Concatenate and minify scripts.
+
+    Each script runs in its own function scope and an exception in one
+    does not stop the next, as with separate ``<script>`` tags.
+    """
+    # Only needed by the build, so the web app does not import it
+    import rjsmin
+
+    wrapped = [
+        f"try{{(function(){{\n{source}\n}})();}}catch(e){{console.error(e);}}"
+        for source in sources
+    ]
+    return rjsmin.jsmin("\n".join(wrapped))
+
+
+def build_app_js(root, manifest):
+    """One minified, content-hashed script bundle per template"""
+    template_dir = os.path.join(root, APP_TEMPLATES)
+    static_dir = os.path.join(root, "app/static")
+    manifest["js"] = {}
+    report = []
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith(".html"):
+            continue
+        paths = script_entries(_read(os.path.join(template_dir, name)))
+        if not paths:
+            continue
+        sources = [_read(os.path.join(static_dir, path)) for path in paths]
+        bundle = bundle_scripts(sources)
+        digest = hashlib.sha256(bundle.encode()).hexdigest()[:10]
+        # Named after the entries, so pages with the same scripts share a
+        # file (and a browser cache entry)
+        stems = "+".join(os.path.splitext(os.path.basename(p))[0] for p in paths)
+        path = f"dist/js/{stems}.{digest}.js"
+        _write(os.path.join(static_dir, path), bundle)
+        manifest["js"][name] = path
+        report.append(
+            {
+                "page": name,
+                "before_requests": len(paths),
+                "before_bytes": sum(len(source.encode()) for source in sources),
+                "after_bytes": len(bundle.encode()),
+                "after_gzip_bytes": _gzip_size(bundle),
+            }
+        )
+    return report
+
+
+def _relative_to_dist(match):
+    attribute, url = match.group(1), match.group(2)
+    if re.match(r"^([a-z]+:|/|#)", url) or not url:
+        return match.group(0)
+    return f'{attribute}="../{url}"'
+
+
+def build_frontend_css(root):
+    """Homepage with inlined critical CSS, written to ``frontend/dist``"""
+    source = os.path.join(root, FRONTEND)
+    dist = os.path.join(root, FRONTEND_DIST)
+    css_dir = os.path.join(dist, "css")
+    html = _read(os.path.join(source, "index.html"))
+
+    original = _bundle(source, FRONTEND_PURGED, css_dir)
+    scripts = [_read(os.path.join(source, path)) for path in FRONTEND_SCRIPTS]
+    nodes = purge(parse_css(original), used_tokens([html, *scripts]))
+    purged = serialize(nodes) + serialize(
+        parse_css(_bundle(source, FRONTEND_KEPT, css_dir))
+    )
+    stylesheet = _hashed_name("site", purged)
+    _write(os.path.join(css_dir, stylesheet), purged)
+
+    critical = critical_css(nodes, html)
+    local_links = re.compile(r'\s*<link rel="stylesheet" href="css/[^"]+">')
+    page = local_links.sub("", html)
+    page = re.sub(r'\b(href|src)="([^"]*)"', _relative_to_dist, page)
+    page = page.replace(
+        "</head>",
+        f"    <style>{critical}</style>\n"
+        f"    {_async_stylesheet('css/' + stylesheet)}\n</head>",
+        1,
+    )
+    _write(os.path.join(dist, "index.html"), page)
+
+    before = original + _bundle(source, FRONTEND_KEPT, css_dir)
+    blocking = len(FRONTEND_PURGED) + len(FRONTEND_KEPT)
+    return [
+        _report_row(
+            "frontend/index.html", before, critical, len(purged.encode()), blocking
+        )
+    ]
+
+
+def build(root=".", log=print):
+    """Rebuild all assets from scratch and log a before/after report.
+
+    Byte counts are uncompressed unless noted; the first render times are
+    modelled from the gzipped size of the render-blocking CSS on a "Fast
+    3G" connection.
+    """
+    for dist in (APP_DIST, FRONTEND_DIST):
+        shutil.rmtree(os.path.join(root, dist), ignore_errors=True)
+    manifest = {}
+    css = build_app_css(root, manifest) + build_frontend_css(root)
+    js = build_app_js(root, manifest)
+    _write(
+        os.path.join(root, APP_DIST, "manifest.json"), json.dumps(manifest, indent=2)
+    )
+
+    log(
+        f"{'CSS':<24}{'blocking before':>16}{'blocking after':>16}"
+        f"{'async after':>13}{'first render (modelled)':>26}"
+    )
+    for row in css:
+        log(
+            f"{row['page']:<24}{row['before_bytes']:>16,}"
+            f"{row['after_blocking_bytes']:>16,}{row['after_async_bytes']:>13,}"
+            f"{row['before_first_render']:>15.2f}s ->{row['after_first_render']:>6.2f}s"
+        )
+    log(
+        f"{'JS':<24}{'files before':>16}{'bytes before':>16}{'after':>13}{'gzipped':>10}"
+    )
+    for row in js:
+        log(
+            f"{row['page']:<24}{row['before_requests']:>16}{row['before_bytes']:>16,}"
+            f"{row['after_bytes']:>13,}{row['after_gzip_bytes']:>10,}"
+        )
+    return {"css": css, "js": js}
+
+
+class Assets:
+    """Serves the build output to the templates.
+
+    Templates call ``{{ stylesheets("page.html") }}`` in their ``<head>``.
+    With a build, that is the page's critical CSS inline plus the purged
+    stylesheet loaded asynchronously; without one, the original
+    stylesheets. ``{{ scripts("page.html", "js/a.js", ...) }}`` likewise
+    emits the page's bundle, or the listed scripts, all with ``defer``.
+    ``{{ async_stylesheet(url) }}`` links a stylesheet, such as an icon
+    font from a CDN, without blocking the first render.
+
+    :param app: Flask application, see :meth:`init_app`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._manifest = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            "ASSETS_MANIFEST", os.path.join(app.static_folder, "dist", "manifest.json")
+        )
+        app.add_template_global(self.stylesheets, "stylesheets")
+        app.add_template_global(self.scripts, "scripts")
+        app.add_template_global(self.async_stylesheet, "async_stylesheet")
+        app.extensions["assets"] = self
+        self.app = app
+
+    def manifest(self):
+        """The build manifest with critical CSS loaded, or ``{}``"""
+        if self._manifest is None:
+            try:
+                manifest = json.loads(_read(self.app.config["ASSETS_MANIFEST"]))
+            except FileNotFoundError:
+                manifest = {}
+            manifest["critical"] = {
+                page: _read(os.path.join(self.app.static_folder, path))
+                for page, path in manifest.get("critical", {}).items()
+            }
+            self._manifest = manifest
+        return self._manifest
+
+    def precache_paths(self):
+        """The static shell every page needs, relative to the static folder"""
+        manifest = self.manifest()
+        if "css" in manifest:
+            paths = list(manifest["css"].values())
+            paths += sorted(set(manifest.get("js", {}).values()))
+        else:
+            paths = ["css/bootstrap.min.css", "css/styles.css", "js/main.js"]
+        return paths + SHELL_IMAGES
+
+    def service_worker(self):
+        """Source of ``/sw.js`` with the precache list and its version.
+
+        The version changes with the shell files, so browsers install the
+        new worker, which drops the old precache, after every deploy.
+        """
+        paths = self.precache_paths()
+        urls = [url_for("static", filename=path) for path in paths]
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(os.path.join(self.app.static_folder, path), "rb") as f:
+                digest.update(f.read())
+        source = _read(os.path.join(self.app.static_folder, "js", "sw.js"))
+        digest.update(source.encode())
+        return (
+            f"const PRECACHE = {json.dumps(urls)};\n"
+            f'const VERSION = "{digest.hexdigest()[:10]}";\n\n{source}'
+        )
+
+    def stylesheets(self, page):
+        manifest = self.manifest()
+        if "css" not in manifest:
+            return Markup(
+                "".join(
+                    f'<link href="{url_for("static", filename=path)}" rel="stylesheet">'
+                    for path in ("css/bootstrap.min.css", "css/styles.css")
+                )
+            )
+        href = url_for("static", filename=manifest["css"]["app"])
+        critical = manifest["critical"].get(page, "")
+        return Markup(f"<style>{critical}</style>{_async_stylesheet(escape(href))}")
+
+    def async_stylesheet(self, href):
+        return Markup(_async_stylesheet(escape(href)))
+
+    def scripts(self, page, *paths):
+        bundle = self.manifest().get("js", {}).get(page)
+        if bundle is not None:
+            paths = (bundle,)
+        return Markup(
+            "".join(
+                f'<script src="{url_for("static", filename=path)}" defer></script>'
+                for path in paths
+            )
+        )
@@ -0,0 +1,237 @@
+"""Append-only audit trail for patient records.
+
+Request handlers call :meth:`AuditLog.record`, which only appends to an
+in-memory buffer. A background thread drains the buffer and writes the
+entries to ``patient_audit_log`` in batches, so recording an audit entry
+does not add a database round trip to the request. Should the writer fall
+``AUDIT_MAX_PENDING`` entries behind, the request writes the buffer itself
+rather than lose entries.
+"""
+
+import atexit
+import json
+import logging
+import threading
+from collections import deque
+from datetime import UTC, datetime
+
+logger = logging.getLogger(__name__)
+
+BINARY_PLACEHOLDER = "<binary>"
+
+INSERT_SQL = """
+    INSERT INTO patient_audit_log
+    (patient_id, doctor_id, action, changed_fields, changed_at)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def describe_changes(stored, changes):
+    """Map each changed column to its ``[old, new]`` pair.
+
+    `stored` is the row before the write (or ``None`` for a new record) and
+    `changes` the values written. Binary values are replaced by a marker so
+    attachments are not copied into the audit table.
+    """
+    stored = stored or {}
+    return {
+        column: [
+            _audit_value(stored.get(column)),
+            _audit_value(value),
+        ]
+        for column, value in changes.items()
+    }
+
+
+def _audit_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return BINARY_PLACEHOLDER
+    return value
+
+
+class AuditLog:
+    """Buffered writer for ``patient_audit_log``.
+
+    :param app: Flask application, see :meth:`init_app`.
+    :param connect: callable returning a new DB-API connection. It is called
+        inside an application context from the writer thread.
+    """
+
+    def __init__(self, app=None, connect=None):
+        self.app = None
+        self.connect = connect
+        self.overflows = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._exit_hook = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("AUDIT_BACKGROUND_WRITER", True)
+        app.config.setdefault("AUDIT_BATCH_SIZE", 200)
+        app.config.setdefault("AUDIT_FLUSH_INTERVAL", 1.0)
+        app.config.setdefault("AUDIT_MAX_PENDING", 50000)
+        app.extensions["audit_log"] = self
+        self.app = app
+
+    def record(self, doctor_id, patient_id, action, changes=None):
+        """Queue an audit entry; returns immediately"""
+        entry = (
+            patient_id,
+            doctor_id,
+            action,
+            json.dumps(changes or {}, default=str),
+            datetime.now(UTC),
+        )
+        config = self.app.config
+        with self._lock:
+            full = len(self._pending) >= config["AUDIT_MAX_PENDING"]
+        if full:
+            self._flush_full()
+        with self._lock:
+            self._pending.append(entry)
+            pending = len(self._pending)
+
+        if config["AUDIT_BACKGROUND_WRITER"]:
+            self._ensure_writer()
+            if pending >= config["AUDIT_BATCH_SIZE"]:
+                self._wakeup.set()
+
+    def pending_for(self, patient_id):
+        """Entries for `patient_id` that have not been written yet, newest first"""
+        with self._lock:
+            entries = [entry for entry in self._pending if entry[0] == patient_id]
+        return [
+            {
+                "id": None,
+                "doctor_id": doctor_id,
+                "action": action,
+                "changed_fields": json.loads(changed_fields),
+                "changed_at": changed_at,
+            }
+            for _, doctor_id, action, changed_fields, changed_at in reversed(entries)
+        ]
+
+    def flush(self):
+        """Write every buffered entry now and return how many were written.
+
+        A batch that fails to write is put back at the front of the buffer
+        and the error is re-raised.
+        """
+        written = 0
+        batch_size = self.app.config["AUDIT_BATCH_SIZE"]
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    batch = [
+                        self._pending.popleft()
+                        for _ in range(min(batch_size, len(self._pending)))
+                    ]
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except Exception:
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                    raise
+                written += len(batch)
+
+    def _flush_full(self):
+        """Write the buffer from the recording thread, which waits for it"""
+        with self._lock:
+            self.overflows += 1
+        logger.warning("Audit buffer full, writing it from the request")
+        try:
+            self.flush()
+        except Exception:
+            # Kept beyond the limit until the database takes them
+            logger.exception("Failed to write full audit buffer, keeping it")
+
+    def close(self):
+        """Stop the writer thread and write whatever is still buffered"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stopping = False
+        self.flush()
+
+    def _write(self, batch):
+        with self.app.app_context():
+            connection = self.connect()
+        try:
+            cur = connection.cursor()
+            cur.executemany(INSERT_SQL, batch)
+            connection.commit()
+            cur.close()
+        finally:
+            connection.close()
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="audit-writer", daemon=True
+            )
+            self._thread.start()
+            if not self._exit_hook:
+                atexit.register(self.close)
+                self._exit_hook = True
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.app.config["AUDIT_FLUSH_INTERVAL"])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write audit batch, will retry")
+
+
+def fetch_history(cur, patient_id, doctor_id, before=None, limit=50):
+    """Return one page of a patient's audit history, newest first.
+
+    Pages are addressed by the id of the last entry seen (`before`) rather
+    than an offset, so every page is a bounded range scan on
+    ``(patient_id, id)`` no matter how long the history is. Returns the
+    entries and the cursor for the next page (``None`` on the last page).
+    """
+    params = [patient_id, doctor_id]
+    condition = ""
+    if before is not None:
+        condition = "AND id < %s"
+        params.append(before)
+    params.append(limit + 1)
+
+    cur.execute(
+        f"""
+        SELECT id, doctor_id, action, changed_fields, changed_at
+        FROM patient_audit_log
+        WHERE patient_id = %s AND doctor_id = %s {condition}
+        ORDER BY id DESC
+        LIMIT %s
+        """,
+        tuple(params),
+    )
+    rows = list(cur.fetchall())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"]
+
+    entries = [
+        {**row, "changed_fields": json.loads(row["changed_fields"] or "{}")}
+        for row in rows
+    ]
+    return entries, next_cursor
@@ -0,0 +1,103 @@
+"""Doctor avatars.
+
+An uploaded picture is cropped to a square and encoded once per display
+size as WebP at upload time, so no page ever resizes it. Only the variants
+are stored, in ``doctor_avatars``; re-encoding also drops the photo's
+metadata (camera, location). ``doctors_db.profile_picture`` holds their
+fingerprint, which versions the avatar URLs so browsers can cache them
+for good.
+
+Pillow is imported on first use.
+"""
+
+import io
+
+import previews
+
+# Square edge in pixels, twice the size shown for high density screens
+VARIANTS = {"header": 80, "profile": 256}
+QUALITY = 80
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+# Rejects decompression bombs before decoding: a small file can declare a
+# huge canvas
+MAX_PIXELS = 40_000_000
+
+
+def make_variants(blob):
+    """WebP variants of an uploaded picture, by name.
+
+    Raises :class:`ValueError` with a message for the user when `blob` is
+    not a picture that can be used.
+    """
+    if len(blob) > MAX_UPLOAD_BYTES:
+        raise ValueError(
+            f"The picture is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+        )
+    if not previews.detect_type(blob).startswith("image/"):
+        raise ValueError("Please upload a JPEG, PNG, GIF or WebP picture.")
+
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(blob))
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError("The picture has too many pixels.")
+        largest = max(VARIANTS.values())
+        image.draft("RGB", (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    except (OSError, Image.DecompressionBombError) as err:
+        raise ValueError("The picture could not be read.") from err
+
+    variants = {}
+    for name, edge in VARIANTS.items():
+        out = io.BytesIO()
+        ImageOps.fit(image, (edge, edge)).save(out, "WEBP", quality=QUALITY)
+        variants[name] = out.getvalue()
+    return variants
+
+
+def fingerprint(variants):
+    """Version of a set of variants, changing with any of them"""
+    return previews.digest(b"".join(variants[name] for name in sorted(variants)))
+
+
+def save(cur, doctor_id, variants):
+    """Replace a doctor's avatar; returns its fingerprint.
+
+    Runs inside the caller's transaction on the primary.
+    """
+    version = fingerprint(variants)
+    cur.execute("DELETE FROM doctor_avatars WHERE doctor_id = %s", (doctor_id,))
+    cur.executemany(
+        "INSERT INTO doctor_avatars (doctor_id, variant, image) VALUES (%s, %s, %s)",
+        [(doctor_id, name, image) for name, image in variants.items()],
+    )
+    cur.execute(
+        "UPDATE doctors_db SET profile_picture = %s WHERE id = %s",
+        (version, doctor_id),
+    )
+    return version
+
+
+def remove(cur, doctor_id):
+    """Go back to initials; runs inside the caller's transaction"""
+    cur.execute("DELETE FROM doctor_avatars WHERE doctor_id = %s", (doctor_id,))
+    cur.execute(
+        "UPDATE doctors_db SET profile_picture = NULL WHERE id = %s", (doctor_id,)
+    )
+
+
+def load(cur, doctor_id, variant):
+    """``(image, fingerprint)`` of one variant, or ``None``"""
+    cur.execute(
+        """
+        SELECT a.image, d.profile_picture
+        FROM doctor_avatars a JOIN doctors_db d ON d.id = a.doctor_id
+        WHERE a.doctor_id = %s AND a.variant = %s
+        """,
+        (doctor_id, variant),
+    )
+    row = cur.fetchone()
+    return (row["image"], row["profile_picture"]) if row else None
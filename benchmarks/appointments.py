@@ -0,0 +1,92 @@
+"""Benchmark: appointment overlap queries, scan vs. IntervalIndex.
+
+Generates years of synthetic appointments for one doctor and times
+answering conflict checks
+
+* by scanning every appointment, as a query bounded only on ``ends_at``
+  or a filter over the whole history would;
+* with :class:`appointments.IntervalIndex` over the same appointments.
+
+The app itself only loads the rows of the requested window, so this is
+the worst case for the index: the whole history in memory at once.
+
+Run from the repository root::
+
+    python benchmarks/appointments.py --years 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import appointments
+
+FIRST_DAY = datetime(2016, 1, 4, 8, 0)
+
+
+def synthetic_appointments(years, per_day=16, seed=42):
+    """``(start, end, id)`` for working days, back to back with gaps"""
+    rng = random.Random(seed)
+    items = []
+    for day in range(years * 365):
+        cursor = FIRST_DAY + timedelta(days=day)
+        if cursor.weekday() >= 5:
+            continue
+        for _ in range(per_day):
+            cursor += timedelta(minutes=rng.choice([0, 0, 15]))
+            end = cursor + timedelta(minutes=rng.choice([15, 30, 45]))
+            items.append((cursor, end, len(items)))
+            cursor = end
+    return items
+
+
+def scan(items, queries):
+    return [[i for s, e, i in items if s < end and e > start] for start, end in queries]
+
+
+def indexed(index, queries):
+    return [[i for _, _, i in index.overlapping(start, end)] for start, end in queries]
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    items = synthetic_appointments(args.years)
+    print(f"Generated {len(items):,} appointments over {args.years} years.")
+    rng = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        start = items[0][0] + timedelta(minutes=rng.randrange(args.years * 525_600))
+        queries.append((start, start + timedelta(minutes=30)))
+
+    build_time, index = best_of(args.repeat, appointments.IntervalIndex, items)
+    scan_time, expected = best_of(args.repeat, scan, items, queries)
+    index_time, actual = best_of(args.repeat, indexed, index, queries)
+    assert expected == actual
+
+    print(f"build index    : {build_time:8.3f} s")
+    print(f"scan           : {scan_time / args.queries * 1e6:8.1f} us/query")
+    print(f"IntervalIndex  : {index_time / args.queries * 1e6:8.1f} us/query")
+    print(f"speed-up       : {scan_time / index_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
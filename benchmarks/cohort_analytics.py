@@ -0,0 +1,135 @@
+"""Benchmark: vectorized cohort analytics vs. the per-row Python approach.
+
+Generates synthetic patient rows shaped like database results and times
+
+* the legacy path: varchar height/weight parsed with ``float()`` per row,
+  BMI and age computed per row, percentiles from sorted Python lists;
+* the NumPy path: :func:`analytics.load_cohort` on the float rows returned
+  by the numeric columns, followed by :func:`analytics.summarize`.
+
+Run from the repository root::
+
+    python benchmarks/cohort_analytics.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+
+TODAY = date(2025, 1, 1)
+
+
+class FakeCursor:
+    """Stands in for a tuple cursor that already holds the result set"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+def synthetic_rows(count, seed=42):
+    """Rows as returned by ``analytics.COHORT_SQL``, plus the legacy varchar form"""
+    rng = random.Random(seed)
+    numeric, legacy = [], []
+    for _ in range(count):
+        birth = TODAY - timedelta(days=rng.randint(0, 95 * 365))
+        height = round(rng.gauss(170, 10), 1)
+        weight = round(rng.gauss(72, 14), 1)
+        if rng.random() < 0.03:
+            numeric.append((float((TODAY - birth).days), None, None, None))
+            legacy.append((birth, "", ""))
+            continue
+        bmi = round(weight / (height / 100) ** 2, 1)
+        numeric.append((float((TODAY - birth).days), height, weight, bmi))
+        legacy.append((birth, str(height), str(weight)))
+    return numeric, legacy
+
+
+def percentile(sorted_values, p):
+    """Linear-interpolated percentile, matching NumPy's default"""
+    k = (len(sorted_values) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(sorted_values) - 1)
+    return sorted_values[f] + (sorted_values[c] - sorted_values[f]) * (k - f)
+
+
+def python_summary(rows):
+    """The per-row approach over varchar rows"""
+    columns = {"age": [], "height": [], "weight": [], "bmi": []}
+    for birth, height, weight in rows:
+        columns["age"].append((TODAY - birth).days / analytics.DAYS_PER_YEAR)
+        h = float(height) if height else None
+        w = float(weight) if weight else None
+        if h is not None:
+            columns["height"].append(h)
+        if w is not None:
+            columns["weight"].append(w)
+        if h and w:
+            columns["bmi"].append(round(w / (h / 100) ** 2, 1))
+
+    summary = {}
+    for measure, values in columns.items():
+        values.sort()
+        summary[measure] = {
+            "count": len(values),
+            "mean": statistics.fmean(values),
+            "std": statistics.pstdev(values),
+            "percentiles": {
+                f"p{p}": percentile(values, p) for p in analytics.PERCENTILES
+            },
+        }
+    return summary
+
+
+def numpy_summary(rows):
+    """The vectorized approach over numeric rows"""
+    cohort = analytics.load_cohort(FakeCursor(rows), 1, today=TODAY)
+    return analytics.summarize(cohort)
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic patients...")
+    numeric, legacy = synthetic_rows(args.rows)
+
+    python_time, python_result = best_of(args.repeat, python_summary, legacy)
+    numpy_time, numpy_result = best_of(args.repeat, numpy_summary, numeric)
+
+    for measure in analytics.MEASURES:
+        expected = python_result[measure]["percentiles"]["p50"]
+        actual = numpy_result[measure]["percentiles"]["p50"]
+        assert abs(expected - actual) < 0.01, (measure, expected, actual)
+
+    print(f"per-row Python : {python_time:8.3f} s")
+    print(f"NumPy          : {numpy_time:8.3f} s")
+    print(f"speed-up       : {python_time / numpy_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
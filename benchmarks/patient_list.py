@@ -0,0 +1,138 @@
+"""Benchmark: My Patients list latency before and after archiving.
+
+Fills an SQLite stand-in for ``patients_db`` with doctors whose caseloads
+span years, mostly patients not seen for a long time, and times the My
+Patients query for one doctor
+
+* with every patient in ``patients_db``;
+* after :func:`archive.archive_inactive` moved the inactive ones to
+  ``patients_archive``.
+
+SQLite has no partitioning, so this measures the hot/cold split alone;
+on MySQL the per-doctor partitions of ``patients_db`` narrow the scan
+further.
+
+Run from the repository root::
+
+    python benchmarks/patient_list.py --patients-per-doctor 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+from tests.sqlite import SQLiteDatabase
+
+NOW = datetime(2026, 1, 1)
+
+PATIENT_COLUMNS = """
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT, last_name TEXT,
+    birth_date TEXT, gender TEXT, email_address TEXT,
+    health_insurance_number TEXT, blood_group TEXT, doctors_note TEXT,
+    file_upload BLOB, deleted_at TEXT, updated_at TEXT
+"""
+
+SCHEMA = f"""
+CREATE TABLE patients_db ({PATIENT_COLUMNS});
+CREATE INDEX idx_patients_doctor_deleted ON patients_db (doctor_id, deleted_at);
+CREATE TABLE patients_archive ({PATIENT_COLUMNS});
+CREATE INDEX idx_archive_doctor ON patients_archive (doctor_id);
+CREATE TABLE appointments (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, patient_id INTEGER,
+    starts_at TEXT, ends_at TEXT
+);
+CREATE INDEX idx_appointments_patient ON appointments (patient_id);
+"""
+
+# The My Patients query from views/patients.py
+LIST_SQL = """
+    SELECT id AS patient_id, first_name, last_name, birth_date, gender,
+           email_address, health_insurance_number
+    FROM patients_db
+    WHERE doctor_id = %s AND deleted_at IS NULL
+"""
+
+
+def fill(database, doctors, per_doctor, active_share, seed=42):
+    rng = random.Random(seed)
+    rows = []
+    for doctor_id in range(1, doctors + 1):
+        for _ in range(per_doctor):
+            if rng.random() < active_share:
+                seen = NOW - timedelta(days=rng.randrange(0, 365))
+            else:
+                seen = NOW - timedelta(days=rng.randrange(3 * 365 + 1, 12 * 365))
+            rows.append(
+                (
+                    len(rows) + 1,
+                    doctor_id,
+                    "First",
+                    "Last",
+                    "1970-01-01",
+                    "Female",
+                    "patient@example.com",
+                    "INS123",
+                    "A+",
+                    "x" * rng.randrange(0, 255),
+                    b"%PDF" * rng.randrange(0, 2000),
+                    None,
+                    seen.strftime("%Y-%m-%d %H:%M:%S"),
+                )
+            )
+    database.db.executemany(
+        f"INSERT INTO patients_db VALUES ({', '.join(['?'] * 13)})", rows
+    )
+    database.db.commit()
+    return len(rows)
+
+
+def list_latency(database, doctor_id, repeat):
+    timings = []
+    for _ in range(repeat):
+        cur = database.cursor()
+        start = time.perf_counter()
+        cur.execute(LIST_SQL, (doctor_id,))
+        rows = cur.fetchall()
+        timings.append(time.perf_counter() - start)
+        cur.close()
+    return min(timings), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--patients-per-doctor", type=int, default=20_000)
+    parser.add_argument("--active-share", type=float, default=0.15)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # The counters live in MySQL-only SQL and do not matter for latency
+    archive.stats.apply_delta = lambda cur, doctor_id, buckets, delta: None
+    archive.LOCK_CLAUSE = ""
+
+    database = SQLiteDatabase(SCHEMA)
+    total = fill(database, args.doctors, args.patients_per_doctor, args.active_share)
+    print(f"Generated {total:,} patients for {args.doctors} doctors.")
+
+    before, listed_before = list_latency(database, 1, args.repeat)
+    start = time.perf_counter()
+    archived = archive.archive_inactive(
+        database, archive.cutoff_for(3 * 365, now=NOW), log=lambda message: None
+    )
+    archive_time = time.perf_counter() - start
+    after, listed_after = list_latency(database, 1, args.repeat)
+
+    print(f"archived       : {archived:,} patients in {archive_time:.2f} s")
+    print(f"list before    : {before * 1000:8.2f} ms ({listed_before:,} rows)")
+    print(f"list after     : {after * 1000:8.2f} ms ({listed_after:,} rows)")
+    print(f"speed-up       : {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark: dict rows vs. slotted records for list queries.
+
+Builds the rows of a My Patients list the way each cursor class would
+and measures
+
+* memory held by the result, with :mod:`tracemalloc`;
+* time to build the rows from the driver's tuples (what ``DictCursor``
+  does per row vs. :func:`records.fetch_records` over a tuple cursor);
+* time to read every field by attribute, as the template does.
+
+Run from the repository root::
+
+    python benchmarks/row_records.py --rows 100000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import records
+
+FIELDS = records.PATIENT_LIST_FIELDS
+
+
+class FakeCursor:
+    """Stands in for a tuple cursor that already holds the result set"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+def synthetic_rows(count, seed=42):
+    """Tuples as returned for the My Patients query"""
+    rng = random.Random(seed)
+    first = ["Jane", "John", "Amina", "Kofi", "Mei", "Luca", "Sara", "Omar"]
+    last = ["Smith", "Mensah", "Okafor", "Rossi", "Chen", "Haddad", "Novak"]
+    return [
+        (
+            i,
+            rng.choice(first),
+            rng.choice(last),
+            date(1940, 1, 1) + timedelta(days=rng.randrange(30000)),
+            rng.choice(["Female", "Male"]),
+            f"patient{i}@example.com",
+            f"INS{i:08d}",
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def as_dicts(rows):
+    # What DictCursor does for every row
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+def as_records(rows):
+    return records.fetch_records(FakeCursor(rows), records.PatientListRow)
+
+
+def read_dicts(result):
+    return sum(len(row["first_name"]) + len(row["email_address"]) for row in result)
+
+
+def read_records(result):
+    return sum(len(row.first_name) + len(row.email_address) for row in result)
+
+
+def held_memory(func, rows):
+    """Bytes allocated by `func(rows)` and still held by its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = func(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    print(f"{args.rows:,} rows of {len(FIELDS)} columns")
+
+    dict_memory = held_memory(as_dicts, rows)
+    record_memory = held_memory(as_records, rows)
+    dict_build, dicts = best_of(args.repeat, as_dicts, rows)
+    record_build, recs = best_of(args.repeat, as_records, rows)
+    dict_read, expected = best_of(args.repeat, read_dicts, dicts)
+    record_read, actual = best_of(args.repeat, read_records, recs)
+    assert expected == actual
+
+    print(f"{'':14} {'dict rows':>12} {'records':>12}")
+    print(
+        f"{'memory':14} {dict_memory / 2**20:9.1f} MB {record_memory / 2**20:9.1f} MB"
+        f"   ({dict_memory / record_memory:.1f}x smaller)"
+    )
+    print(
+        f"{'build':14} {dict_build * 1000:9.1f} ms {record_build * 1000:9.1f} ms"
+        f"   ({dict_build / record_build:.1f}x faster)"
+    )
+    print(
+        f"{'read fields':14} {dict_read * 1000:9.1f} ms {record_read * 1000:9.1f} ms"
+        f"   ({dict_read / record_read:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Timeouts and circuit breakers for the database connections.
+
+Every connection the app opens (the request's primary connection, replica
+and shard connections, the audit writer's) is a :class:`GuardedConnection`
+made by :meth:`DatabaseGuard.connect`. Inside a request it waits at most
+``DB_QUERY_TIMEOUT`` seconds for the server to answer a statement, so a
+stalled MySQL fails the request instead of holding a worker until the
+pool is exhausted. ``flask`` commands run without that limit.
+
+Each server (host and port, or socket) has a :class:`CircuitBreaker`
+counting the statements that failed because the server was unreachable,
+stalled or overloaded. When they are more than ``DB_BREAKER_FAILURE_RATE``
+of the last ``DB_BREAKER_WINDOW`` seconds, the circuit opens: statements
+to that server raise :class:`DatabaseUnavailable` at once, without waiting
+for another timeout. After ``DB_BREAKER_RESET_SECONDS`` a single statement
+is let through to probe the server, and its outcome closes the circuit or
+keeps it open.
+
+The circuits are per process, like the replica health in
+:mod:`dbrouting`, which skips a replica whose circuit is open like one
+that fails to connect.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+import pymysql
+from flask import current_app, has_request_context
+from flask_pymysql import MySQL
+from pymysql.constants import CR, ER
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Errors saying the server is unreachable, stalled or overloaded, rather
+# than that the statement was wrong
+UNAVAILABLE_ERRORS = {
+    CR.CR_CONNECTION_ERROR,
+    CR.CR_CONN_HOST_ERROR,
+    CR.CR_SERVER_GONE_ERROR,
+    CR.CR_SERVER_LOST,
+    ER.CON_COUNT_ERROR,
+}
+
+
+class DatabaseUnavailable(pymysql.err.OperationalError):
+    """The server's circuit is open; the statement was not sent"""
+
+    def __init__(self, backend):
+        super().__init__(
+            CR.CR_CONN_HOST_ERROR,
+            "The database is temporarily unavailable. "
+            "Please try again in a few seconds.",
+        )
+        self.backend = backend
+
+    def __str__(self):
+        return self.args[1]
+
+
+def backend_of(kwargs):
+    """Name of the server that pymysql keyword arguments connect to"""
+    if kwargs.get("unix_socket"):
+        return kwargs["unix_socket"]
+    return f"{kwargs.get('host') or 'localhost'}:{kwargs.get('port') or 3306}"
+
+
+class CircuitBreaker:
+    """Failure rate of one server's statements over a sliding window.
+
+    Outcomes are counted in one-second buckets, so memory stays bounded by
+    the window whatever the query rate.
+
+    :param window: seconds of outcomes the failure rate is computed over.
+    :param min_calls: statements needed in the window before it can open.
+    :param failure_rate: share of failed statements that opens it.
+    :param reset_seconds: time open before a probe is let through.
+    :param clock: monotonic clock, replaceable in tests.
+    """
+
+    def __init__(
+        self, window, min_calls, failure_rate, reset_seconds, clock=time.monotonic
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.trips = self.rejected = 0
+        self._buckets = collections.deque()
+        self._opened_at = self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a statement may be sent now; counts it as rejected if not"""
+        with self._lock:
+            now = self.clock()
+            if self.state == OPEN and now - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            # One probe at a time; a probe that never reported is retried
+            if self.state == HALF_OPEN and (
+                self._probe_started is None
+                or now - self._probe_started >= self.reset_seconds
+            ):
+                self._probe_started = now
+                return True
+            if self.state != CLOSED:
+                self.rejected += 1
+                return False
+            return True
+
+    def record(self, failed):
+        """Count the outcome of a statement that :meth:`allow` let through"""
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._buckets.clear()
+                return
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += failed
+            while self._buckets[0][0] <= second - self.window:
+                self._buckets.popleft()
+            if self.state == CLOSED and failed:
+                calls, failures = self._counts()
+                if calls >= self.min_calls and failures >= calls * self.failure_rate:
+                    self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self.trips += 1
+
+    def _counts(self):
+        return (
+            sum(bucket[1] for bucket in self._buckets),
+            sum(bucket[2] for bucket in self._buckets),
+        )
+
+    def stats(self):
+        with self._lock:
+            calls, failures = self._counts()
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failures": failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+class GuardedConnection(pymysql.connections.Connection):
+    """pymysql connection reporting the outcome of each statement to its
+    server's circuit, and refusing to send statements while it is open"""
+
+    def __init__(self, guard, backend, **kwargs):
+        # Statements run by the handshake (init_command) are part of
+        # connecting, which the guard already counts
+        self.guard = None
+        super().__init__(**kwargs)
+        self.guard = guard
+        self.backend = backend
+
+    def query(self, sql, unbuffered=False):
+        if self.guard is None:
+            return super().query(sql, unbuffered)
+        return self.guard.call(self.backend, super().query, sql, unbuffered)
+
+    def commit(self):
+        return self.guard.call(self.backend, super().commit)
+
+
+class DatabaseGuard:
+    """Applies timeouts to new connections and keeps a circuit per server.
+
+    :param app: Flask application, see :meth:`init_app`.
+    :param connect: connection class or factory taking the guard, the
+        server name and pymysql keyword arguments; defaults to
+        :class:`GuardedConnection`.
+    """
+
+    def __init__(self, app=None, connect=None):
+        self.app = None
+        self.factory = connect or GuardedConnection
+        self._breakers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("DB_CONNECT_TIMEOUT", 3)
+        # Longest wait for the server to answer a statement in a request;
+        # None waits forever
+        app.config.setdefault("DB_QUERY_TIMEOUT", 8)
+        app.config.setdefault("DB_BREAKER_ENABLED", True)
+        app.config.setdefault("DB_BREAKER_WINDOW", 30)
+        app.config.setdefault("DB_BREAKER_MIN_CALLS", 10)
+        app.config.setdefault("DB_BREAKER_FAILURE_RATE", 0.5)
+        app.config.setdefault("DB_BREAKER_RESET_SECONDS", 15)
+        app.context_processor(lambda: {"database_read_only": not self.writable()})
+        app.extensions["db_guard"] = self
+        self.app = app
+
+    def breaker(self, backend):
+        with self._lock:
+            if backend not in self._breakers:
+                config = self.app.config
+                self._breakers[backend] = CircuitBreaker(
+                    config["DB_BREAKER_WINDOW"],
+                    config["DB_BREAKER_MIN_CALLS"],
+                    config["DB_BREAKER_FAILURE_RATE"],
+                    config["DB_BREAKER_RESET_SECONDS"],
+                )
+            return self._breakers[backend]
+
+    def call(self, backend, function, *args):
+        """``function(*args)`` against `backend`, through its circuit.
+
+        Raises :class:`DatabaseUnavailable` without calling it while the
+        circuit is open.
+        """
+        if not self.app.config["DB_BREAKER_ENABLED"]:
+            return function(*args)
+        breaker = self.breaker(backend)
+        if not breaker.allow():
+            raise DatabaseUnavailable(backend)
+        failed = False
+        try:
+            return function(*args)
+        except pymysql.err.OperationalError as e:
+            failed = e.args[0] in UNAVAILABLE_ERRORS
+            raise
+        finally:
+            breaker.record(failed)
+            if failed and breaker.state == OPEN:
+                logger.warning("Circuit to %s is open", backend)
+
+    def connect(self, **kwargs):
+        """A new connection; takes and returns what :func:`pymysql.connect`
+        does"""
+        kwargs.setdefault("connect_timeout", self.app.config["DB_CONNECT_TIMEOUT"])
+        timeout = self.app.config["DB_QUERY_TIMEOUT"]
+        if timeout is not None and has_request_context():
+            kwargs.setdefault("read_timeout", timeout)
+            kwargs.setdefault("write_timeout", timeout)
+        backend = backend_of(kwargs)
+        return self.call(backend, lambda: self.factory(self, backend, **kwargs))
+
+    def writable(self):
+        """Whether the primary's circuit lets writes through"""
+        if self.app is None or not self.app.config["DB_BREAKER_ENABLED"]:
+            return True
+        backend = backend_of(self.app.config["pymysql_kwargs"] or {})
+        with self._lock:
+            breaker = self._breakers.get(backend)
+        return breaker is None or breaker.state != OPEN
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            "writable": self.writable(),
+            "backends": {name: b.stats() for name, b in sorted(breakers.items())},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+class GuardedMySQL(MySQL):
+    """flask_pymysql's extension, connecting through a :class:`DatabaseGuard`
+
+    :param guard: the guard whose :meth:`DatabaseGuard.connect` opens the
+        connections.
+    """
+
+    def __init__(self, app=None, guard=None):
+        self.guard = guard
+        super().__init__(app)
+
+    @property
+    def connect(self):
+        kwargs = dict(current_app.config["pymysql_kwargs"] or {})
+        if isinstance(kwargs.get("cursorclass"), str):
+            kwargs["cursorclass"] = getattr(pymysql.cursors, kwargs["cursorclass"])
+        return self.guard.connect(**kwargs)
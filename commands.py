@@ -0,0 +1,377 @@
+"""``flask`` commands for maintenance jobs, registered by :func:`main.create_app`."""
+
+import csv
+import multiprocessing
+import os
+
+import click
+from flask.cli import with_appcontext
+
+import archive
+import assets
+import conditions
+import duplicates
+import fhir
+import measurements
+import previews
+import sharding
+import stats
+import sync
+import tasks
+from extensions import job_queue, mysql, shard_router
+
+
+@click.command("backfill-terms")
+@with_appcontext
+@click.option("--chunk-size", default=500, show_default=True)
+def backfill_terms(chunk_size):
+    """Link existing patients to normalized clinical terms on every shard"""
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            done = conditions.backfill(connection, chunk_size, log=click.echo)
+        finally:
+            connection.close()
+        click.echo(f"{shard}: linked terms for {done} patients.")
+
+
+@click.command("archive-patients")
+@with_appcontext
+@click.option(
+    "--inactive-days",
+    default=3 * 365,
+    show_default=True,
+    help="Archive patients without changes or appointments for this long.",
+)
+@click.option("--chunk-size", default=500, show_default=True)
+def archive_patients(inactive_days, chunk_size):
+    """Move inactive patients to patients_archive on every shard"""
+    cutoff = archive.cutoff_for(inactive_days)
+    directory = mysql.connect
+    cur = directory.cursor()
+    if shard_router.shards:
+        # Leave doctors being moved alone; start moves after this finishes
+        cur.execute("SELECT doctor_id FROM doctor_shards WHERE moving = 1")
+        moving = {row["doctor_id"] for row in cur.fetchall()}
+    else:
+        moving = set()
+    cur.close()
+    directory.close()
+
+    total = 0
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            done = archive.archive_inactive(
+                connection, cutoff, chunk_size, skip_doctors=moving, log=click.echo
+            )
+        finally:
+            connection.close()
+        click.echo(f"{shard}: archived {done} patients.")
+        total += done
+    click.echo(f"Archived {total} patients inactive since {cutoff:%Y-%m-%d}.")
+
+
+@click.command("backfill-match-keys")
+@with_appcontext
+@click.option("--chunk-size", default=500, show_default=True)
+def backfill_match_keys(chunk_size):
+    """Compute duplicate detection keys for existing patients on every shard"""
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            done = duplicates.backfill(connection, chunk_size, log=click.echo)
+        finally:
+            connection.close()
+        click.echo(f"{shard}: computed match keys for {done} patients.")
+
+
+@click.command("backfill-previews")
+@with_appcontext
+@click.option("--chunk-size", default=50, show_default=True)
+def backfill_previews(chunk_size):
+    """Add previews and metadata to existing patient attachments on every shard"""
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            done = previews.backfill(connection, chunk_size, log=click.echo)
+        finally:
+            connection.close()
+        click.echo(f"{shard}: added previews for {done} attachments.")
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets():
+    """Purge unused CSS and extract critical CSS for every page"""
+    assets.build(os.path.dirname(os.path.abspath(__file__)), log=click.echo)
+
+
+@click.command("export-analytics")
+@with_appcontext
+@click.argument("out_dir", type=click.Path(file_okay=False))
+@click.option(
+    "--format", "fmt", type=click.Choice(["parquet", "arrow"]), default="parquet"
+)
+@click.option("--incremental", is_flag=True, help="Only rows changed since last run.")
+@click.option("--chunk-size", default=5000, show_default=True)
+def export_analytics(out_dir, fmt, incremental, chunk_size):
+    """Export patients and doctors of every shard to a Parquet/Arrow dataset"""
+    # Imported here so the web app does not load pyarrow on startup
+    import export
+
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        primary = shard == sharding.PRIMARY_SHARD
+        connection = shard_router.connect_shard(shard)
+        try:
+            written = export.export(
+                connection,
+                out_dir,
+                fmt,
+                incremental,
+                chunk_size,
+                tables=None if primary else export.SHARDED_TABLES,
+                shard=None if primary else shard,
+                log=click.echo,
+            )
+        finally:
+            connection.close()
+        for table, count in written.items():
+            click.echo(f"{shard}: exported {count} rows from {table}.")
+
+
+@click.command("export-fhir")
+@with_appcontext
+@click.argument("out_dir", type=click.Path(file_okay=False))
+@click.option("--doctor-id", type=int, help="Only export this doctor's patients.")
+def export_fhir(out_dir, doctor_id):
+    """Export patients as FHIR R4 NDJSON, one file per resource type"""
+    shards = (sharding.PRIMARY_SHARD, *shard_router.shards)
+    connections = []
+    try:
+        for shard in shards:
+            connections.append(shard_router.connect_shard(shard))
+        counts = fhir.export_ndjson(connections, out_dir, doctor_id, log=click.echo)
+    finally:
+        for connection in connections:
+            connection.close()
+    for resource_type, count in counts.items():
+        click.echo(f"Exported {count} {resource_type} resources.")
+
+
+@click.command("find-duplicates")
+@with_appcontext
+@click.option("--doctor-id", type=int, help="Only look among this doctor's patients.")
+@click.option(
+    "--out",
+    type=click.File("w"),
+    default="-",
+    help="CSV file for the pairs found (default: standard output).",
+)
+def find_duplicates(doctor_id, out):
+    """List likely duplicate patients on every shard, as CSV"""
+    writer = csv.writer(out)
+    writer.writerow(["doctor_id", "patient_id", "other_patient_id", "score"])
+    found = 0
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            for pair in duplicates.scan(
+                connection, doctor_id, log=lambda m: click.echo(m, err=True)
+            ):
+                writer.writerow(pair)
+                found += 1
+        finally:
+            connection.close()
+    click.echo(f"Found {found} likely duplicate pairs.", err=True)
+
+
+@click.command("migrate-measurements")
+@with_appcontext
+@click.option("--chunk-size", default=1000, show_default=True)
+def migrate_measurements(chunk_size):
+    """Convert patient height/weight to numeric columns and add BMI on every
+    shard"""
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            rejected = measurements.migrate(connection, chunk_size, log=click.echo)
+        finally:
+            connection.close()
+        for patient_id, column, value in rejected:
+            click.echo(
+                f"{shard}: patient {patient_id}: could not parse {column} {value!r}"
+            )
+
+
+@click.command("prune-tombstones")
+@with_appcontext
+@click.option("--days", default=sync.TOMBSTONE_DAYS, show_default=True)
+def prune_tombstones(days):
+    """Forget sync tombstones older than DAYS on every shard"""
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        try:
+            pruned = sync.prune_tombstones(connection, days)
+        finally:
+            connection.close()
+        click.echo(f"{shard}: pruned {pruned} tombstones.")
+
+
+@click.command("purge-deleted")
+@with_appcontext
+@click.option(
+    "--minutes",
+    default=tasks.PURGE_GRACE_MINUTES,
+    show_default=True,
+    help="Only patients deleted at least this long ago.",
+)
+def purge_deleted(minutes):
+    """Queue purges for deleted patients still stored on any shard, and
+    delete jobs finished more than JOB_RETENTION_DAYS ago"""
+    queue = mysql.connect
+    cur = queue.cursor()
+    try:
+        for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+            connection = shard_router.connect_shard(shard)
+            try:
+                patients = tasks.unpurged_patients(connection, minutes)
+            finally:
+                connection.close()
+            for doctor_id, patient_id in patients:
+                job_queue.enqueue(
+                    cur,
+                    tasks.PURGE_PATIENT,
+                    {"patient_id": patient_id, "doctor_id": doctor_id},
+                    owner_id=doctor_id,
+                )
+            queue.commit()
+            click.echo(f"{shard}: queued purges for {len(patients)} patients.")
+        pruned = job_queue.prune(queue)
+        click.echo(f"Deleted {pruned} finished jobs.")
+    finally:
+        cur.close()
+        queue.close()
+
+
+@click.command("rebuild-stats")
+@with_appcontext
+@click.option("--doctor-id", type=int, help="Only rebuild this doctor's counters.")
+def rebuild_stats(doctor_id):
+    """Recompute dashboard statistics from patients_db on every shard"""
+    for shard in (sharding.PRIMARY_SHARD, *shard_router.shards):
+        connection = shard_router.connect_shard(shard)
+        cur = connection.cursor()
+        try:
+            written = stats.rebuild(cur, doctor_id)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cur.close()
+            connection.close()
+        click.echo(f"{shard}: rebuilt {written} statistics rows.")
+
+
+@click.command("move-doctor")
+@with_appcontext
+@click.argument("doctor_id", type=int)
+@click.argument("shard")
+@click.option("--chunk-size", default=500, show_default=True)
+@click.option(
+    "--grace",
+    default=2.0,
+    show_default=True,
+    help="Seconds to let in-flight writes finish before the final copy.",
+)
+def move_doctor(doctor_id, shard, chunk_size, grace):
+    """Move a doctor's patients to another shard while the app runs"""
+    if shard != sharding.PRIMARY_SHARD and shard not in shard_router.shards:
+        raise click.BadParameter(f"unknown shard {shard!r}", param_hint="SHARD")
+
+    directory = mysql.connect
+    cur = directory.cursor()
+    cur.execute("SELECT shard FROM doctor_shards WHERE doctor_id = %s", (doctor_id,))
+    row = cur.fetchone()
+    cur.close()
+    current = row["shard"] if row else sharding.PRIMARY_SHARD
+    if current == shard:
+        directory.close()
+        click.echo(f"Doctor {doctor_id} is already on {shard}.")
+        return
+
+    source = shard_router.connect_shard(current)
+    target = shard_router.connect_shard(shard)
+    try:
+        moved = sharding.move_doctor(
+            directory,
+            source,
+            target,
+            doctor_id,
+            current,
+            shard,
+            chunk_size=chunk_size,
+            grace=grace,
+            log=click.echo,
+        )
+    finally:
+        for connection in (directory, source, target):
+            connection.close()
+    click.echo(f"Moved {moved} patients from {current} to {shard}.")
+
+
+def _work(burst):
+    # Each worker process builds its own app, with its own connections
+    from main import app
+
+    app.extensions["job_queue"].work(idle_exit=burst)
+
+
+@click.command("run-jobs")
+@with_appcontext
+@click.option("--workers", default=2, show_default=True)
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+def run_jobs(workers, burst):
+    """Run background jobs (attachments, purges) in worker processes"""
+    if workers == 1:
+        done = job_queue.work(idle_exit=burst)
+        click.echo(f"Ran {done} jobs.")
+        return
+
+    processes = [
+        multiprocessing.Process(target=_work, args=(burst,), name=f"jobs-{n}")
+        for n in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+COMMANDS = (
+    archive_patients,
+    backfill_match_keys,
+    backfill_previews,
+    backfill_terms,
+    build_assets,
+    export_analytics,
+    export_fhir,
+    find_duplicates,
+    migrate_measurements,
+    move_doctor,
+    prune_tombstones,
+    purge_deleted,
+    rebuild_stats,
+    run_jobs,
+)
+
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
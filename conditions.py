@@ -0,0 +1,274 @@
+"""Normalized allergies, vaccines, medications and chronic diseases.
+
+The free-text columns on ``patients_db`` stay the source of truth for
+display. Each distinct term is also stored once in ``clinical_terms`` and
+linked to patients through ``patient_clinical_terms``, whose primary key
+``(term_id, doctor_id, patient_id)`` turns "which of my patients have X"
+into an index range read instead of a ``LIKE`` scan.
+
+:class:`TermIndex` keeps an in-memory prefix trie per doctor and kind for
+autocomplete.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import records
+
+KINDS = ("allergies", "vaccines", "medications", "chronic_diseases")
+
+# Values clinicians type to mean "nothing to record"
+PLACEHOLDERS = {"", "-", "--", "n/a", "na", "nil", "no", "none", "null", "unknown"}
+
+_SEPARATORS = re.compile(r"[,;\r\n]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_term(term):
+    """Key used to match terms regardless of case and spacing"""
+    return _WHITESPACE.sub(" ", term).strip().casefold()
+
+
+def split_terms(text):
+    """Split a free-text field into ``{normalized: display}`` terms.
+
+    >>> split_terms("Typhoid, Hepatitis B\\r\\n")
+    {'typhoid': 'Typhoid', 'hepatitis b': 'Hepatitis B'}
+    """
+    terms = {}
+    for part in _SEPARATORS.split(text or ""):
+        display = _WHITESPACE.sub(" ", part).strip().rstrip(".")
+        normalized = normalize_term(display)
+        if normalized not in PLACEHOLDERS and normalized not in terms:
+            terms[normalized] = display[:255]
+    return terms
+
+
+def sync_patient_terms(cur, doctor_id, patient_id, kind, text):
+    """Replace a patient's links for one kind with the terms in `text`.
+
+    Runs inside the caller's transaction. Returns the display names so the
+    caller can feed them to the autocomplete index after committing.
+    """
+    cur.execute(
+        """
+        DELETE pt FROM patient_clinical_terms pt
+        JOIN clinical_terms t ON t.id = pt.term_id
+        WHERE pt.patient_id = %s AND t.kind = %s
+        """,
+        (patient_id, kind),
+    )
+    terms = split_terms(text)
+    if not terms:
+        return []
+
+    cur.executemany(
+        """
+        INSERT IGNORE INTO clinical_terms (kind, name, normalized_name)
+        VALUES (%s, %s, %s)
+        """,
+        [(kind, display, normalized) for normalized, display in terms.items()],
+    )
+    cur.execute(
+        f"""
+        SELECT id FROM clinical_terms
+        WHERE kind = %s AND normalized_name IN ({", ".join(["%s"] * len(terms))})
+        """,
+        (kind, *terms),
+    )
+    cur.executemany(
+        """
+        INSERT IGNORE INTO patient_clinical_terms (term_id, doctor_id, patient_id)
+        VALUES (%s, %s, %s)
+        """,
+        [(row["id"], doctor_id, patient_id) for row in cur.fetchall()],
+    )
+    return list(terms.values())
+
+
+def delete_patient_terms(cur, patient_id):
+    """Drop every term link of a deleted patient"""
+    cur.execute(
+        "DELETE FROM patient_clinical_terms WHERE patient_id = %s", (patient_id,)
+    )
+
+
+def find_patients(cur, doctor_id, kind, term):
+    """A doctor's patients linked to `term`, as My Patients rows"""
+    cur.execute(
+        """
+        SELECT
+            p.id AS patient_id,
+            p.first_name,
+            p.last_name,
+            p.birth_date,
+            p.gender,
+            p.email_address,
+            p.health_insurance_number
+        FROM clinical_terms t
+        JOIN patient_clinical_terms pt
+            ON pt.term_id = t.id AND pt.doctor_id = %s
+        JOIN patients_db p ON p.id = pt.patient_id AND p.deleted_at IS NULL
+        WHERE t.kind = %s AND t.normalized_name = %s
+        """,
+        (doctor_id, kind, normalize_term(term)),
+    )
+    return records.fetch_records(cur, records.PatientListRow)
+
+
+def backfill(connection, chunk_size=500, log=print):
+    """Link every existing patient to the terms in its free-text columns.
+
+    Walks ``patients_db`` in primary key order and commits per chunk, so it
+    can run against a live database. Deleted patients, whose links were
+    dropped, are skipped. Returns the number of patients done.
+    """
+    cur = connection.cursor()
+    done = last_id = 0
+    while True:
+        cur.execute(
+            f"""
+            SELECT id, doctor_id, {", ".join(KINDS)} FROM patients_db
+            WHERE id > %s AND deleted_at IS NULL ORDER BY id LIMIT %s
+            """,
+            (last_id, chunk_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            for kind in KINDS:
+                sync_patient_terms(cur, row["doctor_id"], row["id"], kind, row[kind])
+        connection.commit()
+        done += len(rows)
+        last_id = rows[-1]["id"]
+        log(f"Linked terms for {done} patients.")
+    cur.close()
+    return done
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+
+class TermTrie:
+    """Prefix trie that answers completions without walking subtrees.
+
+    Every node caches the `k` most used terms below it, so a lookup costs
+    ``O(len(prefix))`` however many terms are stored.
+    """
+
+    def __init__(self, k=10):
+        self.k = k
+        self.root = _Node()
+        self.weights = {}
+
+    def add(self, display, weight=1):
+        """Insert `display`, or add `weight` to its usage count"""
+        normalized = normalize_term(display)
+        if not normalized:
+            return
+        # The first spelling seen is kept for display
+        total, display = self.weights.get(normalized, (0, display))
+        weight += total
+        self.weights[normalized] = (weight, display)
+
+        node = self.root
+        self._rank(node, normalized, display, weight)
+        for char in normalized:
+            node = node.children.setdefault(char, _Node())
+            self._rank(node, normalized, display, weight)
+
+    def _rank(self, node, normalized, display, weight):
+        top = [entry for entry in node.top if entry[1] != normalized]
+        top.append((-weight, normalized, display))
+        top.sort()
+        node.top = top[: self.k]
+
+    def complete(self, prefix, limit=None):
+        """Display names starting with `prefix`, most used first"""
+        node = self.root
+        for char in normalize_term(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [display for _, _, display in node.top[: limit or self.k]]
+
+    def __len__(self):
+        return len(self.weights)
+
+
+class TermIndex:
+    """Per-doctor, per-kind tries, loaded lazily from the database and
+    refreshed after `ttl` seconds.
+
+    A doctor is only offered the terms recorded for their own patients,
+    since free text can hold anything, names included. The tries of the
+    `max_doctors` most recently served doctors are kept.
+
+    :param load: callable taking a doctor id and returning that doctor's
+        ``(kind, name, usage)`` rows.
+    """
+
+    def __init__(self, load, ttl=300, k=10, max_doctors=1000):
+        self.load = load
+        self.ttl = ttl
+        self.k = k
+        self.max_doctors = max_doctors
+        self._tries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _current(self, doctor_id):
+        with self._lock:
+            entry = self._tries.get(doctor_id)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._tries.move_to_end(doctor_id)
+                return entry[1]
+        # Loaded outside the lock so one doctor's load does not hold up
+        # the others
+        tries = {kind: TermTrie(self.k) for kind in KINDS}
+        for kind, name, usage in self.load(doctor_id):
+            if kind in tries:
+                tries[kind].add(name, usage)
+        with self._lock:
+            self._tries[doctor_id] = (time.monotonic(), tries)
+            self._tries.move_to_end(doctor_id)
+            while len(self._tries) > self.max_doctors:
+                self._tries.popitem(last=False)
+        return tries
+
+    def complete(self, doctor_id, kind, prefix, limit=None):
+        return self._current(doctor_id)[kind].complete(prefix, limit)
+
+    def add(self, doctor_id, kind, names):
+        """Make freshly written terms available before the next reload"""
+        entry = self._tries.get(doctor_id)
+        if entry is not None:
+            for name in names:
+                entry[1][kind].add(name)
+
+    def invalidate(self):
+        with self._lock:
+            self._tries.clear()
+
+
+def load_term_usage(cur, doctor_id):
+    """Rows for :class:`TermIndex`: the doctor's terms with their patient
+    counts"""
+    cur.execute(
+        """
+        SELECT t.kind, t.name, COUNT(*) AS usage_count
+        FROM patient_clinical_terms pt
+        JOIN clinical_terms t ON t.id = pt.term_id
+        WHERE pt.doctor_id = %s
+        GROUP BY t.id, t.kind, t.name
+        """,
+        (doctor_id,),
+    )
+    return [(row["kind"], row["name"], row["usage_count"]) for row in cur.fetchall()]
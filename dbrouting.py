@@ -0,0 +1,156 @@
+"""Routing of read-only queries to MySQL replicas.
+
+Writes, and reads that a write depends on, keep using the primary through
+``mysql.connection``. Pages that only read ask :meth:`DatabaseRouter.reader`
+for a connection instead, which is a replica from ``DB_REPLICAS`` picked
+round-robin, or the primary when none is configured or all are down.
+
+Replicas lag behind the primary, so after a write the view calls
+:meth:`DatabaseRouter.pin`, and for ``DB_PRIMARY_PIN_SECONDS`` that
+session's reads go to the primary too; a doctor always sees their own
+edits, while other sessions may briefly see the previous values.
+
+Health checks are passive: a replica that fails to connect is skipped for
+``DB_REPLICA_RETRY_SECONDS`` and then tried again. :meth:`check` pings
+every replica on demand.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+import pymysql
+from flask import g, has_request_context, session
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = "db_primary_until"
+
+
+class DatabaseRouter:
+    """Hands out primary or replica connections for the current request.
+
+    :param app: Flask application, see :meth:`init_app`.
+    :param primary: callable returning the request's primary connection.
+    :param connect: callable taking pymysql keyword arguments and returning
+        a new connection; defaults to :func:`pymysql.connect`.
+    """
+
+    def __init__(self, app=None, primary=None, connect=None):
+        self.app = None
+        self.primary = primary
+        self.connect = connect or pymysql.connect
+        self.reads = {"primary": 0}
+        self._down_until = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Each replica is a dict of pymysql keyword arguments that override
+        # the primary's ``pymysql_kwargs``, e.g. ``{"host": "replica-1"}``
+        app.config.setdefault("DB_REPLICAS", [])
+        app.config.setdefault("DB_PRIMARY_PIN_SECONDS", 10)
+        app.config.setdefault("DB_REPLICA_RETRY_SECONDS", 30)
+        app.teardown_appcontext(self.teardown)
+        app.extensions["db_router"] = self
+        self.app = app
+
+    @property
+    def replicas(self):
+        return self.app.config["DB_REPLICAS"]
+
+    def pin(self):
+        """Send this session's reads to the primary for a while after a write"""
+        if self.replicas:
+            session[PIN_KEY] = time.time() + self.app.config["DB_PRIMARY_PIN_SECONDS"]
+
+    def pinned(self):
+        return has_request_context() and session.get(PIN_KEY, 0) > time.time()
+
+    def reader(self):
+        """Connection for read-only queries, reused for the whole request"""
+        if "db_reader" not in g:
+            connection = None
+            if self.replicas and not self.pinned():
+                connection = self._connect_replica()
+            if connection is None:
+                self._count("primary")
+                connection = self.primary()
+            else:
+                g.db_replica_connection = connection
+            g.db_reader = connection
+        return g.db_reader
+
+    def _connect_replica(self):
+        count = len(self.replicas)
+        start = next(self._turn)
+        now = time.monotonic()
+        for offset in range(count):
+            index = (start + offset) % count
+            if self._down_until.get(index, 0) > now:
+                continue
+            try:
+                connection = self.connect(**self._kwargs(index))
+            except pymysql.MySQLError as e:
+                self._mark_down(index, e)
+                continue
+            self._count(index)
+            return connection
+        return None
+
+    def _kwargs(self, index):
+        return {**(self.app.config["pymysql_kwargs"] or {}), **self.replicas[index]}
+
+    def _mark_down(self, index, error):
+        logger.warning("Replica %d is unavailable: %s", index, error)
+        with self._lock:
+            self._down_until[index] = (
+                time.monotonic() + self.app.config["DB_REPLICA_RETRY_SECONDS"]
+            )
+
+    def _count(self, backend):
+        with self._lock:
+            self.reads[backend] = self.reads.get(backend, 0) + 1
+
+    def check(self):
+        """Ping every replica now; returns ``{index: healthy}``"""
+        health = {}
+        for index in range(len(self.replicas)):
+            try:
+                connection = self.connect(**self._kwargs(index))
+                try:
+                    connection.ping(reconnect=False)
+                finally:
+                    connection.close()
+            except pymysql.MySQLError as e:
+                self._mark_down(index, e)
+                health[index] = False
+            else:
+                with self._lock:
+                    self._down_until.pop(index, None)
+                health[index] = True
+        return health
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": [
+                    {
+                        "host": replica.get("host"),
+                        "up": self._down_until.get(index, 0) <= now,
+                        "reads": self.reads.get(index, 0),
+                    }
+                    for index, replica in enumerate(self.replicas)
+                ],
+                "primary_reads": self.reads["primary"],
+            }
+
+    def teardown(self, exception):
+        connection = g.pop("db_replica_connection", None)
+        g.pop("db_reader", None)
+        if connection is not None:
+            connection.close()
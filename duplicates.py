@@ -0,0 +1,316 @@
+"""Detecting patients registered twice.
+
+Each patient gets a few blocking keys (:func:`match_keys`): birth date
+with the sound of the last or the first name, health insurance number and
+email address. They are stored in ``patient_match_keys``, kept up to date
+by the write paths like the condition term links, so the patients that
+could be the same person as a given one are an index lookup away. Only
+those are compared field by field (:func:`score`).
+
+:func:`find_candidates` checks one patient, for the live warning on
+registration. :func:`scan` walks the whole key table in index order for
+the ``flask find-duplicates`` job: a block is compared within itself
+only, so the work grows with the number of patients and the size of the
+blocks rather than with every pair of patients. Duplicates are only
+looked for among the patients of the same doctor, archived ones included:
+they keep their keys, and registering one of them again is just as much a
+duplicate.
+"""
+
+import itertools
+import re
+import unicodedata
+from datetime import date
+from difflib import SequenceMatcher
+
+# Fields the keys and the score read
+MATCH_FIELDS = (
+    "first_name",
+    "last_name",
+    "birth_date",
+    "health_insurance_number",
+    "email_address",
+    "phone_number",
+)
+
+# Share of the score each field carries when both records have it
+WEIGHTS = {
+    "name": 0.4,
+    "birth_date": 0.25,
+    "health_insurance_number": 0.2,
+    "email_address": 0.1,
+    "phone_number": 0.05,
+}
+
+THRESHOLD = 0.8
+
+# A key shared by more patients than this (a clinic's shared email
+# address) says little about any pair of them and is not compared
+MAX_BLOCK = 50
+
+_NOT_LETTERS = re.compile(r"[^a-z]")
+_NOT_ALNUM = re.compile(r"[^A-Z0-9]")
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_name(name):
+    """Lower-case letters only, accents removed"""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    return _NOT_LETTERS.sub("", decomposed.encode("ascii", "ignore").decode().lower())
+
+
+def soundex(name):
+    """American Soundex of a normalized name, e.g. ``r163`` for Robert"""
+    if not name:
+        return ""
+    codes = [name[0]]
+    previous = _SOUNDEX_CODES.get(name[0])
+    for letter in name[1:]:
+        code = _SOUNDEX_CODES.get(letter)
+        if code and code != previous:
+            codes.append(code)
+        # h and w do not separate letters with the same code
+        if letter not in "hw":
+            previous = code
+    return "".join(codes)[:4].ljust(4, "0")
+
+
+def _birth_date(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return (value or "").strip()
+
+
+def _insurance(value):
+    value = _NOT_ALNUM.sub("", (value or "").upper())
+    return value if len(value) >= 4 else ""
+
+
+def _email(value):
+    value = (value or "").strip().casefold()
+    return value if "@" in value else ""
+
+
+def _phone(value):
+    digits = re.sub(r"\D", "", value or "")
+    # Compared without country or trunk prefixes
+    return digits[-9:] if len(digits) >= 6 else ""
+
+
+def match_keys(patient):
+    """Blocking keys of a patient, from the :data:`MATCH_FIELDS` it has"""
+    keys = set()
+    first = normalize_name(patient.get("first_name"))
+    last = normalize_name(patient.get("last_name"))
+    birth_date = _birth_date(patient.get("birth_date"))
+    if birth_date:
+        if last:
+            keys.add(f"dl:{birth_date}:{soundex(last)}")
+        if first:
+            keys.add(f"df:{birth_date}:{soundex(first)}")
+    insurance = _insurance(patient.get("health_insurance_number"))
+    if insurance:
+        keys.add(f"hi:{insurance}")
+    email = _email(patient.get("email_address"))
+    if email:
+        keys.add(f"em:{email[:180]}")
+    return keys
+
+
+def _similarity(a, b):
+    return SequenceMatcher(None, a, b).ratio() if a and b else 0.0
+
+
+def _name_similarity(a, b):
+    first_a, last_a = (normalize_name(a.get(f)) for f in ("first_name", "last_name"))
+    first_b, last_b = (normalize_name(b.get(f)) for f in ("first_name", "last_name"))
+    straight = (_similarity(first_a, first_b) + _similarity(last_a, last_b)) / 2
+    # First and last name entered the other way round
+    swapped = (_similarity(first_a, last_b) + _similarity(last_a, first_b)) / 2
+    return max(straight, swapped)
+
+
+def _date_similarity(a, b):
+    if a == b:
+        return 1.0
+    # Day and month swapped, or a single mistyped digit
+    if (
+        len(a) == len(b) == 10
+        and a[:4] == b[:4]
+        and a[5:7] == b[8:]
+        and a[8:] == b[5:7]
+    ):
+        return 0.8
+    if len(a) == len(b) and sum(x != y for x, y in zip(a, b)) == 1:
+        return 0.7
+    return 0.0
+
+
+def score(a, b):
+    """Likelihood between 0 and 1 that patients `a` and `b` are the same
+    person, from the fields both have"""
+    compared = {"name": _name_similarity(a, b)}
+    for field, clean, similarity in (
+        ("birth_date", _birth_date, _date_similarity),
+        ("health_insurance_number", _insurance, lambda x, y: float(x == y)),
+        ("email_address", _email, lambda x, y: float(x == y)),
+        ("phone_number", _phone, lambda x, y: float(x == y)),
+    ):
+        x, y = clean(a.get(field)), clean(b.get(field))
+        if x and y:
+            compared[field] = similarity(x, y)
+    total = sum(WEIGHTS[field] for field in compared)
+    return round(sum(WEIGHTS[f] * s for f, s in compared.items()) / total, 3)
+
+
+def sync_keys(cur, doctor_id, patient_id, patient):
+    """Replace a patient's keys; runs inside the caller's transaction"""
+    delete_keys(cur, doctor_id, patient_id)
+    keys = match_keys(patient)
+    if keys:
+        cur.executemany(
+            """
+            INSERT INTO patient_match_keys (doctor_id, match_key, patient_id)
+            VALUES (%s, %s, %s)
+            """,
+            [(doctor_id, key, patient_id) for key in sorted(keys)],
+        )
+
+
+def delete_keys(cur, doctor_id, patient_id):
+    cur.execute(
+        "DELETE FROM patient_match_keys WHERE doctor_id = %s AND patient_id = %s",
+        (doctor_id, patient_id),
+    )
+
+
+def _load(cur, doctor_id, ids):
+    placeholders = ", ".join(["%s"] * len(ids))
+    cur.execute(
+        f"""
+        SELECT id, {", ".join(MATCH_FIELDS)} FROM patients_db
+        WHERE doctor_id = %s AND deleted_at IS NULL AND id IN ({placeholders})
+        UNION ALL
+        SELECT id, {", ".join(MATCH_FIELDS)} FROM patients_archive
+        WHERE doctor_id = %s AND id IN ({placeholders})
+        """,
+        (doctor_id, *ids, doctor_id, *ids),
+    )
+    return {row["id"]: row for row in cur.fetchall()}
+
+
+def find_candidates(cur, doctor_id, patient, exclude_id=None, limit=10):
+    """Patients of the doctor, archived or not, that may be `patient`, best
+    first, as ``(score, row)`` pairs"""
+    keys = match_keys(patient)
+    if not keys:
+        return []
+    cur.execute(
+        f"""
+        SELECT DISTINCT patient_id FROM patient_match_keys
+        WHERE doctor_id = %s AND match_key IN ({", ".join(["%s"] * len(keys))})
+        LIMIT %s
+        """,
+        (doctor_id, *sorted(keys), MAX_BLOCK * len(keys)),
+    )
+    ids = [
+        row["patient_id"] for row in cur.fetchall() if row["patient_id"] != exclude_id
+    ]
+    if not ids:
+        return []
+    scored = [(score(patient, row), row) for row in _load(cur, doctor_id, ids).values()]
+    scored = [pair for pair in scored if pair[0] >= THRESHOLD]
+    scored.sort(key=lambda pair: (-pair[0], pair[1]["id"]))
+    return scored[:limit]
+
+
+def _candidate_pairs(cur, doctor_id):
+    """Pairs of a doctor's patients sharing a key, from a key-ordered read"""
+    cur.execute(
+        """
+        SELECT match_key, patient_id FROM patient_match_keys
+        WHERE doctor_id = %s ORDER BY match_key, patient_id
+        """,
+        (doctor_id,),
+    )
+    pairs = set()
+    for _, rows in itertools.groupby(cur.fetchall(), key=lambda row: row["match_key"]):
+        ids = [row["patient_id"] for row in rows]
+        if len(ids) <= MAX_BLOCK:
+            pairs.update(itertools.combinations(ids, 2))
+    return sorted(pairs)
+
+
+def scan(connection, doctor_id=None, chunk_size=500, log=print):
+    """Yield ``(doctor_id, patient_id, other_id, score)`` for every likely
+    duplicate pair on one shard.
+
+    Reads each doctor's keys in index order, so blocks arrive one after the
+    other, and scores the pairs within blocks, loading the patients
+    `chunk_size` pairs at a time.
+    """
+    cur = connection.cursor()
+    try:
+        if doctor_id is None:
+            cur.execute("SELECT DISTINCT doctor_id FROM patient_match_keys")
+            doctor_ids = sorted(row["doctor_id"] for row in cur.fetchall())
+        else:
+            doctor_ids = [doctor_id]
+        for current in doctor_ids:
+            pairs = _candidate_pairs(cur, current)
+            yield from _score_pairs(cur, current, pairs, chunk_size)
+            log(f"Doctor {current}: compared {len(pairs)} candidate pairs.")
+    finally:
+        cur.close()
+
+
+def _score_pairs(cur, doctor_id, pairs, chunk_size):
+    for i in range(0, len(pairs), chunk_size):
+        chunk = pairs[i : i + chunk_size]
+        rows = _load(cur, doctor_id, sorted({id for pair in chunk for id in pair}))
+        for a, b in chunk:
+            if a in rows and b in rows:
+                likelihood = score(rows[a], rows[b])
+                if likelihood >= THRESHOLD:
+                    yield doctor_id, a, b, likelihood
+
+
+def backfill(connection, chunk_size=500, log=print):
+    """Compute the keys of patients registered before they existed.
+
+    Walks ``patients_db`` and then ``patients_archive`` in primary key order
+    and commits per chunk, so it can run against a live database. Returns
+    the number of patients done.
+    """
+    cur = connection.cursor()
+    done = 0
+    try:
+        for table in ("patients_db", "patients_archive"):
+            last_id = 0
+            while True:
+                cur.execute(
+                    f"""
+                    SELECT id, doctor_id, {", ".join(MATCH_FIELDS)} FROM {table}
+                    WHERE id > %s ORDER BY id LIMIT %s
+                    """,
+                    (last_id, chunk_size),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    sync_keys(cur, row["doctor_id"], row["id"], row)
+                connection.commit()
+                done += len(rows)
+                last_id = rows[-1]["id"]
+                log(f"Computed match keys for {done} patients.")
+        return done
+    finally:
+        cur.close()
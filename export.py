@@ -0,0 +1,287 @@
+"""Columnar export of patients and doctors for offline analytics.
+
+:func:`export` streams ``patients_db`` and ``doctors_db`` out of MySQL with
+an unbuffered (server-side) cursor in primary key order and writes each
+chunk of rows straight to a Parquet or Arrow IPC dataset, so at most one
+chunk is held in memory however large the tables are. Patients are
+partitioned by ``doctor_id`` (``patients_db/doctor_id=7/...``); they are
+read in ``(doctor_id, id)`` order and chunked per doctor, so each doctor
+gets full-sized files rather than one small file per chunk they appear in.
+
+Archived patients are exported to ``patients_archive``, their
+``updated_at`` being the time they were archived, and deleted patients to
+``patient_tombstones`` as ``(doctor_id, patient_id, deleted_at)``.
+
+With ``incremental=True`` only rows whose ``updated_at`` (for tombstones,
+``deleted_at``) moved since the previous run are exported. Each run writes
+new files next to the old ones; readers keep the row with the latest
+``updated_at`` per ``id`` across ``patients_db`` and ``patients_archive``,
+and drop it when a tombstone is not older. Tombstones are pruned after
+:data:`sync.TOMBSTONE_DAYS`, so incremental runs must be more frequent.
+Passwords and uploaded files are never exported.
+
+When patients are sharded, :func:`export` runs once per shard with
+``shard`` naming it: a shard only holds ``SHARDED_TABLES``, its files are
+named after it and its high-water marks are kept apart, since every shard
+has its own clock.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pymysql.cursors import Cursor, SSCursor
+
+STATE_FILE = "export-state.json"
+
+FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+
+_MEASUREMENT = pa.decimal128(5, 1)
+
+PATIENT_SCHEMA = pa.schema(
+    [
+        ("id", pa.int32()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("birth_date", pa.date32()),
+        ("gender", pa.string()),
+        ("nationality", pa.string()),
+        ("health_insurance_number", pa.string()),
+        ("email_address", pa.string()),
+        ("phone_number", pa.string()),
+        ("address", pa.string()),
+        ("emergency_contact_name", pa.string()),
+        ("emergency_contact_number", pa.string()),
+        ("height", _MEASUREMENT),
+        ("weight", _MEASUREMENT),
+        ("bmi", pa.decimal128(6, 1)),
+        ("blood_group", pa.string()),
+        ("genotype", pa.string()),
+        ("allergies", pa.string()),
+        ("chronic_diseases", pa.string()),
+        ("disabilities", pa.string()),
+        ("vaccines", pa.string()),
+        ("medications", pa.string()),
+        ("doctors_note", pa.string()),
+        ("doctor_id", pa.int32()),
+        ("updated_at", pa.timestamp("s")),
+    ]
+)
+
+# An archived row keeps its last updated_at; its tombstone says when it
+# left patients_db, which is what tells readers it is now archived
+_ARCHIVED_AT = "COALESCE(t.deleted_at, a.updated_at)"
+
+# Besides a schema and partitioning, a table may give the select list,
+# FROM clause, fixed filters, change timestamp and ordering of its query;
+# they default to the schema's columns of the table, ordered by id.
+# Partitioned tables must be ordered by their partition column first.
+TABLES = {
+    "patients_db": {
+        "schema": PATIENT_SCHEMA,
+        "partitioning": ["doctor_id"],
+        # Deleted patients are hidden at once and purged later
+        "where": ["deleted_at IS NULL"],
+        "order": "doctor_id, id",
+    },
+    "patients_archive": {
+        "schema": PATIENT_SCHEMA,
+        "partitioning": ["doctor_id"],
+        "columns": [
+            f"{_ARCHIVED_AT} AS updated_at" if name == "updated_at" else f"a.{name}"
+            for name in PATIENT_SCHEMA.names
+        ],
+        "from": (
+            "patients_archive a LEFT JOIN patient_tombstones t"
+            " ON t.doctor_id = a.doctor_id AND t.patient_id = a.id"
+        ),
+        "where": ["a.deleted_at IS NULL"],
+        "changed": _ARCHIVED_AT,
+        "order": "a.doctor_id, a.id",
+    },
+    "patient_tombstones": {
+        "schema": pa.schema(
+            [
+                ("doctor_id", pa.int32()),
+                ("patient_id", pa.int32()),
+                ("deleted_at", pa.timestamp("s")),
+            ]
+        ),
+        "partitioning": None,
+        "columns": ["t.doctor_id", "t.patient_id", "t.deleted_at"],
+        "from": "patient_tombstones t",
+        # Archived patients leave a tombstone too, for sync clients
+        "where": [
+            (
+                "NOT EXISTS (SELECT 1 FROM patients_archive a"
+                " WHERE a.doctor_id = t.doctor_id AND a.id = t.patient_id)"
+            )
+        ],
+        "changed": "t.deleted_at",
+        "order": "t.doctor_id, t.patient_id",
+    },
+    "doctors_db": {
+        "schema": pa.schema(
+            [
+                ("id", pa.int32()),
+                ("first_name", pa.string()),
+                ("last_name", pa.string()),
+                ("gender", pa.string()),
+                ("license_number", pa.string()),
+                ("email_address", pa.string()),
+                ("phone_number", pa.string()),
+                ("nationality", pa.string()),
+                ("work_address", pa.string()),
+                ("specialty", pa.string()),
+                ("birth_date", pa.date32()),
+                ("updated_at", pa.timestamp("s")),
+            ]
+        ),
+        "partitioning": None,
+    },
+}
+
+
+# Tables present on every shard; the others only live on the primary
+SHARDED_TABLES = ("patients_db", "patients_archive", "patient_tombstones")
+
+
+def load_state(out_dir):
+    """High-water marks of the previous run, keyed by table"""
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def to_batch(rows, schema):
+    """Turn a chunk of tuple rows into a record batch with a fixed schema"""
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def iter_chunks(cur, table, spec, since=None, chunk_size=5000):
+    """Yield record batches of `table`, described by its `spec` in
+    :data:`TABLES`, in the order the spec gives.
+
+    A batch of a partitioned table holds rows of one partition only, up to
+    `chunk_size` of them, so it is written as one file. `cur` must be
+    unbuffered (``SSCursor``) so the driver does not load the whole result
+    set before the first chunk is returned.
+    """
+    schema = spec["schema"]
+    columns = spec.get("columns", schema.names)
+    query = f"SELECT {', '.join(columns)} FROM {spec.get('from', table)}"
+    filters, params = list(spec.get("where", ())), ()
+    if since is not None:
+        filters.append(f"{spec.get('changed', 'updated_at')} >= %s")
+        params = (since,)
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    cur.execute(query + f" ORDER BY {spec.get('order', 'id')}", params)
+    key = None
+    if spec["partitioning"]:
+        key = schema.names.index(spec["partitioning"][0])
+    pending = []
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        if key is None:
+            yield to_batch(rows, schema)
+            continue
+        for row in rows:
+            if pending and (row[key] != pending[-1][key] or len(pending) >= chunk_size):
+                yield to_batch(pending, schema)
+                pending = []
+            pending.append(row)
+    if pending:
+        yield to_batch(pending, schema)
+
+
+def write_chunk(batch, table_dir, run, part, fmt, partitioning):
+    ds.write_dataset(
+        batch,
+        table_dir,
+        format=FORMATS[fmt],
+        partitioning=partitioning,
+        partitioning_flavor="hive" if partitioning else None,
+        basename_template=f"run-{run}-part-{part:05d}-{{i}}.{fmt}",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def export(
+    connection,
+    out_dir,
+    fmt="parquet",
+    incremental=False,
+    chunk_size=5000,
+    tables=None,
+    shard=None,
+    log=print,
+):
+    """Export `tables` (default: all) to `out_dir`.
+
+    `shard` names the shard `connection` is to, None for the primary.
+    Returns ``{table: rows_written}``. The state file is only updated once
+    every table has been written, so a failed run is simply repeated.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_state(out_dir)
+
+    # Take the new high-water mark from the database clock before reading,
+    # so rows changed while the export runs are picked up next time.
+    cur = connection.cursor(Cursor)
+    cur.execute("SELECT NOW()")
+    started_at = cur.fetchone()[0]
+    cur.close()
+
+    run = started_at.strftime("%Y%m%dT%H%M%S")
+    if shard is not None:
+        run += f"-{shard}"
+    written = {}
+    for table in tables or TABLES:
+        spec = TABLES[table]
+        key = table if shard is None else f"{table}@{shard}"
+        since = None
+        if incremental and key in state:
+            since = datetime.fromisoformat(state[key])
+
+        cur = connection.cursor(SSCursor)
+        try:
+            count = 0
+            batches = iter_chunks(cur, table, spec, since, chunk_size)
+            for part, batch in enumerate(batches):
+                write_chunk(
+                    batch,
+                    os.path.join(out_dir, table),
+                    run,
+                    part,
+                    fmt,
+                    spec["partitioning"],
+                )
+                count += batch.num_rows
+                log(f"{table}: exported {count} rows.")
+        finally:
+            cur.close()
+        written[table] = count
+        state[key] = started_at.isoformat()
+
+    save_state(out_dir, state)
+    return written
@@ -0,0 +1,75 @@
+"""Extension instances shared by the blueprints.
+
+They are created unbound here and attached to the application by
+:func:`main.create_app`, so the view modules can import them without
+importing the application.
+"""
+
+import conditions
+from assets import Assets
+from audit import AuditLog
+from circuit import DatabaseGuard, GuardedMySQL
+from dbrouting import DatabaseRouter
+from jobs import JobQueue
+from pagecache import PageCache
+from ratelimit import SigninLimiter
+from sharding import ShardRouter
+from singleflight import SingleFlight
+
+db_guard = DatabaseGuard()
+mysql = GuardedMySQL(guard=db_guard)
+audit_log = AuditLog(connect=lambda: mysql.connect)
+job_queue = JobQueue(connect=lambda: mysql.connect)
+db_router = DatabaseRouter(primary=lambda: mysql.connection, connect=db_guard.connect)
+shard_router = ShardRouter(
+    primary=lambda: mysql.connection,
+    reader=db_router.reader,
+    connect=db_guard.connect,
+)
+signin_limiter = SigninLimiter()
+page_cache = PageCache()
+single_flight = SingleFlight()
+assets = Assets()
+
+
+def load_term_usage(doctor_id):
+    """Loader for the autocomplete index; runs inside a request and reads
+    the doctor's shard"""
+    cur = shard_router.reader(doctor_id).cursor()
+    try:
+        return conditions.load_term_usage(cur, doctor_id)
+    finally:
+        cur.close()
+
+
+term_index = conditions.TermIndex(load_term_usage)
+
+
+def shared_read(name, doctor_id, function):
+    """``function()``, shared with concurrent identical reads of a doctor.
+
+    Keyed on the doctor's page cache generation, so reads that follow a
+    write in this process start a call of their own. A session pinned to
+    the primary after a write reads alone.
+    """
+    if db_router.pinned():
+        return function()
+    return single_flight.do(
+        (name, doctor_id, page_cache.generation(doctor_id)), function
+    )
+
+
+def init_app(app):
+    for extension in (
+        db_guard,
+        mysql,
+        audit_log,
+        job_queue,
+        db_router,
+        shard_router,
+        signin_limiter,
+        page_cache,
+        single_flight,
+        assets,
+    ):
+        extension.init_app(app)
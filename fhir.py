@@ -0,0 +1,244 @@
+"""FHIR R4 export of patient records.
+
+Each patient row maps to a ``Patient`` resource, and each term of
+its allergies, vaccines and medications to an ``AllergyIntolerance``, an
+``Immunization`` or a ``MedicationStatement`` that references it. Terms
+are split as in :mod:`conditions` and only carry their text, as entered.
+Archived patients (``patients_archive``) are exported too, as Patients
+that are no longer ``active``.
+
+Rows are read with an unbuffered (server-side) cursor in primary key
+order and resources are serialized one at a time, so an export holds one
+row in memory however many patients it covers. The web app streams pages
+of resources as ``searchset`` Bundles and the ``flask export-fhir``
+command writes one NDJSON file per resource type, as in FHIR Bulk Data.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+from datetime import UTC
+
+from pymysql.cursors import SSDictCursor
+
+import conditions
+
+FHIR_JSON = "application/fhir+json"
+FHIR_NDJSON = "application/fhir+ndjson"
+
+IDENTIFIER_SYSTEM = "urn:medixbridge:health-insurance-number"
+
+PATIENT_FIELDS = (
+    "id",
+    "first_name",
+    "last_name",
+    "birth_date",
+    "gender",
+    "email_address",
+    "phone_number",
+    "address",
+    "health_insurance_number",
+    "allergies",
+    "vaccines",
+    "medications",
+    "updated_at",
+)
+
+# Resource type of each term column, in output order after the Patient
+TERM_RESOURCES = {
+    "allergies": "AllergyIntolerance",
+    "vaccines": "Immunization",
+    "medications": "MedicationStatement",
+}
+
+RESOURCE_TYPES = ("Patient", *TERM_RESOURCES.values())
+
+
+def _instant(value):
+    # FHIR instants need a zone; the database stores server local time
+    return value.astimezone(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _gender(value):
+    value = (value or "").strip().lower()
+    if value in ("male", "female"):
+        return value
+    return "other" if value else "unknown"
+
+
+def patient_resource(row):
+    patient = {"resourceType": "Patient", "id": str(row["id"])}
+    if row.get("updated_at"):
+        patient["meta"] = {"lastUpdated": _instant(row["updated_at"])}
+    if row.get("archived"):
+        patient["active"] = False
+    if row["health_insurance_number"]:
+        patient["identifier"] = [
+            {"system": IDENTIFIER_SYSTEM, "value": row["health_insurance_number"]}
+        ]
+    patient["name"] = [
+        {"use": "official", "family": row["last_name"], "given": [row["first_name"]]}
+    ]
+    telecom = [
+        {"system": system, "value": row[column]}
+        for system, column in (("email", "email_address"), ("phone", "phone_number"))
+        if row[column]
+    ]
+    if telecom:
+        patient["telecom"] = telecom
+    patient["gender"] = _gender(row["gender"])
+    if row["birth_date"]:
+        patient["birthDate"] = row["birth_date"].isoformat()
+    if row["address"]:
+        patient["address"] = [{"text": row["address"]}]
+    return patient
+
+
+def term_resource(resource_type, patient_id, normalized, display):
+    """Resource for one term; its id is stable while the term is recorded"""
+    key = hashlib.sha256(f"{resource_type}:{normalized}".encode()).hexdigest()[:12]
+    resource = {"resourceType": resource_type, "id": f"{patient_id}-{key}"}
+    reference = {"reference": f"Patient/{patient_id}"}
+    concept = {"text": display}
+    if resource_type == "AllergyIntolerance":
+        resource.update(patient=reference, code=concept)
+    elif resource_type == "Immunization":
+        # The record holds no dates; occurrence is required, hence a string
+        resource.update(
+            status="completed",
+            vaccineCode=concept,
+            patient=reference,
+            occurrenceString="unknown",
+            primarySource=False,
+        )
+    else:
+        resource.update(
+            status="unknown", medicationCodeableConcept=concept, subject=reference
+        )
+    return resource
+
+
+def resources(row, types=RESOURCE_TYPES):
+    """Resources of `types` for one patient row, the Patient first"""
+    if "Patient" in types:
+        yield patient_resource(row)
+    for column, resource_type in TERM_RESOURCES.items():
+        if resource_type in types:
+            for normalized, display in conditions.split_terms(row[column]).items():
+                yield term_resource(resource_type, row["id"], normalized, display)
+
+
+def iter_patients(connection, doctor_id=None, after_id=0, limit=None):
+    """Patient rows in id order, active and archived ones (with
+    ``archived`` set), through an unbuffered cursor.
+
+    The connection cannot run other queries until the rows are consumed or
+    the generator is closed.
+    """
+    where = "id > %s"
+    branch_params = [after_id]
+    if doctor_id is not None:
+        where += " AND doctor_id = %s"
+        branch_params.append(doctor_id)
+    # Each table is read in id order only as far as the page needs
+    branch_tail = ""
+    if limit is not None:
+        branch_tail = " ORDER BY id LIMIT %s"
+        branch_params.append(limit)
+    fields = ", ".join(PATIENT_FIELDS)
+    query = f"""
+        (SELECT {fields}, FALSE AS archived FROM patients_db
+         WHERE {where} AND deleted_at IS NULL{branch_tail})
+        UNION ALL
+        (SELECT {fields}, TRUE AS archived FROM patients_archive
+         WHERE {where}{branch_tail})
+        ORDER BY id
+    """
+    params = branch_params * 2
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    cur = connection.cursor(SSDictCursor)
+    try:
+        cur.execute(query, params)
+        yield from cur
+    finally:
+        cur.close()
+
+
+def bundle_page(rows, count, base_url, page_url, types=RESOURCE_TYPES):
+    """A ``searchset`` Bundle of up to `count` patients, as text chunks.
+
+    `rows` must hold one row more than the page when there is a next page
+    (query with ``limit=count + 1``). `page_url(after_id)` builds the URL
+    of the page starting after a patient id.
+    """
+    yield '{"resourceType":"Bundle","type":"searchset","entry":['
+    separator = ""
+    last_id = next_id = None
+    for number, row in enumerate(rows):
+        if number == count:
+            next_id = last_id
+            break
+        for resource in resources(row, types):
+            mode = "match" if resource["resourceType"] == "Patient" else "include"
+            entry = {
+                "fullUrl": f"{base_url}/{resource['resourceType']}/{resource['id']}",
+                "resource": resource,
+                "search": {"mode": mode},
+            }
+            yield separator + json.dumps(entry, separators=(",", ":"))
+            separator = ","
+        last_id = row["id"]
+
+    links = [{"relation": "self", "url": page_url(None)}]
+    if next_id is not None:
+        links.append({"relation": "next", "url": page_url(next_id)})
+    yield '],"link":' + json.dumps(links, separators=(",", ":")) + "}"
+
+
+def ndjson_lines(rows, types=RESOURCE_TYPES):
+    """One line of JSON per resource"""
+    for row in rows:
+        for resource in resources(row, types):
+            yield json.dumps(resource, separators=(",", ":")) + "\n"
+
+
+def export_ndjson(connections, out_dir, doctor_id=None, log=print):
+    """Write ``<ResourceType>.ndjson`` files for the patients on `connections`.
+
+    Files are written under temporary names and renamed once complete.
+    Returns ``{resource_type: count}``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {t: os.path.join(out_dir, f"{t}.ndjson") for t in RESOURCE_TYPES}
+    counts = dict.fromkeys(RESOURCE_TYPES, 0)
+    patients = 0
+    try:
+        with contextlib.ExitStack() as stack:
+            files = {
+                t: stack.enter_context(open(path + ".tmp", "w", encoding="utf-8"))
+                for t, path in paths.items()
+            }
+            for connection in connections:
+                for row in iter_patients(connection, doctor_id):
+                    for resource in resources(row):
+                        resource_type = resource["resourceType"]
+                        files[resource_type].write(
+                            json.dumps(resource, separators=(",", ":")) + "\n"
+                        )
+                        counts[resource_type] += 1
+                    patients += 1
+                    if patients % 10000 == 0:
+                        log(f"Exported {patients} patients.")
+    except BaseException:
+        # No partial files are left behind
+        for path in paths.values():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + ".tmp")
+        raise
+    for resource_type, path in paths.items():
+        os.replace(path + ".tmp", path)
+    return counts
@@ -0,0 +1,275 @@
+"""Background jobs stored in the ``jobs`` table.
+
+Request handlers call :meth:`JobQueue.enqueue` with a cursor on the
+primary, where the ``jobs`` table lives. Jobs for writes to patients, which
+may be on another database (a shard), are queued once those writes have
+committed and can be lost in between; a command queues them again from
+what the write left behind, like ``flask purge-deleted`` for the patients
+deleted. ``flask run-jobs`` starts worker processes that claim jobs in
+priority order and run the function registered for the job's kind with
+:meth:`JobQueue.handler`.
+
+A claimed job is leased to its worker until its visibility timeout runs
+out. A worker that dies mid-job leaves the lease to expire, after which
+another worker picks the job up again, so handlers must be safe to run
+more than once. A failing job is retried with exponential backoff until
+``JOB_MAX_ATTEMPTS`` and then kept as ``failed`` with its last error.
+Finished jobs are deleted after ``JOB_RETENTION_DAYS`` by
+``flask purge-deleted``.
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Database-backed job queue.
+
+    :param app: Flask application, see :meth:`init_app`.
+    :param connect: callable returning a new DB-API connection for the
+        workers. It is called inside an application context.
+    """
+
+    # Lets concurrent workers claim different jobs without waiting on each
+    # other's row locks (MySQL 8.0+)
+    lock_clause = "FOR UPDATE SKIP LOCKED"
+
+    def __init__(self, app=None, connect=None):
+        self.app = None
+        self.connect = connect
+        self.handlers = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("JOB_VISIBILITY_TIMEOUT", 300)
+        app.config.setdefault("JOB_MAX_ATTEMPTS", 5)
+        app.config.setdefault("JOB_RETRY_DELAY", 10)
+        app.config.setdefault("JOB_POLL_INTERVAL", 1.0)
+        # Finished jobs are kept this long for /jobs/<id>, see prune()
+        app.config.setdefault("JOB_RETENTION_DAYS", 30)
+        # Uploads are staged here for the workers, so it must be on the
+        # same machine (or a shared volume)
+        app.config.setdefault("JOB_SPOOL_DIR", os.path.join(app.instance_path, "spool"))
+        app.extensions["job_queue"] = self
+        self.app = app
+
+    def handler(self, kind, priority=0):
+        """Register the function that runs jobs of `kind`.
+
+        It is called with the job's payload inside an application context.
+        `priority` is the default for jobs of this kind; higher runs first.
+        """
+
+        def register(function):
+            self.handlers[kind] = (function, priority)
+            return function
+
+        return register
+
+    def enqueue(self, cur, kind, payload, owner_id=None, priority=None):
+        """Add a job inside the caller's transaction and return its id"""
+        if kind not in self.handlers:
+            raise KeyError(f"No handler registered for job kind {kind!r}")
+        if priority is None:
+            priority = self.handlers[kind][1]
+        now = datetime.now()
+        cur.execute(
+            """
+            INSERT INTO jobs
+            (kind, payload, owner_id, priority, status, attempts, max_attempts,
+             run_after, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, 0, %s, %s, %s, %s)
+            """,
+            (
+                kind,
+                json.dumps(payload),
+                owner_id,
+                priority,
+                QUEUED,
+                self.app.config["JOB_MAX_ATTEMPTS"],
+                now,
+                now,
+                now,
+            ),
+        )
+        return cur.lastrowid
+
+    def spool_path(self, name):
+        """Path in the spool directory for a file handed to a job"""
+        spool = self.app.config["JOB_SPOOL_DIR"]
+        os.makedirs(spool, exist_ok=True)
+        return os.path.join(spool, name)
+
+    def claim(self, connection, worker):
+        """Lease the next runnable job to `worker`, or return ``None``.
+
+        Runnable means queued and due, or running with an expired lease.
+        Each is its own probe so that both can be answered from an index;
+        expired leases are only taken when no queued job is due.
+        """
+        now = datetime.now()
+        cur = connection.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT id, kind, payload, attempts, max_attempts FROM jobs
+                WHERE status = %s AND run_after <= %s
+                ORDER BY priority DESC, run_after, id
+                LIMIT 1
+                {self.lock_clause}
+                """,
+                (QUEUED, now),
+            )
+            job = cur.fetchone()
+            if job is None:
+                cur.execute(
+                    f"""
+                    SELECT id, kind, payload, attempts, max_attempts FROM jobs
+                    WHERE status = %s AND locked_until < %s
+                    ORDER BY locked_until
+                    LIMIT 1
+                    {self.lock_clause}
+                    """,
+                    (RUNNING, now),
+                )
+                job = cur.fetchone()
+            if job is None:
+                connection.commit()
+                return None
+            job = dict(job, attempts=job["attempts"] + 1)
+            cur.execute(
+                """
+                UPDATE jobs
+                SET status = %s, attempts = %s, locked_by = %s, locked_until = %s,
+                    updated_at = %s
+                WHERE id = %s
+                """,
+                (
+                    RUNNING,
+                    job["attempts"],
+                    worker,
+                    now + timedelta(seconds=self.app.config["JOB_VISIBILITY_TIMEOUT"]),
+                    now,
+                    job["id"],
+                ),
+            )
+            connection.commit()
+            return job
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _finish(self, connection, job, worker, status, error=None, run_after=None):
+        now = datetime.now()
+        cur = connection.cursor()
+        try:
+            # A worker whose lease expired must not overwrite the job's
+            # state, which now belongs to whoever claimed it next
+            cur.execute(
+                """
+                UPDATE jobs
+                SET status = %s, last_error = %s, run_after = COALESCE(%s, run_after),
+                    locked_by = NULL, locked_until = NULL, updated_at = %s,
+                    finished_at = %s
+                WHERE id = %s AND locked_by = %s
+                """,
+                (
+                    status,
+                    error,
+                    run_after,
+                    now,
+                    now if status in (DONE, FAILED) else None,
+                    job["id"],
+                    worker,
+                ),
+            )
+            connection.commit()
+        finally:
+            cur.close()
+
+    def run_one(self, connection, worker):
+        """Claim and run one job; returns ``False`` when none was due"""
+        job = self.claim(connection, worker)
+        if job is None:
+            return False
+
+        function, _ = self.handlers[job["kind"]]
+        try:
+            function(json.loads(job["payload"]))
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+            if job["attempts"] >= job["max_attempts"]:
+                self._finish(connection, job, worker, FAILED, repr(e))
+            else:
+                delay = self.app.config["JOB_RETRY_DELAY"] * 2 ** (job["attempts"] - 1)
+                retry_at = datetime.now() + timedelta(seconds=delay)
+                self._finish(connection, job, worker, QUEUED, repr(e), retry_at)
+        else:
+            self._finish(connection, job, worker, DONE)
+        return True
+
+    def work(self, worker=None, max_jobs=None, idle_exit=False):
+        """Run jobs until stopped; used by each ``flask run-jobs`` process.
+
+        Returns after `max_jobs` jobs, or when the queue is empty if
+        `idle_exit` is set.
+        """
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        done = 0
+        with self.app.app_context():
+            connection = self.connect()
+        try:
+            while max_jobs is None or done < max_jobs:
+                with self.app.app_context():
+                    ran = self.run_one(connection, worker)
+                if ran:
+                    done += 1
+                elif idle_exit:
+                    break
+                else:
+                    time.sleep(self.app.config["JOB_POLL_INTERVAL"])
+        finally:
+            connection.close()
+        return done
+
+    def prune(self, connection, days=None):
+        """Delete jobs finished more than `days` (``JOB_RETENTION_DAYS``)
+        ago; returns how many"""
+        if days is None:
+            days = self.app.config["JOB_RETENTION_DAYS"]
+        cur = connection.cursor()
+        try:
+            cur.execute(
+                "DELETE FROM jobs WHERE status IN (%s, %s) AND finished_at < %s",
+                (DONE, FAILED, datetime.now() - timedelta(days=days)),
+            )
+            connection.commit()
+            return cur.rowcount
+        finally:
+            cur.close()
+
+    def status(self, cur, job_id, owner_id):
+        """A job's state as shown to its owner, or ``None``"""
+        cur.execute(
+            """
+            SELECT id, kind, status, attempts, max_attempts, last_error,
+                   created_at, finished_at
+            FROM jobs WHERE id = %s AND owner_id = %s
+            """,
+            (job_id, owner_id),
+        )
+        return cur.fetchone()
@@ -0,0 +1,199 @@
+"""Patient height and weight as numbers.
+
+``patients_db.height`` and ``weight`` started out as free-text ``varchar``
+columns. :func:`migrate` converts them to ``decimal`` (centimetres and
+kilograms), cleaning the existing strings on the way, and adds a stored
+``bmi`` column derived from them, in ``patients_archive`` as well. The
+``parse_*`` helpers apply the same rules to form input.
+"""
+
+import re
+
+MEASUREMENT_FIELDS = ("height", "weight")
+
+# Tables holding patients, which must keep the same columns
+MEASURED_TABLES = ("patients_db", "patients_archive")
+
+# Plausible ranges; anything outside is treated as a data entry error
+HEIGHT_RANGE_CM = (30.0, 272.0)
+WEIGHT_RANGE_KG = (0.5, 650.0)
+
+# Wide enough for any pair in those ranges (650 kg at 30 cm is 7222.2)
+BMI_TYPE = "decimal(6,1)"
+BMI_EXPRESSION = "ROUND(weight / POW(height / 100, 2), 1)"
+
+HEIGHT_UNITS = {
+    "": 1.0,
+    "cm": 1.0,
+    "mm": 0.1,
+    "m": 100.0,
+    "in": 2.54,
+    "inch": 2.54,
+    "inches": 2.54,
+}
+WEIGHT_UNITS = {
+    "": 1.0,
+    "kg": 1.0,
+    "kgs": 1.0,
+    "g": 0.001,
+    "lb": 0.45359237,
+    "lbs": 0.45359237,
+}
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def _parse(value, units, valid_range, name):
+    text = str(value if value is not None else "").strip().lower()
+    if not text:
+        return None
+
+    match = _NUMBER.search(text)
+    unit = text[match.end() :].strip().rstrip(".") if match else None
+    if not match or text[: match.start()].strip() or unit not in units:
+        raise ValueError(f"Invalid {name}: {value!r}")
+
+    number = float(match.group().replace(",", ".")) * units[unit]
+    low, high = valid_range
+    if not low <= number <= high:
+        raise ValueError(f"{name.capitalize()} out of range: {value!r}")
+    return round(number, 1)
+
+
+def parse_height(value):
+    """Height in centimetres, or ``None`` for a blank value.
+
+    A bare number below 3 is read as metres (``"1.80"``). Raises
+    :class:`ValueError` for unreadable or implausible values.
+    """
+    text = str(value if value is not None else "").strip()
+    try:
+        if 0 < float(text.replace(",", ".")) < 3:
+            text += " m"
+    except ValueError:
+        pass
+    return _parse(text, HEIGHT_UNITS, HEIGHT_RANGE_CM, "height")
+
+
+def parse_weight(value):
+    """Weight in kilograms, or ``None`` for a blank value.
+
+    Raises :class:`ValueError` for unreadable or implausible values.
+    """
+    return _parse(value, WEIGHT_UNITS, WEIGHT_RANGE_KG, "weight")
+
+
+def clean(value, parse):
+    """Parse a legacy value, returning ``(number, ok)`` instead of raising"""
+    try:
+        return parse(value), True
+    except ValueError:
+        return None, False
+
+
+def _columns(cur, table):
+    cur.execute(
+        """
+        SELECT COLUMN_NAME AS name, COLUMN_TYPE AS column_type
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    return {row["name"]: row["column_type"] for row in cur.fetchall()}
+
+
+def _backfill(connection, cur, table, chunk_size, log):
+    rejected = []
+    last_id = 0
+    while True:
+        cur.execute(
+            f"""
+            SELECT id, height, weight FROM {table}
+            WHERE id > %s ORDER BY id LIMIT %s
+            """,
+            (last_id, chunk_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return rejected
+
+        updates = []
+        for row in rows:
+            height, height_ok = clean(row["height"], parse_height)
+            weight, weight_ok = clean(row["weight"], parse_weight)
+            if not height_ok:
+                rejected.append((row["id"], "height", row["height"]))
+            if not weight_ok:
+                rejected.append((row["id"], "weight", row["weight"]))
+            updates.append((height, weight, row["id"]))
+
+        cur.executemany(
+            f"UPDATE {table} SET height_cm = %s, weight_kg = %s WHERE id = %s",
+            updates,
+        )
+        connection.commit()
+        last_id = rows[-1]["id"]
+        log(f"Backfilled {table} measurements up to patient {last_id}.")
+
+
+def migrate(connection, chunk_size=1000, log=print):
+    """Convert height and weight to numeric columns and add ``bmi``.
+
+    ``patients_archive`` is migrated after ``patients_db`` so both keep the
+    same columns. Each step checks the current schema first, so an
+    interrupted run can simply be started again. Existing values are
+    backfilled in primary key order, one committed chunk at a time. Returns
+    the ``(id, column, value)`` of every non-empty legacy value that could
+    not be parsed and was therefore stored as ``NULL``.
+    """
+    cur = connection.cursor()
+    rejected = []
+    try:
+        for table in MEASURED_TABLES:
+            rejected += _migrate_table(connection, cur, table, chunk_size, log)
+    finally:
+        cur.close()
+    return rejected
+
+
+def _migrate_table(connection, cur, table, chunk_size, log):
+    rejected = []
+    columns = _columns(cur, table)
+
+    if not columns:
+        log(f"There is no {table} table.")
+        return rejected
+    if columns.get("height", "").startswith("decimal"):
+        if columns.get("bmi") != BMI_TYPE:
+            # Added as decimal(4,1) at first, which overflowed for small
+            # heights and large weights
+            cur.execute(f"""
+                ALTER TABLE {table}
+                MODIFY bmi {BMI_TYPE} AS ({BMI_EXPRESSION}) STORED
+                """)
+            connection.commit()
+            log(f"Widened bmi in {table}.")
+        else:
+            log(f"Measurements in {table} are already numeric.")
+        return rejected
+
+    if "height_cm" not in columns:
+        cur.execute(f"""
+            ALTER TABLE {table}
+            ADD COLUMN height_cm decimal(5,1) DEFAULT NULL AFTER weight,
+            ADD COLUMN weight_kg decimal(5,1) DEFAULT NULL AFTER height_cm
+            """)
+
+    if "height" in columns:
+        rejected = _backfill(connection, cur, table, chunk_size, log)
+        cur.execute(f"ALTER TABLE {table} DROP COLUMN height, DROP COLUMN weight")
+
+    cur.execute(f"""
+        ALTER TABLE {table}
+        CHANGE height_cm height decimal(5,1) DEFAULT NULL,
+        CHANGE weight_kg weight decimal(5,1) DEFAULT NULL,
+        ADD COLUMN bmi {BMI_TYPE} AS ({BMI_EXPRESSION}) STORED AFTER weight
+        """)
+    connection.commit()
+    return rejected
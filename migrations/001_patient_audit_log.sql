@@ -0,0 +1,14 @@
+-- Append-only audit trail for patients_db.
+-- Rows are only ever inserted; the (patient_id, id) index serves the
+-- newest-first keyset pagination of the per-patient history view.
+
+CREATE TABLE IF NOT EXISTS `patient_audit_log` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `patient_id` int(11) NOT NULL,
+  `doctor_id` int(11) NOT NULL,
+  `action` varchar(20) NOT NULL,
+  `changed_fields` longtext NOT NULL,
+  `changed_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_patient_audit_log_patient` (`patient_id`, `id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
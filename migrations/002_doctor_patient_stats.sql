@@ -0,0 +1,11 @@
+-- Pre-aggregated caseload counters for the dashboard, one row per
+-- (doctor, dimension, bucket). Maintained by the patient write paths;
+-- populate existing data afterwards with `FLASK_APP=main flask rebuild-stats`.
+
+CREATE TABLE IF NOT EXISTS `doctor_patient_stats` (
+  `doctor_id` int(11) NOT NULL,
+  `dimension` varchar(20) NOT NULL,
+  `bucket` varchar(50) NOT NULL,
+  `patient_count` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`doctor_id`, `dimension`, `bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
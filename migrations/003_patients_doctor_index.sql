@@ -0,0 +1,5 @@
+-- Every patient query is scoped by doctor_id; index it so loading one
+-- doctor's caseload does not scan the whole table.
+
+ALTER TABLE `patients_db`
+  ADD KEY `idx_patients_doctor_id` (`doctor_id`);
@@ -0,0 +1,22 @@
+-- Normalized allergies, vaccines, medications and chronic diseases.
+-- The free-text columns on patients_db are kept for display; link existing
+-- patients afterwards with `FLASK_APP=main flask backfill-terms`.
+
+CREATE TABLE IF NOT EXISTS `clinical_terms` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `kind` varchar(20) NOT NULL,
+  `name` varchar(255) NOT NULL,
+  `normalized_name` varchar(255) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_clinical_terms_kind_name` (`kind`, `normalized_name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- doctor_id is copied from patients_db so "patients of doctor D with term T"
+-- is a single primary key range.
+CREATE TABLE IF NOT EXISTS `patient_clinical_terms` (
+  `term_id` int(11) NOT NULL,
+  `doctor_id` int(11) NOT NULL,
+  `patient_id` int(11) NOT NULL,
+  PRIMARY KEY (`term_id`, `doctor_id`, `patient_id`),
+  KEY `idx_patient_clinical_terms_patient` (`patient_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,13 @@
+-- Last-modified timestamps maintained by MySQL itself, so every write path
+-- (including ad-hoc SQL) is covered. Used by `flask export-analytics
+-- --incremental` to find rows changed since the previous export.
+
+ALTER TABLE `patients_db`
+  ADD COLUMN `updated_at` timestamp NOT NULL
+    DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  ADD KEY `idx_patients_updated_at` (`updated_at`);
+
+ALTER TABLE `doctors_db`
+  ADD COLUMN `updated_at` timestamp NOT NULL
+    DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  ADD KEY `idx_doctors_updated_at` (`updated_at`);
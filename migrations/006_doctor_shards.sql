@@ -0,0 +1,14 @@
+-- Directory of which shard holds each doctor's patient data. Lives on the
+-- primary only; doctors without a row are on the primary. Shard databases
+-- get the full schema (all migrations) and need distinct
+-- `auto_increment_offset` settings so patient ids never collide.
+
+CREATE TABLE IF NOT EXISTS `doctor_shards` (
+  `doctor_id` int(11) NOT NULL,
+  `shard` varchar(50) NOT NULL,
+  `moving` tinyint(1) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NOT NULL
+    DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`doctor_id`),
+  KEY `idx_doctor_shards_shard` (`shard`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
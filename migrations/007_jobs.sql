@@ -0,0 +1,24 @@
+-- Background job queue, see jobs.py. Workers claim jobs in
+-- (priority DESC, id) order among the due ones, or those whose lease
+-- (`locked_until`) ran out because their worker died.
+
+CREATE TABLE IF NOT EXISTS `jobs` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `kind` varchar(50) NOT NULL,
+  `payload` text NOT NULL,
+  `owner_id` int(11) DEFAULT NULL,
+  `priority` int(11) NOT NULL DEFAULT 0,
+  `status` varchar(10) NOT NULL,
+  `attempts` int(11) NOT NULL DEFAULT 0,
+  `max_attempts` int(11) NOT NULL,
+  `run_after` datetime NOT NULL,
+  `locked_by` varchar(100) DEFAULT NULL,
+  `locked_until` datetime DEFAULT NULL,
+  `last_error` text DEFAULT NULL,
+  `created_at` datetime NOT NULL,
+  `updated_at` datetime NOT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_jobs_claim` (`status`, `priority`, `run_after`),
+  KEY `idx_jobs_owner` (`owner_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,6 @@
+-- Deleting a patient marks the row and leaves removing it, attachment
+-- included, to a background job. Marked rows are hidden from every page.
+
+ALTER TABLE `patients_db`
+  ADD COLUMN `deleted_at` datetime DEFAULT NULL,
+  ADD KEY `idx_patients_doctor_deleted` (`doctor_id`, `deleted_at`);
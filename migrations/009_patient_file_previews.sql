@@ -0,0 +1,10 @@
+-- Attachment metadata and a small WebP preview, written by the
+-- store-attachment job, so pages can show a thumbnail and link to the file
+-- without reading the attachment itself. file_digest versions the URLs of
+-- both, which lets browsers cache them for good.
+
+ALTER TABLE `patients_db`
+  ADD COLUMN `file_preview` mediumblob DEFAULT NULL,
+  ADD COLUMN `file_type` varchar(100) DEFAULT NULL,
+  ADD COLUMN `file_size` int(11) DEFAULT NULL,
+  ADD COLUMN `file_digest` char(16) DEFAULT NULL;
@@ -0,0 +1,19 @@
+-- Appointments between a doctor and their patients. They live on the
+-- doctor's shard with the patients, so apply this to every shard.
+-- Calendar and conflict queries read one range of
+-- idx_appointments_doctor_starts per request (see appointments.py).
+
+CREATE TABLE IF NOT EXISTS `appointments` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `doctor_id` int(11) NOT NULL,
+  `patient_id` int(11) NOT NULL,
+  `starts_at` datetime NOT NULL,
+  `ends_at` datetime NOT NULL,
+  `status` varchar(20) NOT NULL DEFAULT 'scheduled',
+  `notes` varchar(255) DEFAULT NULL,
+  `created_at` datetime NOT NULL,
+  `updated_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_appointments_doctor_starts` (`doctor_id`, `starts_at`),
+  KEY `idx_appointments_patient` (`patient_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
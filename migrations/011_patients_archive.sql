@@ -0,0 +1,19 @@
+-- Hot/cold split of patient records. `flask archive-patients` moves
+-- patients inactive for years, attachments included, to patients_archive;
+-- opening one moves it back. Both tables must keep the same columns, so
+-- later migrations of patients_db apply to patients_archive as well.
+-- Apply to every shard.
+
+CREATE TABLE IF NOT EXISTS `patients_archive` LIKE `patients_db`;
+
+-- Partition the hot table by doctor. Every page query filters on
+-- doctor_id, so it only reads that doctor's partition and its smaller
+-- indexes. MySQL requires the partitioning column in every unique key,
+-- hence the wider primary key; ids stay unique through AUTO_INCREMENT.
+
+ALTER TABLE `patients_db`
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (`id`, `doctor_id`);
+
+ALTER TABLE `patients_db`
+  PARTITION BY HASH (`doctor_id`) PARTITIONS 16;
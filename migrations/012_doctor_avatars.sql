@@ -0,0 +1,10 @@
+-- Doctor avatars, see avatars.py. Each upload is stored as fixed-size WebP
+-- variants; doctors_db.profile_picture holds their fingerprint, which
+-- versions the avatar URLs. Primary database only, next to doctors_db.
+
+CREATE TABLE IF NOT EXISTS `doctor_avatars` (
+  `doctor_id` int(11) NOT NULL,
+  `variant` varchar(16) NOT NULL,
+  `image` mediumblob NOT NULL,
+  PRIMARY KEY (`doctor_id`, `variant`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
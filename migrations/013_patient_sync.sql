@@ -0,0 +1,29 @@
+-- Change tracking for incremental sync, see sync.py. updated_at gets
+-- microseconds so changes within a second keep their order, and version
+-- counts the updates of each row; both are maintained by MySQL, so every
+-- write path is covered. Apply to every shard.
+
+ALTER TABLE `patients_db`
+  MODIFY `updated_at` timestamp(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  ADD COLUMN `version` int(10) unsigned NOT NULL DEFAULT 1,
+  ADD KEY `idx_patients_doctor_updated` (`doctor_id`, `updated_at`, `id`);
+
+-- patients_archive keeps the same columns as patients_db
+ALTER TABLE `patients_archive`
+  MODIFY `updated_at` timestamp(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  ADD COLUMN `version` int(10) unsigned NOT NULL DEFAULT 1;
+
+CREATE TRIGGER `patients_db_version` BEFORE UPDATE ON `patients_db`
+  FOR EACH ROW SET NEW.`version` = OLD.`version` + 1;
+
+-- Patients that left patients_db (deleted or archived), so clients holding
+-- a cursor learn to drop them. Pruned after 90 days.
+CREATE TABLE IF NOT EXISTS `patient_tombstones` (
+  `doctor_id` int(11) NOT NULL,
+  `patient_id` int(11) NOT NULL,
+  `deleted_at` timestamp(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (`doctor_id`, `patient_id`),
+  KEY `idx_tombstones_doctor_deleted` (`doctor_id`, `deleted_at`, `patient_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,11 @@
+-- Blocking keys for duplicate detection, see duplicates.py. Maintained by
+-- the registration, edit and delete paths; fill in existing patients with
+-- `flask backfill-match-keys`. Apply to every shard.
+
+CREATE TABLE IF NOT EXISTS `patient_match_keys` (
+  `doctor_id` int(11) NOT NULL,
+  `match_key` varchar(191) NOT NULL,
+  `patient_id` int(11) NOT NULL,
+  PRIMARY KEY (`doctor_id`, `match_key`, `patient_id`),
+  KEY `idx_match_keys_patient` (`doctor_id`, `patient_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
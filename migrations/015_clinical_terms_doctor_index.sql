@@ -0,0 +1,5 @@
+-- Autocomplete suggests only the terms of the doctor's own patients; index
+-- the links by doctor so loading them does not scan every doctor's.
+
+ALTER TABLE `patient_clinical_terms`
+  ADD KEY `idx_patient_clinical_terms_doctor` (`doctor_id`, `term_id`);
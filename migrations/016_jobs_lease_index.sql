@@ -0,0 +1,7 @@
+-- Workers look for expired leases separately from due jobs, and
+-- `flask purge-deleted` deletes jobs finished long ago; both filter on
+-- the status and one timestamp, see jobs.py.
+
+ALTER TABLE `jobs`
+  ADD KEY `idx_jobs_lease` (`status`, `locked_until`),
+  ADD KEY `idx_jobs_finished` (`status`, `finished_at`);
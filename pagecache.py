@@ -0,0 +1,120 @@
+"""Cache of rendered patient list pages.
+
+Each doctor has a generation counter. A cached page remembers the
+generation it was rendered at, and the patient write paths call
+:meth:`PageCache.bump` after committing, so every page rendered before the
+write is stale from then on without having to find and delete it. A hit
+is served straight from memory without touching the database.
+
+The cache and the counters are per process, and only the web app's write
+paths bump them: a write by another worker, or by a ``flask`` command
+(purges, archiving, shard moves), would leave stale pages. The cache is
+therefore off unless ``PAGE_CACHE_ENABLED`` is set, which suits a single
+worker whose patients are not changed by commands while it runs.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class PageCache:
+    """LRU cache of rendered pages keyed by ``(doctor_id, variant)``.
+
+    `variant` distinguishes pages of the same doctor (page, sort order,
+    filters). Pages are stored encoded, and memory is bounded by
+    ``PAGE_CACHE_MAX_BYTES`` of page bodies.
+
+    :param app: Flask application, see :meth:`init_app`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.hits = self.misses = self.evictions = 0
+        self._pages = OrderedDict()
+        self._generations = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PAGE_CACHE_ENABLED", False)
+        app.config.setdefault("PAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        app.extensions["page_cache"] = self
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app.config["PAGE_CACHE_ENABLED"]
+
+    def generation(self, doctor_id):
+        """Current generation; read it before querying for a page to cache"""
+        return self._generations.get(doctor_id, 0)
+
+    def bump(self, doctor_id):
+        """Invalidate every cached page of `doctor_id`"""
+        with self._lock:
+            self._generations[doctor_id] = self._generations.get(doctor_id, 0) + 1
+
+    def get(self, doctor_id, variant):
+        """The cached page, or ``None`` on a miss"""
+        if not self.enabled:
+            return None
+        key = (doctor_id, variant)
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None and entry[0] != self._generations.get(doctor_id, 0):
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, doctor_id, variant, page, generation):
+        """Store `page`, rendered from data read at `generation`.
+
+        A page whose generation was bumped while it was being rendered is
+        dropped, since it may predate the write.
+        """
+        if not self.enabled:
+            return
+        key = (doctor_id, variant)
+        max_bytes = self.app.config["PAGE_CACHE_MAX_BYTES"]
+        if len(page) > max_bytes:
+            return
+        with self._lock:
+            if generation != self._generations.get(doctor_id, 0):
+                return
+            self._discard(key)
+            self._pages[key] = (generation, page)
+            self._size += len(page)
+            while self._size > max_bytes:
+                self._discard(next(iter(self._pages)))
+                self.evictions += 1
+
+    def _discard(self, key):
+        entry = self._pages.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._pages),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._generations.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,154 @@
+"""Small previews of patient attachments.
+
+:func:`make_preview` turns an uploaded image into a thumbnail and a PDF
+into a render of its first page, encoded as WebP and kept under
+``max_bytes`` by lowering the quality and then the size. Previews are
+generated by the ``store-attachment`` job and stored next to the
+attachment, so the edit page can show one without loading the file.
+
+Pillow and pypdfium2 are imported on first use; without them attachments
+are simply stored without a preview.
+"""
+
+import hashlib
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_TYPE = "image/webp"
+MAX_SIZE = (320, 320)
+MAX_BYTES = 8 * 1024
+QUALITIES = (70, 55, 40)
+
+# Leading bytes of the formats we recognise, for the download's type
+SIGNATURES = (
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"RIFF", "image/webp"),
+)
+
+
+def detect_type(blob):
+    """MIME type of an attachment from its first bytes"""
+    for signature, mimetype in SIGNATURES:
+        if blob.startswith(signature):
+            return mimetype
+    return "application/octet-stream"
+
+
+def digest(blob):
+    """Content fingerprint, used to version attachment URLs"""
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def _open_image(blob):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(blob))
+    # Decode at a reduced size where the format allows (JPEG), instead of
+    # the full resolution of a camera photo
+    image.draft("RGB", (MAX_SIZE[0] * 2, MAX_SIZE[1] * 2))
+    return image
+
+
+def _render_pdf(blob):
+    import pypdfium2
+
+    document = pypdfium2.PdfDocument(blob)
+    try:
+        page = document[0]
+        width, height = page.get_size()
+        scale = min(MAX_SIZE[0] / width, MAX_SIZE[1] / height, 1.0)
+        return page.render(scale=scale).to_pil()
+    finally:
+        document.close()
+
+
+def encode(image, max_bytes=MAX_BYTES):
+    """Encode `image` as a WebP thumbnail of at most `max_bytes`"""
+    from PIL import ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    size = MAX_SIZE
+    while True:
+        thumbnail = image.copy()
+        thumbnail.thumbnail(size)
+        for quality in QUALITIES:
+            out = io.BytesIO()
+            thumbnail.save(out, "WEBP", quality=quality, method=6)
+            if out.tell() <= max_bytes:
+                return out.getvalue()
+        if max(size) <= 64:
+            return out.getvalue()
+        size = (size[0] * 3 // 4, size[1] * 3 // 4)
+
+
+def make_preview(blob, max_bytes=MAX_BYTES):
+    """WebP preview of an image or PDF attachment, or ``None``"""
+    mimetype = detect_type(blob)
+    try:
+        if mimetype == "application/pdf":
+            image = _render_pdf(blob)
+        elif mimetype.startswith("image/"):
+            image = _open_image(blob)
+        else:
+            return None
+        return encode(image, max_bytes)
+    except ImportError as e:
+        logger.warning("Attachment previews need %s", e.name)
+    except Exception:
+        # A damaged or unusual file still gets stored, just without preview
+        logger.exception("Could not render a %s preview", mimetype)
+    return None
+
+
+def backfill(connection, chunk_size=50, log=print):
+    """Add previews and metadata to attachments stored before they existed.
+
+    Walks ``patients_db`` in primary key order and commits per chunk, so it
+    can run against a live database. Chunks are small as each row carries
+    its attachment. Returns the number of attachments done.
+    """
+    cur = connection.cursor()
+    done = last_id = 0
+    while True:
+        cur.execute(
+            """
+            SELECT id, file_upload FROM patients_db
+            WHERE id > %s AND file_upload IS NOT NULL AND file_digest IS NULL
+            ORDER BY id LIMIT %s
+            """,
+            (last_id, chunk_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            blob = row["file_upload"]
+            cur.execute(
+                """
+                UPDATE patients_db
+                SET file_preview = %s, file_type = %s, file_size = %s,
+                    file_digest = %s
+                WHERE id = %s
+                """,
+                (
+                    make_preview(blob),
+                    detect_type(blob),
+                    len(blob),
+                    digest(blob),
+                    row["id"],
+                ),
+            )
+        connection.commit()
+        done += len(rows)
+        last_id = rows[-1]["id"]
+        log(f"Added previews for {done} attachments.")
+    cur.close()
+    return done
@@ -0,0 +1,168 @@
+"""Token bucket rate limiting for the signin form.
+
+:class:`SigninLimiter` is checked at the top of the signin view, before the
+doctor lookup and the password hash, and rejects clients that exceed their
+allowance per IP address or per email address. A bucket holds up to
+`capacity` tokens and refills at `rate` tokens per second; every attempt
+takes one.
+
+Behind reverse proxies every request comes from a proxy's address, which
+would put all clients in one bucket. Set ``TRUSTED_PROXIES`` to the number
+of proxies in front of the app, and the client address is taken from
+their ``X-Forwarded-For`` headers instead.
+
+Buckets live in :class:`MemoryBackend` by default, which is per process.
+When the app runs several worker processes, pass a shared backend such as
+:class:`RedisBackend` so all workers draw from the same buckets.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+class MemoryBackend:
+    """Buckets in a bounded, least recently used ordered dict.
+
+    Each bucket is a ``(tokens, updated_at)`` tuple. Idle buckets are
+    evicted once `max_keys` is reached; a bucket idle long enough to be
+    evicted has usually refilled anyway.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Take a token from `key`; returns seconds to wait, 0 if allowed"""
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Same algorithm as MemoryBackend.take, run atomically inside Redis
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared between processes through a Redis server.
+
+    :param client: a ``redis.Redis`` instance.
+    """
+
+    def __init__(self, client, prefix="medix:signin:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_REDIS_TAKE)
+
+    def take(self, key, capacity, rate, now):
+        wait = self._take(keys=[self.prefix + key], args=[capacity, rate, now])
+        return float(wait)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class SigninLimiter:
+    """Per-IP and per-email token buckets for signin attempts.
+
+    :param app: Flask application, see :meth:`init_app`.
+    :param backend: bucket store with a ``take(key, capacity, rate, now)``
+        method; defaults to :class:`MemoryBackend`.
+    """
+
+    def __init__(self, app=None, backend=None):
+        self.app = None
+        self.backend = backend
+        self.rejected = Counter()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        # (capacity, refill per second): bursts of 20 per IP, 10 a minute
+        # sustained; 5 per account, then one every 30 seconds
+        app.config.setdefault("RATELIMIT_SIGNIN_IP", (20, 10 / 60))
+        app.config.setdefault("RATELIMIT_SIGNIN_EMAIL", (5, 1 / 30))
+        app.config.setdefault("RATELIMIT_MAX_KEYS", 100000)
+        # Proxies whose X-Forwarded-For is trusted for request.remote_addr;
+        # only set it when they are the only way in, as the header is
+        # otherwise the client's to choose
+        app.config.setdefault("TRUSTED_PROXIES", 0)
+        if app.config["TRUSTED_PROXIES"]:
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
+        if self.backend is None:
+            self.backend = MemoryBackend(app.config["RATELIMIT_MAX_KEYS"])
+        app.extensions["signin_limiter"] = self
+        self.app = app
+
+    def check(self, ip, email):
+        """Seconds the client must wait before trying again, or 0.
+
+        The IP bucket is checked first so a flood from one address does not
+        also drain the buckets of the accounts it targets.
+        """
+        if not self.app.config["RATELIMIT_ENABLED"]:
+            return 0
+        now = time.time()
+        buckets = (
+            ("ip", ip, self.app.config["RATELIMIT_SIGNIN_IP"]),
+            (
+                "email",
+                email.strip().casefold(),
+                self.app.config["RATELIMIT_SIGNIN_EMAIL"],
+            ),
+        )
+        for scope, value, (capacity, rate) in buckets:
+            wait = self.backend.take(f"{scope}:{value}", capacity, rate, now)
+            if wait:
+                with self._lock:
+                    self.rejected[scope] += 1
+                return wait
+        return 0
+
+    def stats(self):
+        """Rejection counts since startup, by bucket scope"""
+        with self._lock:
+            return {"ip": self.rejected["ip"], "email": self.rejected["email"]}
+
+    def reset(self):
+        """Forget all buckets and counters"""
+        self.backend.clear()
+        with self._lock:
+            self.rejected.clear()
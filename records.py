@@ -0,0 +1,106 @@
+"""Compact rows for list and bulk queries.
+
+The app's connections default to ``DictCursor``, which builds a dict per
+row, each with its own hash table of repeated column names. Queries that
+return many rows instead use a tuple cursor (``connection.cursor(Cursor)``)
+and turn the tuples into instances of a :func:`record_type`: a class with
+``__slots__`` and no per-instance dict, made once per query shape. Fields
+are read as attributes, so templates are unchanged (``patient.first_name``),
+and by key for code written against dict rows (``patient["first_name"]``).
+"""
+
+import keyword
+from itertools import starmap
+
+# Columns of the My Patients list, in the order its queries select them
+PATIENT_LIST_FIELDS = (
+    "patient_id",
+    "first_name",
+    "last_name",
+    "birth_date",
+    "gender",
+    "email_address",
+    "health_insurance_number",
+)
+
+
+class Record:
+    """Base class of the classes made by :func:`record_type`"""
+
+    __slots__ = ()
+    _fields = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self._fields
+
+    def _asdict(self):
+        return {field: getattr(self, field) for field in self._fields}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def _astuple(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{field}={getattr(self, field)!r}" for field in self._fields
+        )
+        return f"{type(self).__name__}({values})"
+
+
+def record_type(name, fields):
+    """A :class:`Record` subclass with one slot per field.
+
+    The constructor takes the values positionally, in `fields` order, as
+    in a row from a tuple cursor, or by name as in a dict row.
+    """
+    fields = tuple(fields)
+    for field in fields:
+        if (
+            not field.isidentifier()
+            or keyword.iskeyword(field)
+            or field.startswith("_")
+        ):
+            raise ValueError(f"Invalid record field name {field!r}")
+    if len(set(fields)) != len(fields):
+        raise ValueError(f"Duplicate record field names in {fields!r}")
+    # Generated like namedtuple's, so construction is one plain function
+    # call with no loop over the fields; only the names checked above go
+    # into the code
+    args = ", ".join(fields)
+    body = "".join(f"    self.{field} = {field}\n" for field in fields) or "    pass\n"
+    namespace = {}
+    exec(f"def __init__(self, {args}):\n{body}", namespace)  # noqa: S102
+    return type(
+        name,
+        (Record,),
+        {"__slots__": fields, "_fields": fields, "__init__": namespace["__init__"]},
+    )
+
+
+def fetch_records(cur, record_cls):
+    """All rows of the last query on `cur` as `record_cls` instances.
+
+    `cur` should be a tuple cursor with the columns in field order; rows
+    from a dict cursor are accepted too, matched by column name.
+    """
+    rows = cur.fetchall()
+    if rows and isinstance(rows[0], dict):
+        fields = record_cls._fields
+        return [record_cls(*[row[field] for field in fields]) for row in rows]
+    return list(starmap(record_cls, rows))
+
+
+PatientListRow = record_type("PatientListRow", PATIENT_LIST_FIELDS)
@@ -0,0 +1,20 @@
+"""Reading table definitions from the live database."""
+
+
+def stored_columns(cur, table):
+    """Columns of `table` that can be written, in table order.
+
+    Generated columns such as ``patients_db.bmi`` are left out: MySQL
+    refuses values for them, so statements copying rows between tables
+    list the stored columns instead of using ``SELECT *``.
+    """
+    cur.execute(
+        """
+        SELECT COLUMN_NAME AS name FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+          AND EXTRA NOT LIKE '%%GENERATED%%'
+        ORDER BY ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    return [row["name"] for row in cur.fetchall()]
@@ -0,0 +1,380 @@
+"""Sharding of patient data by doctor.
+
+Every patient query is scoped by ``doctor_id``, so a doctor's patients,
+their condition term links and their dashboard counters live together on
+one shard. ``doctor_shards`` on the primary database is the directory
+that says which; doctors without an entry (everyone from before sharding)
+are on the primary itself. ``doctors_db``, the directory and the audit
+trail stay on the primary.
+
+Shards are configured in ``DB_SHARDS`` as pymysql settings that override
+the primary's, and each is a database with the full schema. Patient ids
+must stay unique across shards so records can move without renumbering:
+give each shard server its own ``auto_increment_offset`` with a shared
+``auto_increment_increment``.
+
+:func:`move_doctor` moves a doctor to another shard while the app keeps
+serving them: rows are copied in the background, then writes for that
+doctor are refused for the few seconds it takes to copy what changed
+meanwhile and switch the directory entry. Reads are never interrupted.
+"""
+
+import time
+
+import pymysql
+from flask import g
+
+import conditions
+import schema
+
+PRIMARY_SHARD = "primary"
+
+# Tables holding a doctor's patient data, besides patients_db itself
+DOCTOR_TABLES = (
+    "patient_clinical_terms",
+    "doctor_patient_stats",
+    "appointments",
+    "patient_tombstones",
+    "patient_match_keys",
+)
+
+
+class ShardMoving(Exception):
+    """The doctor's records are being moved; writes must wait"""
+
+    def __init__(self, doctor_id):
+        super().__init__(
+            "Your patient records are being moved to another server. "
+            "Please try again in a few seconds."
+        )
+        self.doctor_id = doctor_id
+
+
+class ShardRouter:
+    """Finds the shard of a doctor and hands out connections to it.
+
+    :param app: Flask application, see :meth:`init_app`.
+    :param primary: callable returning the request's primary connection.
+    :param reader: callable returning a connection for read-only queries on
+        the primary, such as :meth:`dbrouting.DatabaseRouter.reader`.
+    :param connect: callable taking pymysql keyword arguments and returning
+        a new connection; defaults to :func:`pymysql.connect`.
+    """
+
+    def __init__(self, app=None, primary=None, reader=None, connect=None):
+        self.app = None
+        self.primary = primary
+        self.reader_of_primary = reader or primary
+        self.connect = connect or pymysql.connect
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # {"shard-1": {"host": "db-shard-1"}, ...}
+        app.config.setdefault("DB_SHARDS", {})
+        # Shards that receive new doctors; defaults to all of them
+        app.config.setdefault("DB_SHARDS_FOR_NEW_DOCTORS", None)
+        app.teardown_appcontext(self.teardown)
+        app.extensions["shard_router"] = self
+        self.app = app
+
+    @property
+    def shards(self):
+        return self.app.config["DB_SHARDS"]
+
+    def shard_for(self, doctor_id):
+        """``(shard name, moving)`` from the directory, once per request"""
+        if not self.shards:
+            return PRIMARY_SHARD, False
+        directory = g.setdefault("shard_directory", {})
+        if doctor_id not in directory:
+            # Always read from the primary: a replica may miss a recent move
+            cur = self.primary().cursor()
+            try:
+                cur.execute(
+                    "SELECT shard, moving FROM doctor_shards WHERE doctor_id = %s",
+                    (doctor_id,),
+                )
+                row = cur.fetchone()
+            finally:
+                cur.close()
+            directory[doctor_id] = (
+                (row["shard"], bool(row["moving"])) if row else (PRIMARY_SHARD, False)
+            )
+        return directory[doctor_id]
+
+    def connection(self, doctor_id):
+        """Connection for writes (and the reads they depend on).
+
+        Raises :class:`ShardMoving` while the doctor is being moved.
+        """
+        shard, moving = self.shard_for(doctor_id)
+        if moving:
+            raise ShardMoving(doctor_id)
+        return self._shard_connection(shard, self.primary)
+
+    def reader(self, doctor_id, fresh=False):
+        """Connection for read-only queries on the doctor's patients.
+
+        With `fresh`, never a replica: for reads that must not miss recent
+        writes, even while the doctor is being moved.
+        """
+        shard, _ = self.shard_for(doctor_id)
+        return self._shard_connection(
+            shard, self.primary if fresh else self.reader_of_primary
+        )
+
+    def all_readers(self):
+        """A read connection to every shard, for queries across doctors"""
+        return [
+            self._shard_connection(shard, self.reader_of_primary)
+            for shard in (PRIMARY_SHARD, *self.shards)
+        ]
+
+    def _shard_connection(self, shard, primary):
+        if shard == PRIMARY_SHARD:
+            return primary()
+        connections = g.setdefault("shard_connections", {})
+        if shard not in connections:
+            connections[shard] = self.connect_shard(shard)
+        return connections[shard]
+
+    def connect_shard(self, shard):
+        """A new connection to `shard`; the caller closes it"""
+        kwargs = dict(self.app.config["pymysql_kwargs"] or {})
+        if shard != PRIMARY_SHARD:
+            if shard not in self.shards:
+                raise KeyError(f"Shard {shard!r} is not configured in DB_SHARDS")
+            kwargs.update(self.shards[shard])
+        return self.connect(**kwargs)
+
+    def assign(self, cur, doctor_id):
+        """Place a new doctor on the shard with the fewest doctors.
+
+        Runs inside the caller's transaction on the primary.
+        """
+        if not self.shards:
+            return PRIMARY_SHARD
+        candidates = self.app.config["DB_SHARDS_FOR_NEW_DOCTORS"] or list(self.shards)
+        cur.execute(
+            "SELECT shard, COUNT(*) AS doctors FROM doctor_shards GROUP BY shard"
+        )
+        load = {row["shard"]: row["doctors"] for row in cur.fetchall()}
+        shard = min(candidates, key=lambda name: (load.get(name, 0), name))
+        cur.execute(
+            "INSERT INTO doctor_shards (doctor_id, shard) VALUES (%s, %s)",
+            (doctor_id, shard),
+        )
+        return shard
+
+    def teardown(self, exception):
+        g.pop("shard_directory", None)
+        for connection in g.pop("shard_connections", {}).values():
+            connection.close()
+
+
+def _copy_rows(source_cur, target_cur, table, where, params):
+    # Generated columns (patients' bmi) are computed again on the target
+    columns = schema.stored_columns(source_cur, table)
+    source_cur.execute(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE {where}", params
+    )
+    rows = source_cur.fetchall()
+    if rows:
+        target_cur.executemany(
+            f"REPLACE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})",
+            [tuple(row[column] for column in columns) for row in rows],
+        )
+    return rows
+
+
+def copy_patients(
+    source, target, doctor_id, since=None, chunk_size=500, table="patients_db"
+):
+    """Copy a doctor's patients (changed at or after `since`) in id order.
+
+    Commits on `target` per chunk. Returns the ids copied.
+    """
+    source_cur, target_cur = source.cursor(), target.cursor()
+    where = "doctor_id = %s AND id > %s"
+    if since is not None:
+        where += " AND updated_at >= %s"
+    copied = []
+    last_id = 0
+    try:
+        while True:
+            params = (doctor_id, last_id) + ((since,) if since is not None else ())
+            rows = _copy_rows(
+                source_cur,
+                target_cur,
+                table,
+                f"{where} ORDER BY id LIMIT {int(chunk_size)}",
+                params,
+            )
+            target.commit()
+            if not rows:
+                return copied
+            copied.extend(row["id"] for row in rows)
+            last_id = rows[-1]["id"]
+    finally:
+        source_cur.close()
+        target_cur.close()
+
+
+def _patient_ids(connection, doctor_id, table="patients_db"):
+    cur = connection.cursor()
+    try:
+        cur.execute(f"SELECT id FROM {table} WHERE doctor_id = %s", (doctor_id,))
+        return {row["id"] for row in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def purge_doctor(connection, doctor_id):
+    """Delete a doctor's patient data from one shard"""
+    cur = connection.cursor()
+    try:
+        for table in (*DOCTOR_TABLES, "patients_db", "patients_archive"):
+            cur.execute(f"DELETE FROM {table} WHERE doctor_id = %s", (doctor_id,))
+        connection.commit()
+    finally:
+        cur.close()
+
+
+def _set_directory(directory, doctor_id, shard, moving):
+    cur = directory.cursor()
+    try:
+        cur.execute(
+            "REPLACE INTO doctor_shards (doctor_id, shard, moving) VALUES (%s, %s, %s)",
+            (doctor_id, shard, int(moving)),
+        )
+        directory.commit()
+    finally:
+        cur.close()
+
+
+def move_doctor(
+    directory,
+    source,
+    target,
+    doctor_id,
+    source_shard,
+    target_shard,
+    chunk_size=500,
+    grace=2.0,
+    log=print,
+    sleep=time.sleep,
+):
+    """Move a doctor's patient data from `source` to `target` online.
+
+    1. Copy every patient, archived ones too, while the app keeps reading
+       and writing.
+    2. Flag the doctor as moving, which makes the app refuse their writes,
+       and wait `grace` seconds for requests already past that check.
+    3. Copy the patients changed since step 1 started, drop the ones
+       deleted meanwhile, bring the archive up to date, and copy the term
+       links, counters, appointments, sync tombstones and duplicate
+       match keys.
+    4. Point the directory at `target`, which also lifts the flag.
+    5. Delete the doctor's data from `source`.
+
+    If anything fails before step 4 the copy on `target` is discarded and
+    the doctor stays on `source`. Returns the number of patients moved.
+    """
+    cur = source.cursor()
+    cur.execute("SELECT NOW() AS now")
+    started = cur.fetchone()["now"]
+    cur.close()
+
+    try:
+        copied = copy_patients(source, target, doctor_id, chunk_size=chunk_size)
+        archived = copy_patients(
+            source, target, doctor_id, chunk_size=chunk_size, table="patients_archive"
+        )
+        log(
+            f"Copied {len(copied)} patients and {len(archived)} archived patients "
+            f"of doctor {doctor_id}."
+        )
+
+        _set_directory(directory, doctor_id, source_shard, True)
+        sleep(grace)
+
+        changed = copy_patients(
+            source, target, doctor_id, since=started, chunk_size=chunk_size
+        )
+        gone = _patient_ids(target, doctor_id) - _patient_ids(source, doctor_id)
+        # Archived rows never change, but patients may have been archived or
+        # restored since the first copy
+        source_archive = _patient_ids(source, doctor_id, "patients_archive")
+        target_archive = _patient_ids(target, doctor_id, "patients_archive")
+        source_cur, target_cur = source.cursor(), target.cursor()
+        try:
+            for table, ids in (
+                ("patients_db", gone),
+                ("patients_archive", target_archive - source_archive),
+            ):
+                if ids:
+                    target_cur.execute(
+                        f"DELETE FROM {table} WHERE id IN "
+                        f"({', '.join(['%s'] * len(ids))})",
+                        tuple(ids),
+                    )
+            newly_archived = sorted(source_archive - target_archive)
+            for i in range(0, len(newly_archived), chunk_size):
+                chunk = newly_archived[i : i + chunk_size]
+                _copy_rows(
+                    source_cur,
+                    target_cur,
+                    "patients_archive",
+                    f"id IN ({', '.join(['%s'] * len(chunk))})",
+                    tuple(chunk),
+                )
+            # Term ids are local to each shard, so links are rebuilt from
+            # the patients' text rather than copied. Archived patients keep
+            # theirs for when they are restored.
+            target_cur.execute(
+                "DELETE FROM patient_clinical_terms WHERE doctor_id = %s",
+                (doctor_id,),
+            )
+            for table in ("patients_db", "patients_archive"):
+                source_cur.execute(
+                    f"""
+                    SELECT id, {", ".join(conditions.KINDS)} FROM {table}
+                    WHERE doctor_id = %s
+                    """,
+                    (doctor_id,),
+                )
+                for row in source_cur.fetchall():
+                    for kind in conditions.KINDS:
+                        conditions.sync_patient_terms(
+                            target_cur, doctor_id, row["id"], kind, row[kind]
+                        )
+            for table in (
+                "doctor_patient_stats",
+                "appointments",
+                "patient_tombstones",
+                "patient_match_keys",
+            ):
+                target_cur.execute(
+                    f"DELETE FROM {table} WHERE doctor_id = %s", (doctor_id,)
+                )
+                _copy_rows(
+                    source_cur, target_cur, table, "doctor_id = %s", (doctor_id,)
+                )
+            target.commit()
+        finally:
+            source_cur.close()
+            target_cur.close()
+        log(f"Caught up {len(changed)} changed and {len(gone)} deleted patients.")
+    except Exception:
+        target.rollback()
+        purge_doctor(target, doctor_id)
+        _set_directory(directory, doctor_id, source_shard, False)
+        raise
+
+    _set_directory(directory, doctor_id, target_shard, False)
+    log(f"Doctor {doctor_id} now reads and writes {target_shard}.")
+
+    purge_doctor(source, doctor_id)
+    return len(_patient_ids(target, doctor_id))
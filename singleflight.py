@@ -0,0 +1,142 @@
+"""Collapsing identical concurrent reads into one database call.
+
+When several requests ask for the same data at once (a clinic's shared
+screen and its staff opening the same doctor's dashboard), the first one
+runs the query and the others wait for its result instead of running it
+again. Nothing is kept once the call returns: this is not a cache, only
+the calls that overlap in time are shared.
+
+Keys must identify the data read, including whatever invalidates it: the
+doctor-scoped reads include the doctor's :class:`~pagecache.PageCache`
+generation, so a request that follows a write never joins a call that
+started before it. Results are shared between requests and must be
+treated as read-only.
+
+:meth:`SingleFlight.do` serves threaded workers (and gevent or eventlet
+workers, whose monkey-patched locks it uses); :meth:`SingleFlight.do_async`
+serves coroutines on an asyncio event loop.
+"""
+
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    __slots__ = ("done", "error", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares its outcome.
+
+    :param app: Flask application, see :meth:`init_app`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.calls = self.executed = self.collapsed = self.timeouts = 0
+        self._flights = {}
+        self._async_flights = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SINGLE_FLIGHT_ENABLED", True)
+        # A waiter whose leader takes longer than this runs the call itself
+        app.config.setdefault("SINGLE_FLIGHT_TIMEOUT", 10.0)
+        app.extensions["single_flight"] = self
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config["SINGLE_FLIGHT_ENABLED"]
+
+    def do(self, key, function):
+        """``function()``, or the outcome of the same key's call in progress"""
+        if not self.enabled:
+            return function()
+        with self._lock:
+            self.calls += 1
+            call = self._flights.get(key)
+            leader = call is None
+            if leader:
+                call = self._flights[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.app.config["SINGLE_FLIGHT_TIMEOUT"]):
+                with self._lock:
+                    self.collapsed += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            with self._lock:
+                self.timeouts += 1
+                self.executed += 1
+            return function()
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self.executed += 1
+                del self._flights[key]
+            call.done.set()
+
+    async def do_async(self, key, function):
+        """``await function()``, or the outcome of the same key's call in
+        progress on this event loop"""
+        if not self.enabled:
+            return await function()
+        flights = self._async_flights.setdefault(asyncio.get_running_loop(), {})
+        with self._lock:
+            self.calls += 1
+        future = flights.get(key)
+        if future is not None:
+            # Shielded, so a waiter that is cancelled does not cancel the
+            # call for everybody else
+            result = await asyncio.shield(future)
+            with self._lock:
+                self.collapsed += 1
+            return result
+
+        future = flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await function()
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so an error nobody waited for is not reported
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del flights[key]
+            with self._lock:
+                self.executed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._flights),
+                "collapse_rate": (
+                    round(self.collapsed / self.calls, 3) if self.calls else None
+                ),
+            }
+
+    def clear(self):
+        with self._lock:
+            self.calls = self.executed = self.collapsed = self.timeouts = 0
@@ -0,0 +1,213 @@
+"""Per-doctor caseload statistics for the dashboard.
+
+``doctor_patient_stats`` holds one counter row per ``(doctor_id, dimension,
+bucket)``. The patient write paths adjust the affected counters in the same
+transaction as the write, so the dashboard reads a handful of rows instead
+of aggregating a doctor's whole caseload.
+"""
+
+from datetime import date
+
+TOTAL = "total"
+GENDER = "gender"
+BIRTH_YEAR = "birth_year"
+BLOOD_GROUP = "blood_group"
+REGISTERED_MONTH = "registered_month"
+
+UNKNOWN = "unknown"
+
+# Age bands shown on the dashboard as (label, lowest age, highest age)
+AGE_BANDS = (
+    ("0-17", 0, 17),
+    ("18-34", 18, 34),
+    ("35-49", 35, 49),
+    ("50-64", 50, 64),
+    ("65+", 65, None),
+)
+
+RECENT_MONTHS = 6
+
+# Columns whose values decide which buckets a patient is counted in
+STATS_FIELDS = ("gender", "birth_date", "blood_group")
+
+UPSERT_SQL = """
+    INSERT INTO doctor_patient_stats (doctor_id, dimension, bucket, patient_count)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE patient_count = patient_count + VALUES(patient_count)
+"""
+
+# Rebuild queries; the bucket expressions must match the ``_*_bucket``
+# helpers below.
+REBUILD_SQL = (
+    """
+    SELECT doctor_id, 'total', '', COUNT(*)
+    FROM patients_db {where}
+    GROUP BY doctor_id
+    """,
+    """
+    SELECT doctor_id, 'gender',
+           COALESCE(NULLIF(LOWER(TRIM(gender)), ''), 'unknown'), COUNT(*)
+    FROM patients_db {where}
+    GROUP BY 1, 3
+    """,
+    """
+    SELECT doctor_id, 'birth_year',
+           COALESCE(CAST(YEAR(birth_date) AS CHAR), 'unknown'), COUNT(*)
+    FROM patients_db {where}
+    GROUP BY 1, 3
+    """,
+    """
+    SELECT doctor_id, 'blood_group',
+           COALESCE(NULLIF(UPPER(TRIM(blood_group)), ''), 'unknown'), COUNT(*)
+    FROM patients_db {where}
+    GROUP BY 1, 3
+    """,
+)
+
+
+def _gender_bucket(value):
+    return (value or "").strip().lower() or UNKNOWN
+
+
+def _blood_group_bucket(value):
+    return (value or "").strip().upper() or UNKNOWN
+
+
+def _birth_year_bucket(value):
+    if hasattr(value, "year"):
+        return str(value.year)
+    year = str(value or "")[:4]
+    return year if year.isdigit() and year != "0000" else UNKNOWN
+
+
+def patient_buckets(patient):
+    """The ``(dimension, bucket)`` pairs a patient row is counted in"""
+    return [
+        (TOTAL, ""),
+        (GENDER, _gender_bucket(patient.get("gender"))),
+        (BIRTH_YEAR, _birth_year_bucket(patient.get("birth_date"))),
+        (BLOOD_GROUP, _blood_group_bucket(patient.get("blood_group"))),
+    ]
+
+
+def apply_delta(cur, doctor_id, buckets, delta):
+    """Add `delta` to each counter in `buckets` for `doctor_id`"""
+    if buckets:
+        cur.executemany(
+            UPSERT_SQL,
+            [(doctor_id, dimension, bucket, delta) for dimension, bucket in buckets],
+        )
+
+
+def record_created(cur, doctor_id, patient, today=None):
+    """Count a newly registered patient; call before committing the insert"""
+    month = (today or date.today()).strftime("%Y-%m")
+    apply_delta(
+        cur, doctor_id, [*patient_buckets(patient), (REGISTERED_MONTH, month)], 1
+    )
+
+
+def record_updated(cur, doctor_id, stored, changes):
+    """Move a patient between buckets after an edit of `changes`"""
+    if not any(column in changes for column in STATS_FIELDS):
+        return
+    old = set(patient_buckets(stored))
+    new = set(patient_buckets({**stored, **changes}))
+    apply_delta(cur, doctor_id, sorted(old - new), -1)
+    apply_delta(cur, doctor_id, sorted(new - old), 1)
+
+
+def record_deleted(cur, doctor_id, stored):
+    """Remove a deleted patient from its buckets.
+
+    Monthly registration counts are left alone: they count registrations
+    that happened, not patients still on file.
+    """
+    apply_delta(cur, doctor_id, patient_buckets(stored), -1)
+
+
+def load_summary(cur, doctor_id, today=None):
+    """Read a doctor's counters and shape them for the dashboard.
+
+    The number of rows read depends on how many distinct buckets exist (at
+    most a few hundred), not on how many patients the doctor has.
+    """
+    cur.execute(
+        """
+        SELECT dimension, bucket, patient_count
+        FROM doctor_patient_stats
+        WHERE doctor_id = %s AND patient_count <> 0
+        """,
+        (doctor_id,),
+    )
+    counts = {}
+    for row in cur.fetchall():
+        counts.setdefault(row["dimension"], {})[row["bucket"]] = row["patient_count"]
+    return summarize(counts, today)
+
+
+def summarize(counts, today=None):
+    """Shape ``{dimension: {bucket: count}}`` for the dashboard; with no
+    counts, an empty summary"""
+    today = today or date.today()
+    age_bands = {label: 0 for label, _, _ in AGE_BANDS}
+    age_unknown = 0
+    for year, count in counts.get(BIRTH_YEAR, {}).items():
+        if not year.isdigit():
+            age_unknown += count
+            continue
+        age = today.year - int(year)
+        for label, low, high in AGE_BANDS:
+            if age >= low and (high is None or age <= high):
+                age_bands[label] += count
+                break
+        else:
+            age_unknown += count
+    if age_unknown:
+        age_bands[UNKNOWN] = age_unknown
+
+    months = []
+    year, month = today.year, today.month
+    for _ in range(RECENT_MONTHS):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    registrations = counts.get(REGISTERED_MONTH, {})
+
+    return {
+        "total_patients": counts.get(TOTAL, {}).get("", 0),
+        "gender": dict(sorted(counts.get(GENDER, {}).items())),
+        "age_bands": age_bands,
+        "blood_groups": dict(sorted(counts.get(BLOOD_GROUP, {}).items())),
+        "recent_registrations": {
+            month: registrations.get(month, 0) for month in reversed(months)
+        },
+    }
+
+
+def rebuild(cur, doctor_id=None):
+    """Recompute the counters from ``patients_db``.
+
+    Rebuilds every doctor, or only `doctor_id` when given. Monthly
+    registration counts cannot be derived from the patient rows and are kept.
+    Returns the number of counter rows written.
+    """
+    # Deleted patients are already subtracted and wait to be purged
+    where, params = "WHERE deleted_at IS NULL", ()
+    if doctor_id is not None:
+        where, params = where + " AND doctor_id = %s", (doctor_id,)
+
+    cur.execute(
+        f"DELETE FROM doctor_patient_stats WHERE dimension <> %s "
+        f"{'AND doctor_id = %s' if doctor_id is not None else ''}",
+        (REGISTERED_MONTH, *params),
+    )
+    written = 0
+    for query in REBUILD_SQL:
+        cur.execute(
+            "INSERT INTO doctor_patient_stats "
+            "(doctor_id, dimension, bucket, patient_count) "
+            + query.format(where=where),
+            params,
+        )
+        written += cur.rowcount
+    return written
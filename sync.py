@@ -0,0 +1,195 @@
+"""Incremental sync of a doctor's patients for offline and mobile clients.
+
+A client keeps the opaque cursor returned with each page and sends it
+back to receive only what changed since: patients written since (with
+their ``version``, which MySQL increments on every update) and the ids of
+patients deleted or archived since, from ``patient_tombstones``. Without
+a cursor the first pages list every patient. Steady-state traffic is
+proportional to edits, not to the size of the caseload.
+
+Changes are read in ``(updated_at, id)`` order up to
+:data:`SETTLE_SECONDS` ago: a transaction stamps its rows when it writes
+them but they only become visible when it commits, and the lag lets
+slower transactions commit before the cursor passes their timestamps.
+Pages must be read from the primary: a replica's clock runs ahead of the
+rows it has applied, so it could move the cursor past rows still on their
+way to it.
+
+Tombstones older than :data:`TOMBSTONE_DAYS` are pruned by
+``flask prune-tombstones``; a client whose cursor is older than that has
+to sync from scratch.
+"""
+
+import base64
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+SETTLE_SECONDS = 5
+TOMBSTONE_DAYS = 90
+
+PATIENT_FIELDS = (
+    "id",
+    "first_name",
+    "last_name",
+    "birth_date",
+    "gender",
+    "nationality",
+    "health_insurance_number",
+    "email_address",
+    "phone_number",
+    "address",
+    "emergency_contact_name",
+    "emergency_contact_number",
+    "height",
+    "weight",
+    "bmi",
+    "blood_group",
+    "genotype",
+    "allergies",
+    "chronic_diseases",
+    "disabilities",
+    "vaccines",
+    "medications",
+    "doctors_note",
+    "file_digest",
+    "version",
+    "updated_at",
+)
+
+
+class CursorExpired(Exception):
+    """The cursor predates the oldest tombstones kept"""
+
+
+def encode_cursor(position, last_id):
+    """Opaque cursor for after `last_id` at `position`, or after every
+    change at `position` when `last_id` is ``None``"""
+    raw = json.dumps([position.isoformat(), last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """``(position, last_id)``; raises :class:`ValueError` if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position, last_id = json.loads(raw)
+        if last_id is not None and not isinstance(last_id, int):
+            raise ValueError
+        return datetime.fromisoformat(position), last_id
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid sync cursor: {cursor!r}")
+
+
+def _after(column, id_column, since, last_id):
+    if last_id is None:
+        return f" AND {column} > %s", [since]
+    return (
+        f" AND ({column} > %s OR ({column} = %s AND {id_column} > %s))",
+        [since, since, last_id],
+    )
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def changes(cur, doctor_id, cursor=None, limit=500, now=None):
+    """One page of changes to a doctor's patients since `cursor`.
+
+    Returns ``{"patients": [...], "deleted": [ids], "cursor": ...,
+    "has_more": bool}``. Raises :class:`ValueError` for a malformed cursor
+    and :class:`CursorExpired` for one older than the tombstones kept.
+    `now` defaults to the database clock, which stamps the rows.
+    """
+    if now is None:
+        cur.execute("SELECT NOW() AS now")
+        now = cur.fetchone()["now"]
+    until = now - timedelta(seconds=SETTLE_SECONDS)
+
+    query = f"""
+        SELECT {", ".join(PATIENT_FIELDS)} FROM patients_db
+        WHERE doctor_id = %s AND deleted_at IS NULL AND updated_at <= %s
+    """
+    params = [doctor_id, until]
+    if cursor is not None:
+        since, last_id = decode_cursor(cursor)
+        if since < now - timedelta(days=TOMBSTONE_DAYS):
+            raise CursorExpired(cursor)
+        clause, clause_params = _after("updated_at", "id", since, last_id)
+        query += clause
+        params += clause_params
+    cur.execute(query + " ORDER BY updated_at, id LIMIT %s", params + [limit + 1])
+    items = [(row["updated_at"], row["id"], row) for row in cur.fetchall()]
+
+    # A first sync has nothing to delete
+    if cursor is not None:
+        clause, clause_params = _after("deleted_at", "patient_id", since, last_id)
+        cur.execute(
+            f"""
+            SELECT patient_id, deleted_at FROM patient_tombstones
+            WHERE doctor_id = %s AND deleted_at <= %s {clause}
+            ORDER BY deleted_at, patient_id LIMIT %s
+            """,
+            [doctor_id, until, *clause_params, limit + 1],
+        )
+        items += [
+            (row["deleted_at"], row["patient_id"], None) for row in cur.fetchall()
+        ]
+
+    items.sort(key=lambda item: (item[0], item[1]))
+    has_more = len(items) > limit
+    items = items[:limit]
+    if has_more:
+        next_cursor = encode_cursor(items[-1][0], items[-1][1])
+    else:
+        next_cursor = encode_cursor(until, None)
+    return {
+        "patients": [
+            {field: _value(row[field]) for field in PATIENT_FIELDS}
+            for _, _, row in items
+            if row is not None
+        ],
+        "deleted": [patient_id for _, patient_id, row in items if row is None],
+        "cursor": next_cursor,
+        "has_more": has_more,
+    }
+
+
+def record_deleted(cur, patients):
+    """Leave tombstones for `patients`, ``(doctor_id, patient_id)`` pairs
+    leaving ``patients_db``.
+
+    Runs inside the caller's transaction; the database stamps them.
+    """
+    cur.executemany(
+        "REPLACE INTO patient_tombstones (doctor_id, patient_id) VALUES (%s, %s)",
+        list(patients),
+    )
+
+
+def forget_deleted(cur, doctor_id, patient_id):
+    """Drop the tombstone of a patient coming back (restored from the
+    archive); runs inside the caller's transaction"""
+    cur.execute(
+        "DELETE FROM patient_tombstones WHERE doctor_id = %s AND patient_id = %s",
+        (doctor_id, patient_id),
+    )
+
+
+def prune_tombstones(connection, days=TOMBSTONE_DAYS):
+    """Delete tombstones older than `days`; returns how many"""
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            "DELETE FROM patient_tombstones WHERE deleted_at < NOW() - INTERVAL %s DAY",
+            (days,),
+        )
+        connection.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
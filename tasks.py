@@ -0,0 +1,107 @@
+"""Handlers for the background jobs run by ``flask run-jobs``.
+
+Each may run more than once for the same job (see :mod:`jobs`), so they
+are written to be idempotent.
+"""
+
+import os
+
+import previews
+from audit import describe_changes
+from extensions import audit_log, job_queue, shard_router
+
+STORE_ATTACHMENT = "store-attachment"
+PURGE_PATIENT = "purge-patient"
+
+# Deleted patients still stored after this long lost their purge job
+PURGE_GRACE_MINUTES = 60
+
+
+@job_queue.handler(STORE_ATTACHMENT, priority=10)
+def store_attachment(payload):
+    """Write an upload staged in the spool directory to its patient, with
+    its preview and metadata"""
+    patient_id, doctor_id = payload["patient_id"], payload["doctor_id"]
+    if not os.path.exists(payload["path"]):
+        # Stored by an earlier run that died before marking the job done
+        return
+    with open(payload["path"], "rb") as f:
+        blob = f.read()
+    # Rendered before opening the transaction, as it can take a moment
+    preview = previews.make_preview(blob)
+
+    connection = shard_router.connection(doctor_id)
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            """
+            UPDATE patients_db
+            SET file_upload = %s, file_preview = %s, file_type = %s,
+                file_size = %s, file_digest = %s
+            WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+            """,
+            (
+                blob,
+                preview,
+                previews.detect_type(blob),
+                len(blob),
+                previews.digest(blob),
+                patient_id,
+                doctor_id,
+            ),
+        )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    os.remove(payload["path"])
+    audit_log.record(
+        doctor_id, patient_id, "update", describe_changes(None, {"file_upload": blob})
+    )
+
+
+@job_queue.handler(PURGE_PATIENT)
+def purge_patient(payload):
+    """Remove a deleted patient's row, attachment and appointments included"""
+    connection = shard_router.connection(payload["doctor_id"])
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            """
+            DELETE FROM patients_db
+            WHERE id = %s AND doctor_id = %s AND deleted_at IS NOT NULL
+            """,
+            (payload["patient_id"], payload["doctor_id"]),
+        )
+        if cur.rowcount:
+            cur.execute(
+                "DELETE FROM appointments WHERE patient_id = %s AND doctor_id = %s",
+                (payload["patient_id"], payload["doctor_id"]),
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def unpurged_patients(connection, grace_minutes=PURGE_GRACE_MINUTES):
+    """``(doctor_id, patient_id)`` of the patients deleted more than
+    `grace_minutes` ago and still stored, whose purge job was never queued"""
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT doctor_id, id FROM patients_db
+            WHERE deleted_at < NOW() - INTERVAL %s MINUTE
+            ORDER BY id
+            """,
+            (grace_minutes,),
+        )
+        return [(row["doctor_id"], row["id"]) for row in cur.fetchall()]
+    finally:
+        cur.close()
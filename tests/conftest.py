@@ -1,16 +1,29 @@
 """Pytest configuration and fixtures for testing the Flask application."""
 
 import pytest
+from contextlib import ExitStack
 from unittest.mock import MagicMock, patch
 from werkzeug.security import generate_password_hash
 from main import app
 
+MYSQL_USERS = (
+    "extensions",
+    "views.auth",
+    "views.profile",
+    "views.patients",
+    "views.jobs",
+)
+
 
 @pytest.fixture
 def client():
     """Create a test client for the Flask application."""
     app.config["TESTING"] = True
     app.config["SECRET_KEY"] = "test_secret_key"
+    app.config["AUDIT_BACKGROUND_WRITER"] = False
+    app.extensions["signin_limiter"].reset()
+    app.extensions["page_cache"].clear()
+    app.extensions["db_guard"].reset()
     with app.test_client() as client:
         yield client
 
@@ -39,12 +52,16 @@ def mock_connection(mock_cursor):
 @pytest.fixture
 def mock_mysql(mock_connection, mock_cursor):
     """Mock the MySQL connection."""
-    with patch("main.mysql") as mock_mysql_obj:
-        # Set up both mysql.connect and mysql.connection
-        mock_mysql_obj.connect = mock_connection
-        mock_mysql_obj.connection = mock_connection
-        # Also ensure connection.cursor() returns our mock cursor
-        mock_connection.cursor.return_value = mock_cursor
+    mock_mysql_obj = MagicMock()
+    # Set up both mysql.connect and mysql.connection
+    mock_mysql_obj.connect = mock_connection
+    mock_mysql_obj.connection = mock_connection
+    # Also ensure connection.cursor() returns our mock cursor
+    mock_connection.cursor.return_value = mock_cursor
+    # Every blueprint imports the shared instance, so patch each of them
+    with ExitStack() as stack:
+        for module in MYSQL_USERS:
+            stack.enter_context(patch(f"{module}.mysql", mock_mysql_obj))
         yield mock_mysql_obj
 
 
@@ -64,6 +81,7 @@ def sample_doctor():
         "nationality": "American",
         "phone_number": "1234567890",
         "work_address": "123 Main St",
+        "profile_picture": None,
     }
 
 
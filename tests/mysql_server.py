@@ -0,0 +1,102 @@
+"""A stand-in MySQL server for fault injection tests."""
+
+import socket
+import struct
+import threading
+
+# PROTOCOL_41, LONG_PASSWORD, TRANSACTIONS, SECURE_CONNECTION, PLUGIN_AUTH
+CAPABILITIES = 0x1 | 0x200 | 0x2000 | 0x8000 | 0x80000
+OK = b"\x00\x00\x00\x02\x00\x00\x00"
+COM_QUIT, COM_QUERY = 0x01, 0x03
+
+
+class StandInServer:
+    """Speaks just enough of the MySQL protocol for pymysql to connect and
+    run statements, all of which succeed without a result set.
+
+    Faults are injected by the statements themselves: one containing
+    ``SLEEP`` is never answered, one containing ``CRASH`` drops the
+    connection. With `stall`, connections are accepted but never greeted,
+    like a server that stopped responding.
+    """
+
+    def __init__(self, stall=False):
+        self.stall = stall
+        self.accepted = 0
+        self.queries = []
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        self._connections = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def kwargs(self):
+        return {"host": "127.0.0.1", "port": self.port, "user": "test"}
+
+    def close(self):
+        self._listener.close()
+        for connection in self._connections:
+            connection.close()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._listener.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            self._connections.append(connection)
+            if not self.stall:
+                threading.Thread(
+                    target=self._serve, args=(connection,), daemon=True
+                ).start()
+
+    def _serve(self, connection):
+        try:
+            self._send(connection, 0, self._greeting())
+            seq, _ = self._receive(connection)
+            self._send(connection, seq + 1, OK)
+            while True:
+                seq, payload = self._receive(connection)
+                if payload[0] == COM_QUIT:
+                    break
+                query = payload[1:].decode() if payload[0] == COM_QUERY else ""
+                self.queries.append(query)
+                if "CRASH" in query:
+                    break
+                if "SLEEP" not in query:
+                    self._send(connection, seq + 1, OK)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def _greeting(self):
+        return (
+            b"\x0a8.0.0-stand-in\x00"
+            + struct.pack("<I", 1)
+            + b"abcdefgh\x00"
+            + struct.pack(
+                "<HBHHB", CAPABILITIES & 0xFFFF, 45, 2, CAPABILITIES >> 16, 21
+            )
+            + b"\x00" * 10
+            + b"ijklmnopqrst\x00"
+            + b"mysql_native_password\x00"
+        )
+
+    def _send(self, connection, seq, payload):
+        connection.sendall(struct.pack("<I", len(payload))[:3] + bytes([seq]) + payload)
+
+    def _receive(self, connection):
+        header = self._read(connection, 4)
+        length = int.from_bytes(header[:3], "little")
+        return header[3], self._read(connection, length)
+
+    def _read(self, connection, size):
+        data = b""
+        while len(data) < size:
+            chunk = connection.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Client went away")
+            data += chunk
+        return data
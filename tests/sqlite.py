@@ -0,0 +1,71 @@
+"""SQLite stand-ins for MySQL connections in tests."""
+
+import sqlite3
+
+
+class SQLiteCursor:
+    """DB-API cursor with pymysql's ``%s`` placeholders and dict rows."""
+
+    def __init__(self, connection):
+        self._cur = connection.cursor()
+
+    def execute(self, query, params=()):
+        self._cur.execute(query.replace("%s", "?"), params)
+
+    def executemany(self, query, rows):
+        self._cur.executemany(query.replace("%s", "?"), rows)
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def _dict(self, row):
+        return dict(zip((c[0] for c in self._cur.description), row))
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        return None if row is None else self._dict(row)
+
+    def fetchall(self):
+        return [self._dict(row) for row in self._cur.fetchall()]
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteDatabase:
+    """An in-memory database standing in for a MySQL server.
+
+    ``NOW()`` returns the fixed `now` so timestamps are predictable. With
+    `parse_timestamps`, ``TIMESTAMP`` columns are read back as datetimes,
+    as pymysql does.
+    """
+
+    def __init__(self, schema, now="2026-01-01 00:00:00", parse_timestamps=False):
+        detect_types = sqlite3.PARSE_DECLTYPES if parse_timestamps else 0
+        self.db = sqlite3.connect(":memory:", detect_types=detect_types)
+        self.db.executescript(schema)
+        self.db.create_function("NOW", 0, lambda: now)
+
+    def cursor(self):
+        return SQLiteCursor(self.db)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def rows(self, query, params=()):
+        return self.db.execute(query, params).fetchall()
+
+
+def stored_columns(cur, table):
+    """:func:`schema.stored_columns` for SQLite, which has no
+    ``information_schema``"""
+    cur.execute(f"PRAGMA table_xinfo({table})")
+    return [row["name"] for row in cur.fetchall() if not row["hidden"]]
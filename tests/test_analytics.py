@@ -0,0 +1,65 @@
+"""Tests for the vectorized cohort analytics."""
+
+import math
+
+import numpy as np
+
+import analytics
+
+
+class TestSummaries:
+    """Tests for loading and summarizing a cohort."""
+
+    def test_load_cohort_maps_nulls_to_nan(self, mock_cursor):
+        """Test that missing values become NaN and ages are in years."""
+        mock_cursor.fetchall.return_value = [
+            (3652.425, 180.0, 81.0, 25.0),
+            (None, None, 60.0, None),
+        ]
+
+        cohort = analytics.load_cohort(mock_cursor, 1)
+
+        assert cohort["age"][0] == 10.0
+        assert math.isnan(cohort["age"][1])
+        assert math.isnan(cohort["height"][1])
+        assert cohort["weight"].tolist() == [81.0, 60.0]
+
+    def test_load_cohort_empty(self, mock_cursor):
+        """Test that a doctor without patients yields empty arrays."""
+        mock_cursor.fetchall.return_value = []
+
+        summary = analytics.summarize(analytics.load_cohort(mock_cursor, 1))
+
+        assert summary["height"] == {"count": 0}
+        assert sum(summary["bmi_categories"].values()) == 0
+
+    def test_describe_percentiles(self):
+        """Test percentile and histogram output."""
+        result = analytics.describe(np.array([1.0, 2.0, 3.0, 4.0, 5.0, np.nan]))
+
+        assert result["count"] == 5
+        assert result["percentiles"]["p50"] == 3.0
+        assert sum(result["histogram"]["counts"]) == 5
+
+    def test_bmi_categories(self):
+        """Test that category bounds are exclusive upper limits."""
+        counts = analytics.bmi_categories(np.array([17.0, 18.5, 24.9, 25.0, 31.0]))
+        assert counts == {"underweight": 1, "normal": 2, "overweight": 1, "obese": 1}
+
+
+class TestCohortAnalyticsRoute:
+    """Tests for the cohort analytics endpoint."""
+
+    def test_requires_login(self, client):
+        """Test that anonymous requests are rejected."""
+        response = client.get("/cohort-analytics")
+        assert response.status_code == 401
+
+    def test_returns_summary(self, authenticated_session, mock_mysql, mock_cursor):
+        """Test that the summary is returned as JSON."""
+        mock_cursor.fetchall.return_value = [(9000.0, 170.0, 70.0, 24.2)]
+
+        response = authenticated_session.get("/cohort-analytics")
+
+        assert response.status_code == 200
+        assert response.get_json()["bmi_categories"]["normal"] == 1
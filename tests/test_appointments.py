@@ -0,0 +1,240 @@
+"""Tests for appointment scheduling."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import appointments
+from appointments import IntervalIndex
+from tests.sqlite import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE appointments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, doctor_id INTEGER, patient_id INTEGER,
+    starts_at TIMESTAMP, ends_at TIMESTAMP, status TEXT, notes TEXT,
+    created_at TIMESTAMP, updated_at TIMESTAMP
+);
+CREATE INDEX idx_appointments_doctor_starts ON appointments (doctor_id, starts_at);
+"""
+
+MONDAY = datetime(2026, 10, 19)
+
+
+def at(hour, minute=0, day=MONDAY):
+    return day.replace(hour=hour, minute=minute)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    # SQLite serializes writers and has no FOR UPDATE
+    monkeypatch.setattr(appointments, "LOCK_CLAUSE", "")
+    return SQLiteDatabase(SCHEMA, parse_timestamps=True)
+
+
+class TestIntervalIndex:
+    """Tests for the in-memory overlap structure."""
+
+    def test_overlapping_matches_brute_force(self):
+        """Test overlap queries against a scan, long intervals included."""
+        rng = random.Random(7)
+        items = []
+        for i in range(2000):
+            start = rng.randrange(0, 100_000)
+            length = rng.choice([15, 30, 60]) if i % 50 else rng.randrange(1, 5000)
+            items.append((start, start + length, i))
+        index = IntervalIndex(items)
+
+        for _ in range(300):
+            start = rng.randrange(0, 100_000)
+            end = start + rng.randrange(1, 3000)
+            expected = sorted(v for s, e, v in items if s < end and e > start)
+            assert sorted(v for _, _, v in index.overlapping(start, end)) == expected
+
+    def test_touching_intervals_do_not_overlap(self):
+        """Test that back-to-back appointments are not conflicts."""
+        index = IntervalIndex([(at(9), at(10), "a")])
+
+        assert index.overlapping(at(10), at(11)) == []
+        assert index.overlapping(at(8), at(9)) == []
+        assert [v for _, _, v in index.overlapping(at(9, 59), at(11))] == ["a"]
+
+    def test_add_keeps_queries_correct(self):
+        """Test that inserted intervals, long ones too, are found."""
+        index = IntervalIndex([(at(9), at(10), "a"), (at(14), at(15), "c")])
+        index.add(at(8), at(13), "long")
+        index.add(at(11), at(12), "b")
+
+        assert len(index) == 4
+        found = [v for _, _, v in index.overlapping(at(12, 30), at(14, 30))]
+        assert found == ["long", "c"]
+
+    def test_free_slots_skip_busy_periods_on_the_grid(self):
+        """Test that free slots avoid appointments and stay aligned."""
+        index = IntervalIndex(
+            [
+                (at(9), at(9, 40), 1),
+                (at(9, 30), at(10), 2),
+                (at(11, 10), at(11, 20), 3),
+            ]
+        )
+
+        slots = index.free_slots(at(8), at(12), timedelta(minutes=30))
+
+        assert slots == [at(8), at(8, 30), at(10), at(10, 30), at(11, 30)]
+
+    def test_calendar_counts_days(self):
+        """Test per-day counts; ending at midnight does not reach the next day."""
+        index = IntervalIndex(
+            [
+                (at(9), at(10), 1),
+                (at(11), at(12), 2),
+                (at(22), at(2, day=MONDAY + timedelta(days=1)), 3),
+                (at(23), at(0, day=MONDAY + timedelta(days=1)), 4),
+            ]
+        )
+        start, end = appointments.month_bounds(MONDAY.date(), MONDAY.date())
+
+        assert appointments.calendar(index, start, end) == {
+            "2026-10-19": 4,
+            "2026-10-20": 1,
+        }
+
+    def test_month_bounds_cross_year(self):
+        """Test the range of a calendar spanning New Year."""
+        start, end = appointments.month_bounds(
+            datetime(2026, 12, 5).date(), datetime(2027, 1, 9).date()
+        )
+        assert (start, end) == (datetime(2026, 12, 1), datetime(2027, 2, 1))
+
+
+class TestBooking:
+    """Tests for the database side of booking."""
+
+    def test_book_refuses_overlaps(self, database):
+        """Test that only appointments that fit are booked."""
+        cur = database.cursor()
+        first, conflicts = appointments.book(cur, 1, 10, at(9), at(10))
+        assert first and not conflicts
+
+        second, conflicts = appointments.book(cur, 1, 11, at(9, 30), at(10, 30))
+        assert second is None
+        assert [row["id"] for row in conflicts] == [first]
+
+        # Back to back, another doctor, and after a cancellation are fine
+        assert appointments.book(cur, 1, 11, at(10), at(10, 30))[0]
+        assert appointments.book(cur, 2, 12, at(9), at(10))[0]
+        assert appointments.cancel(cur, 1, first)
+        assert appointments.book(cur, 1, 11, at(9, 30), at(10))[0]
+
+    def test_fetch_finds_long_appointments_started_earlier(self, database):
+        """Test the lower bound on starts_at leaves nothing out."""
+        cur = database.cursor()
+        appointments.book(cur, 1, 10, at(3), at(11))
+        appointments.book(cur, 1, 10, at(1), at(2))
+        appointments.book(cur, 1, 10, at(9) - timedelta(days=700), at(10))
+
+        rows = appointments.fetch(cur, 1, at(10), at(12))
+
+        assert [row["starts_at"] for row in rows] == [at(3)]
+
+    def test_validate_duration(self):
+        """Test that durations outside the supported range are refused."""
+        assert appointments.validate(at(9), at(9, 30)) is None
+        assert appointments.validate(at(9), at(9, 1))
+        assert appointments.validate(at(0), at(9))
+
+
+class TestAppointmentRoutes:
+    """Tests for the appointment endpoints."""
+
+    def test_requires_login(self, client):
+        """Test that appointments are only shown to signed-in doctors."""
+        assert client.get("/appointments/calendar").status_code == 401
+
+    def test_calendar_returns_month_range(self, authenticated_session, mock_cursor):
+        """Test the calendar feed with a bounded range query."""
+        mock_cursor.fetchall.return_value = [
+            {
+                "id": 1,
+                "patient_id": 10,
+                "starts_at": at(9),
+                "ends_at": at(9, 30),
+                "status": "scheduled",
+                "notes": None,
+            }
+        ]
+
+        response = authenticated_session.get(
+            "/appointments/calendar?from=2026-09&to=2026-11"
+        )
+
+        data = response.get_json()
+        assert data["days"] == {"2026-10-19": 1}
+        assert data["appointments"][0]["starts_at"] == "2026-10-19T09:00"
+        params = mock_cursor.execute.call_args.args[1]
+        assert params[0] == 1
+        assert params[2] == datetime(2026, 12, 1)
+
+    def test_calendar_rejects_long_ranges(self, authenticated_session):
+        """Test that one request cannot read years of appointments."""
+        response = authenticated_session.get(
+            "/appointments/calendar?from=2020-01&to=2026-01"
+        )
+        assert response.status_code == 400
+
+    def test_book_conflict(self, authenticated_session, mock_cursor):
+        """Test that an overlapping booking answers 409 with the conflict."""
+        mock_cursor.fetchone.return_value = {"id": 10}
+        mock_cursor.fetchall.return_value = [
+            {
+                "id": 1,
+                "patient_id": 11,
+                "starts_at": at(9),
+                "ends_at": at(10),
+                "status": "scheduled",
+                "notes": None,
+            }
+        ]
+
+        response = authenticated_session.post(
+            "/appointments",
+            json={"patient_id": 10, "starts_at": "2026-10-19T09:30", "duration": 30},
+        )
+
+        assert response.status_code == 409
+        assert response.get_json()["conflicts"][0]["id"] == 1
+
+    def test_book_success(self, authenticated_session, mock_cursor):
+        """Test that a free slot is booked for the doctor's patient."""
+        mock_cursor.fetchone.return_value = {"id": 10}
+        mock_cursor.fetchall.return_value = []
+        mock_cursor.lastrowid = 5
+
+        response = authenticated_session.post(
+            "/appointments",
+            json={"patient_id": 10, "starts_at": "2026-10-19T09:30"},
+        )
+
+        assert response.status_code == 201
+        assert response.get_json()["appointment"]["ends_at"] == "2026-10-19T10:00"
+        assert "INSERT INTO appointments" in mock_cursor.execute.call_args.args[0]
+
+    def test_free_slots(self, authenticated_session, mock_cursor):
+        """Test free slots around an appointment in working hours."""
+        mock_cursor.fetchall.return_value = [
+            {
+                "id": 1,
+                "patient_id": 11,
+                "starts_at": at(8),
+                "ends_at": at(17),
+                "status": "scheduled",
+                "notes": None,
+            }
+        ]
+
+        response = authenticated_session.get(
+            "/appointments/free-slots?date=2026-10-19&duration=30"
+        )
+
+        assert response.get_json()["slots"] == ["17:00", "17:30"]
@@ -0,0 +1,165 @@
+"""Tests for archiving inactive patients."""
+
+from datetime import datetime
+
+import pytest
+
+import archive
+from tests.sqlite import SQLiteDatabase, stored_columns
+
+PATIENT_COLUMNS = """
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT, gender TEXT,
+    birth_date TEXT, blood_group TEXT, file_upload BLOB, deleted_at TEXT,
+    updated_at TEXT, height REAL, weight REAL,
+    bmi REAL GENERATED ALWAYS AS (ROUND(weight / (height * height) * 10000, 1))
+"""
+
+SCHEMA = f"""
+CREATE TABLE patients_db ({PATIENT_COLUMNS});
+CREATE TABLE patients_archive ({PATIENT_COLUMNS});
+CREATE TABLE appointments (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, patient_id INTEGER,
+    starts_at TEXT, ends_at TEXT
+);
+CREATE TABLE patient_tombstones (
+    doctor_id INTEGER, patient_id INTEGER,
+    deleted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (doctor_id, patient_id)
+);
+"""
+
+CUTOFF = datetime(2023, 1, 1)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    # SQLite has no FOR UPDATE, nor the counters' ON DUPLICATE KEY
+    monkeypatch.setattr(archive, "LOCK_CLAUSE", "")
+    monkeypatch.setattr(archive.schema, "stored_columns", stored_columns)
+    database = SQLiteDatabase(SCHEMA)
+    database.deltas = []
+    monkeypatch.setattr(
+        archive.stats,
+        "apply_delta",
+        lambda cur, doctor_id, buckets, delta: database.deltas.append(
+            (doctor_id, delta)
+        ),
+    )
+    rows = [
+        # id, doctor, updated_at, deleted_at
+        (1, 1, "2019-05-01 10:00:00", None),
+        (2, 1, "2024-02-01 10:00:00", None),
+        (3, 1, "2020-01-01 10:00:00", None),
+        (4, 1, "2018-01-01 10:00:00", "2018-02-01 10:00:00"),
+        (5, 2, "2019-01-01 10:00:00", None),
+        (6, 3, "2019-01-01 10:00:00", None),
+    ]
+    database.db.executemany(
+        "INSERT INTO patients_db (id, doctor_id, first_name, file_upload, "
+        "updated_at, deleted_at, height, weight) "
+        "VALUES (?, ?, 'Pat', x'2550', ?, ?, 180, 81)",
+        rows,
+    )
+    # Patient 3 was not edited for years, but came in recently
+    database.db.execute(
+        "INSERT INTO appointments VALUES (1, 1, 3, '2024-06-01 09:00:00', "
+        "'2024-06-01 09:30:00')"
+    )
+    database.db.commit()
+    return database
+
+
+class TestArchive:
+    """Tests for moving patients between the hot and archive tables."""
+
+    def test_archives_only_inactive_patients(self, database):
+        """Test that recent edits, visits, deletions and moves are kept."""
+        done = archive.archive_inactive(
+            database, CUTOFF, chunk_size=2, skip_doctors={3}, log=lambda m: None
+        )
+
+        assert done == 2
+        assert database.rows("SELECT id FROM patients_archive ORDER BY id") == [
+            (1,),
+            (5,),
+        ]
+        assert database.rows("SELECT id FROM patients_db ORDER BY id") == [
+            (2,),
+            (3,),
+            (4,),
+            (6,),
+        ]
+        # The attachment goes along with the record
+        assert database.rows(
+            "SELECT file_upload FROM patients_archive WHERE id = 1"
+        ) == [(b"%P",)]
+        assert sorted(database.deltas) == [(1, -1), (2, -1)]
+        # Sync clients are told to drop them
+        assert database.rows(
+            "SELECT doctor_id, patient_id FROM patient_tombstones ORDER BY patient_id"
+        ) == [(1, 1), (2, 5)]
+
+    def test_restore_moves_patient_back(self, database):
+        """Test that a restored patient is active again and counted."""
+        archive.archive_inactive(database, CUTOFF, log=lambda m: None)
+        cur = database.cursor()
+
+        assert not archive.restore(cur, 2, 1)  # another doctor's patient
+        assert archive.restore(cur, 1, 1)
+        assert not archive.restore(cur, 1, 1)
+
+        assert database.rows("SELECT id FROM patients_archive") == [(5,), (6,)]
+        # The generated BMI is computed again rather than copied
+        assert database.rows("SELECT bmi FROM patients_db WHERE id = 1") == [(25.0,)]
+        (updated_at,) = database.rows("SELECT updated_at FROM patients_db WHERE id = 1")
+        assert updated_at[0] > "2024"
+        assert database.deltas[-1] == (1, 1)
+        assert database.rows("SELECT patient_id FROM patient_tombstones") == [
+            (5,),
+            (6,),
+        ]
+        # Recently restored, so not archived again
+        archive.archive_inactive(database, CUTOFF, log=lambda m: None)
+        assert database.rows("SELECT id FROM patients_db WHERE id = 1") == [(1,)]
+
+
+class TestArchiveRoutes:
+    """Tests for archived patients in the app."""
+
+    def test_opening_archived_patient_restores_it(
+        self, authenticated_session, mock_cursor
+    ):
+        """Test that the edit page brings an archived patient back."""
+        mock_cursor.fetchone.side_effect = [
+            {
+                "first_name": "John",
+                "last_name": "Doe",
+                "specialty": "Cardiology",
+                "profile_picture": None,
+            },
+            None,
+            {"id": 1, "gender": "Female", "birth_date": None, "blood_group": "A+"},
+        ]
+        mock_cursor.fetchall.return_value = [{"name": "id"}, {"name": "first_name"}]
+
+        response = authenticated_session.get("/edit-patient/1")
+
+        assert response.status_code == 302
+        assert response.location.endswith("/edit-patient/1")
+        queries = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert any(
+            "INSERT INTO patients_db (id, first_name) SELECT id, first_name" in query
+            for query in queries
+        )
+        assert any("DELETE FROM patients_archive" in query for query in queries)
+
+    def test_archived_list_on_request(self, authenticated_session, mock_cursor):
+        """Test that My Patients lists the archive only when asked."""
+        mock_cursor.fetchall.return_value = []
+
+        authenticated_session.get("/my-patients")
+        assert "patients_archive" not in mock_cursor.execute.call_args_list[0].args[0]
+
+        authenticated_session.get("/my-patients?archived=1")
+        queries = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert any("FROM patients_archive" in query for query in queries)
@@ -0,0 +1,183 @@
+"""Tests for the CSS purge and critical CSS build."""
+
+import json
+import os
+import re
+import shutil
+
+from flask import Flask
+
+import assets
+
+CSS = """
+/* comment */
+:root{--x:1}
+.btn, .unused-a { color: red; }
+.sidebar.open .nav-link:hover{color:blue}
+#spinner{display:none}
+table td{padding:0}
+@media print{.btn{display:none}}
+@media (min-width: 768px){.unused-b{margin:0}.btn{margin:1px}}
+.show{opacity:1}
+@keyframes spin{from{transform:rotate(0)}to{transform:rotate(360deg)}}
+@keyframes unused{from{opacity:0}}
+.spinner{animation:spin 1s}
+.content::before{content:"a , b"}
+"""
+
+
+class TestPurge:
+    """Tests for parsing and purging stylesheets."""
+
+    def test_keeps_only_used_selectors(self):
+        """Test that unused selectors and empty blocks are dropped."""
+        tokens = assets.used_tokens(['<div class="btn sidebar open nav-link">'])
+        css = assets.serialize(assets.purge(assets.parse_css(CSS), tokens))
+
+        assert ":root{--x:1}" in css
+        assert ".btn{color:red}" in css
+        assert ".sidebar.open .nav-link:hover" in css
+        assert "unused" not in css
+        assert "#spinner" not in css
+        assert "table td" not in css
+        assert "@media (min-width: 768px){.btn{margin:1px}}" in css
+        assert ".show{opacity:1}" in css
+
+    def test_keyframes_follow_their_users(self):
+        """Test that keyframes are kept only when referenced."""
+        tokens = assets.used_tokens(['<div class="spinner content">'])
+        css = assets.serialize(assets.purge(assets.parse_css(CSS), tokens))
+
+        assert "@keyframes spin{from{transform:rotate(0)}" in css
+        assert "@keyframes unused" not in css
+        assert 'content:"a , b"' in css
+
+    def test_critical_css_covers_top_of_page(self):
+        """Test that only the first elements of the body are considered."""
+        html = """
+            <head><link class="unused-a"></head>
+            <body><div id="spinner" class="btn {{ extra }}"></div>
+            <table><tr><td class="sidebar open">{% if x %}</td></tr></table></body>
+        """
+        critical = assets.critical_css(assets.parse_css(CSS), html, limit=2)
+
+        assert ".btn{color:red}" in critical
+        assert "#spinner" in critical
+        assert "table td" not in critical
+        assert "@media print" not in critical
+        assert ".show" not in critical
+
+    def test_rebase_urls(self):
+        """Test that relative font references survive moving the file."""
+        css = 'src:url("../fonts/icons.woff2?v=1"),url(data:font/woff;base64,AA)'
+
+        rebased = assets.rebase_urls(css, "frontend/css", "frontend/dist/css")
+
+        assert 'url("../../fonts/icons.woff2?v=1")' in rebased
+        assert "url(data:font/woff;base64,AA)" in rebased
+
+
+class TestBuild:
+    """Tests for the build output and its use in templates."""
+
+    def test_build_writes_manifest_and_report(self, tmp_path):
+        """Test a full build against the real templates and stylesheets."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for path in ("app/templates", "app/static/css", "app/static/js"):
+            shutil.copytree(os.path.join(root, path), tmp_path / path)
+        for path in ("frontend/css", "frontend/js"):
+            shutil.copytree(os.path.join(root, path), tmp_path / path)
+        shutil.copy(os.path.join(root, "frontend/index.html"), tmp_path / "frontend")
+
+        report = assets.build(str(tmp_path), log=lambda line: None)
+        flask_app = Flask(__name__, static_folder=str(tmp_path / "app/static"))
+        extension = assets.Assets(flask_app)
+        with flask_app.test_request_context():
+            html = str(extension.stylesheets("signin.html"))
+            scripts = str(extension.scripts("my-patients.html", "js/main.js"))
+
+        pages = {row["page"]: row for row in report["css"]}
+        assert "signin.html" in pages and "frontend/index.html" in pages
+        for row in report["css"]:
+            assert row["after_blocking_bytes"] < row["before_bytes"] / 4
+            assert row["after_first_render"] < row["before_first_render"]
+        assert html.startswith("<style>:root{")
+        assert 'rel="preload" href="/static/dist/css/app.' in html
+
+        bundles = {row["page"]: row for row in report["js"]}
+        assert bundles["my-patients.html"]["before_requests"] == 3
+        for row in bundles.values():
+            assert row["after_bytes"] < row["before_bytes"]
+        assert re.fullmatch(
+            r'<script src="/static/dist/js/main\+delete-patient\+condition-search'
+            r'\.\w{10}\.js" defer></script>',
+            scripts,
+        )
+
+    def test_templates_fall_back_without_build(self, client):
+        """Test that pages link the original assets when not built."""
+        response = client.get("/signin")
+
+        assert b"/static/css/bootstrap.min.css" in response.data
+        assert b"/static/css/styles.css" in response.data
+        assert b'<script src="/static/js/main.js" defer></script>' in response.data
+
+    def test_cdn_stylesheets_do_not_block(self, client):
+        """Test that icon fonts from CDNs are loaded asynchronously."""
+        response = client.get("/signin")
+
+        assert b'rel="preload" href="https://cdnjs.cloudflare.com' in response.data
+        assert b'<link href="https://' not in response.data
+
+
+class TestScripts:
+    """Tests for bundling page scripts."""
+
+    def test_script_entries(self):
+        """Test that the scripts listed by a template are found."""
+        html = '{{ scripts("a.html", "js/main.js", \'js/b.js\') }}'
+        assert assets.script_entries(html) == ["js/main.js", "js/b.js"]
+        assert assets.script_entries("<p>no scripts</p>") == []
+
+    def test_bundle_isolates_scripts(self):
+        """Test that scripts keep their own scope and minify."""
+        bundle = assets.bundle_scripts(
+            ["const a = 1; // one", "const a = 2;\n\n/* two */ window.b = a;"]
+        )
+
+        assert "one" not in bundle and "two" not in bundle
+        assert bundle.count("try{(function(){") == 2
+
+
+class TestServiceWorker:
+    """Tests for serving the service worker."""
+
+    def test_served_from_root_with_precache(self, client):
+        """Test that the worker lists the shell and is always revalidated."""
+        response = client.get("/sw.js")
+        source = response.get_data(as_text=True)
+
+        assert response.mimetype == "application/javascript"
+        assert response.headers["Cache-Control"] == "no-cache"
+        precache = json.loads(source.split("const PRECACHE = ", 1)[1].split(";\n")[0])
+        assert "/static/css/styles.css" in precache
+        assert "/static/js/main.js" in precache
+        assert re.search(r'const VERSION = "\w{10}";', source)
+        assert 'addEventListener("sync"' in source
+
+    def test_precache_uses_build(self):
+        """Test that a build's fingerprinted files are precached."""
+        extension = assets.Assets(Flask(__name__))
+        extension._manifest = {
+            "css": {"app": "dist/css/app.abc.css"},
+            "js": {"a.html": "dist/js/main.abc.js", "b.html": "dist/js/main.abc.js"},
+        }
+
+        assert (
+            extension.precache_paths()
+            == [
+                "dist/css/app.abc.css",
+                "dist/js/main.abc.js",
+            ]
+            + assets.SHELL_IMAGES
+        )
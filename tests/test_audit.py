@@ -0,0 +1,193 @@
+"""Tests for the patient audit trail."""
+
+import json
+import time
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from audit import BINARY_PLACEHOLDER, AuditLog, describe_changes, fetch_history
+
+
+@pytest.fixture
+def audit_connection():
+    """A fake DB-API connection for the audit writer."""
+    connection = MagicMock()
+    connection.cursor.return_value = MagicMock()
+    return connection
+
+
+@pytest.fixture
+def audit_log(audit_connection):
+    """An audit log bound to a throwaway app, without the writer thread."""
+    app = Flask(__name__)
+    app.config["AUDIT_BACKGROUND_WRITER"] = False
+    app.config["AUDIT_BATCH_SIZE"] = 2
+    return AuditLog(app, connect=lambda: audit_connection)
+
+
+class TestAuditLog:
+    """Tests for buffering and batched writes."""
+
+    def test_record_does_not_touch_database(self, audit_log, audit_connection):
+        """Test that recording only buffers the entry."""
+        audit_log.record(1, 5, "update", {"first_name": ["Jane", "Janet"]})
+
+        assert not audit_connection.cursor.called
+        assert audit_log.pending_for(5)[0]["changed_fields"] == {
+            "first_name": ["Jane", "Janet"]
+        }
+
+    def test_flush_writes_in_batches(self, audit_log, audit_connection):
+        """Test that flush drains the buffer with one executemany per batch."""
+        for patient_id in range(5):
+            audit_log.record(1, patient_id, "update", {})
+
+        assert audit_log.flush() == 5
+
+        cursor = audit_connection.cursor.return_value
+        batch_sizes = [len(call.args[1]) for call in cursor.executemany.call_args_list]
+        assert batch_sizes == [2, 2, 1]
+        assert audit_connection.commit.call_count == 3
+        assert audit_log.pending_for(0) == []
+
+    def test_failed_batch_is_requeued(self, audit_log, audit_connection):
+        """Test that entries survive a failed write."""
+        audit_log.record(1, 5, "delete", {})
+        cursor = audit_connection.cursor.return_value
+        cursor.executemany.side_effect = RuntimeError("database unavailable")
+
+        with pytest.raises(RuntimeError):
+            audit_log.flush()
+
+        assert len(audit_log.pending_for(5)) == 1
+
+    def test_full_buffer_is_written_not_dropped(self, audit_log, audit_connection):
+        """Test that a full buffer is written by the recording thread."""
+        audit_log.app.config["AUDIT_MAX_PENDING"] = 2
+        for patient_id in (1, 2, 3):
+            audit_log.record(1, patient_id, "update", {})
+
+        cursor = audit_connection.cursor.return_value
+        assert [row[0] for row in cursor.executemany.call_args.args[1]] == [1, 2]
+        assert len(audit_log.pending_for(3)) == 1
+        assert audit_log.overflows == 1
+
+        # Kept while the database refuses them
+        cursor.executemany.side_effect = RuntimeError("database unavailable")
+        for patient_id in (4, 5):
+            audit_log.record(1, patient_id, "update", {})
+        assert [len(audit_log.pending_for(p)) for p in (3, 4, 5)] == [1, 1, 1]
+
+    def test_writer_registers_exit_hook_once(self, audit_connection):
+        """Test that restarting the writer does not add exit hooks."""
+        app = Flask(__name__)
+        audit_log = AuditLog(app, connect=lambda: audit_connection)
+
+        with patch("audit.atexit.register") as register:
+            audit_log.record(1, 5, "update", {})
+            audit_log.close()
+            audit_log.record(1, 5, "update", {})
+            audit_log.close()
+
+        register.assert_called_once_with(audit_log.close)
+
+    def test_background_writer_flushes(self, audit_connection):
+        """Test that the writer thread writes entries without an explicit flush."""
+        app = Flask(__name__)
+        app.config["AUDIT_FLUSH_INTERVAL"] = 0.01
+        audit_log = AuditLog(app, connect=lambda: audit_connection)
+
+        audit_log.record(1, 5, "update", {})
+        deadline = time.time() + 2
+        while audit_log.pending_for(5) and time.time() < deadline:
+            time.sleep(0.01)
+        audit_log.close()
+
+        assert audit_log.pending_for(5) == []
+        assert audit_connection.commit.called
+
+    def test_describe_changes_hides_binary_values(self):
+        """Test that attachments are not copied into the audit trail."""
+        changes = describe_changes(
+            {"weight": "70"}, {"weight": 72.0, "file_upload": b"%PDF"}
+        )
+        assert changes == {
+            "weight": ["70", 72.0],
+            "file_upload": [None, BINARY_PLACEHOLDER],
+        }
+
+
+class TestFetchHistory:
+    """Tests for keyset pagination of the history."""
+
+    def test_returns_next_cursor_when_more_rows(self, mock_cursor):
+        """Test that an extra row signals another page."""
+        mock_cursor.fetchall.return_value = [
+            {
+                "id": audit_id,
+                "doctor_id": 1,
+                "action": "update",
+                "changed_fields": json.dumps({"weight": ["70", "72"]}),
+                "changed_at": datetime(2024, 1, 1),
+            }
+            for audit_id in (30, 20, 10)
+        ]
+
+        entries, next_cursor = fetch_history(mock_cursor, 5, 1, before=40, limit=2)
+
+        assert [entry["id"] for entry in entries] == [30, 20]
+        assert next_cursor == 20
+        assert mock_cursor.execute.call_args.args[1] == (5, 1, 40, 3)
+
+
+class TestAuditRoutes:
+    """Tests for audit entries recorded by the patient routes."""
+
+    def test_edit_patient_records_changed_fields(
+        self, authenticated_session, mock_mysql, mock_cursor, sample_patient
+    ):
+        """Test that an update records old and new values."""
+        mock_cursor.fetchone.side_effect = [
+            {
+                "first_name": "John",
+                "last_name": "Doe",
+                "specialty": "Cardiology",
+                "profile_picture": None,
+            },
+            {**sample_patient},
+        ]
+
+        with patch("views.patients.audit_log") as audit_log:
+            authenticated_session.post("/edit-patient/1", data={"first_name": "Janet"})
+
+        audit_log.record.assert_called_once_with(
+            1, 1, "update", {"first_name": ["Jane", "Janet"]}
+        )
+
+    def test_patient_history_get(
+        self, authenticated_session, mock_mysql, mock_cursor, sample_doctor
+    ):
+        """Test GET request to the patient history page."""
+        mock_cursor.fetchall.return_value = [
+            {
+                "id": 7,
+                "doctor_id": sample_doctor["id"],
+                "action": "update",
+                "changed_fields": json.dumps({"last_name": ["Smith", "Doe"]}),
+                "changed_at": datetime(2024, 1, 1, 12, 0),
+            }
+        ]
+
+        response = authenticated_session.get("/patient-history/1")
+
+        assert response.status_code == 200
+        assert b"last name" in response.data
+        assert b"Older Changes" not in response.data
+
+    def test_patient_history_requires_login(self, client):
+        """Test that the history page redirects when not logged in."""
+        response = client.get("/patient-history/1")
+        assert response.status_code == 302
@@ -0,0 +1,122 @@
+"""Tests for doctor avatars."""
+
+import io
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+import avatars
+
+
+def picture(size=(1200, 800), fmt="JPEG", color=(200, 40, 40)):
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, fmt)
+    return out.getvalue()
+
+
+class TestMakeVariants:
+    """Tests for resizing uploads."""
+
+    def test_square_webp_per_variant(self):
+        """Test that each variant is a square WebP of its fixed size."""
+        variants = avatars.make_variants(picture())
+
+        assert set(variants) == set(avatars.VARIANTS)
+        for name, edge in avatars.VARIANTS.items():
+            image = Image.open(io.BytesIO(variants[name]))
+            assert image.format == "WEBP"
+            assert image.size == (edge, edge)
+        assert len(variants["header"]) < 2 * 1024
+
+    def test_fingerprint_follows_content(self):
+        """Test that a new picture gets a new URL version."""
+        first = avatars.make_variants(picture())
+        second = avatars.make_variants(picture(fmt="PNG", color=(40, 40, 200)))
+
+        assert avatars.fingerprint(first) == avatars.fingerprint(dict(first))
+        assert avatars.fingerprint(first) != avatars.fingerprint(second)
+
+    @pytest.mark.parametrize(
+        "blob",
+        [b"%PDF-1.4", b"\x89PNG\r\n\x1a\ntruncated", b"x" * (6 * 1024 * 1024)],
+    )
+    def test_unusable_uploads_rejected(self, blob):
+        """Test that non-pictures, damaged and huge files are refused."""
+        with pytest.raises(ValueError):
+            avatars.make_variants(blob)
+
+    def test_too_many_pixels_rejected(self):
+        """Test that a decompression bomb is refused before decoding."""
+        with (
+            patch.object(avatars, "MAX_PIXELS", 100),
+            pytest.raises(ValueError, match="too many pixels"),
+        ):
+            avatars.make_variants(picture(size=(20, 20)))
+
+
+class TestAvatarRoutes:
+    """Tests for uploading and serving avatars."""
+
+    def test_upload_stores_variants(
+        self, authenticated_session, mock_connection, mock_cursor
+    ):
+        """Test that an upload stores every variant and its version."""
+        response = authenticated_session.post(
+            "/my-profile/avatar",
+            data={"avatar": (io.BytesIO(picture()), "me.jpg")},
+            content_type="multipart/form-data",
+        )
+
+        assert response.status_code == 302
+        rows = mock_cursor.executemany.call_args.args[1]
+        assert sorted(row[1] for row in rows) == sorted(avatars.VARIANTS)
+        version = avatars.fingerprint({row[1]: row[2] for row in rows})
+        assert mock_cursor.execute.call_args.args[1] == (version, 1)
+        mock_connection.commit.assert_called_once()
+
+    def test_invalid_upload_is_flashed(self, authenticated_session, mock_cursor):
+        """Test that a file that is not a picture writes nothing."""
+        response = authenticated_session.post(
+            "/my-profile/avatar",
+            data={"avatar": (io.BytesIO(b"notes"), "notes.txt")},
+            content_type="multipart/form-data",
+            follow_redirects=False,
+        )
+
+        assert response.status_code == 302
+        mock_cursor.executemany.assert_not_called()
+
+    def test_versioned_avatar_cached_for_good(self, authenticated_session, mock_cursor):
+        """Test that the fingerprinted URL is immutable."""
+        mock_cursor.fetchone.return_value = {
+            "image": b"RIFF-avatar",
+            "profile_picture": "f00d",
+        }
+
+        response = authenticated_session.get("/avatar/header?v=f00d")
+
+        assert response.data == b"RIFF-avatar"
+        assert response.mimetype == "image/webp"
+        assert response.cache_control.immutable
+        assert mock_cursor.execute.call_args.args[1] == (1, "header")
+        assert authenticated_session.get("/avatar/huge").status_code == 404
+
+    @pytest.mark.parametrize(
+        "path", ["/dashboard", "/register-patient", "/patient-history/5"]
+    )
+    def test_header_shows_avatar(
+        self, authenticated_session, mock_cursor, sample_doctor, path
+    ):
+        """Test that page headers link the current version."""
+        mock_cursor.fetchone.return_value = {
+            **sample_doctor,
+            "profile_picture": "f00d",
+        }
+        mock_cursor.fetchall.return_value = []
+
+        response = authenticated_session.get(path)
+
+        assert b"/avatar/header?v=f00d" in response.data
+        # Not the initials fallback
+        assert b"bg-primary text-white" not in response.data
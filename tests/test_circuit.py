@@ -0,0 +1,252 @@
+"""Tests for query timeouts, circuit breakers and the fallbacks."""
+
+import time
+
+import pymysql
+import pytest
+from flask import Flask
+
+from circuit import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    DatabaseGuard,
+    DatabaseUnavailable,
+    backend_of,
+)
+from main import app
+from tests.mysql_server import StandInServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_guard(**config):
+    flask_app = Flask(__name__)
+    flask_app.config["pymysql_kwargs"] = {"host": "primary"}
+    flask_app.config.update(
+        DB_QUERY_TIMEOUT=0.2, DB_BREAKER_MIN_CALLS=3, DB_BREAKER_RESET_SECONDS=0.2
+    )
+    flask_app.config.update(config)
+    return flask_app, DatabaseGuard(flask_app)
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+class TestCircuitBreaker:
+    """Tests for the failure rate and the state changes."""
+
+    def make_breaker(self):
+        clock = FakeClock()
+        return CircuitBreaker(30, 4, 0.5, 15, clock=clock), clock
+
+    def test_opens_on_failure_rate(self):
+        """Test that enough failures among enough calls open it."""
+        breaker, _ = self.make_breaker()
+        for failed in (True, True, True):
+            breaker.record(failed)
+        assert breaker.state == CLOSED
+
+        breaker.record(False)
+        breaker.record(True)
+
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_old_outcomes_leave_window(self):
+        """Test that failures older than the window no longer count."""
+        breaker, clock = self.make_breaker()
+        for _ in range(3):
+            breaker.record(True)
+        clock.now += 31
+        for _ in range(3):
+            breaker.record(False)
+        breaker.record(True)
+
+        assert breaker.state == CLOSED
+        assert breaker.stats()["calls"] == 4
+
+    def test_half_open_probe(self):
+        """Test that one probe at a time decides whether it closes."""
+        breaker, clock = self.make_breaker()
+        for _ in range(4):
+            breaker.record(True)
+        clock.now += 15
+
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+        breaker.record(True)
+        assert breaker.state == OPEN
+
+        clock.now += 15
+        assert breaker.allow()
+        breaker.record(False)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+
+class TestFaultInjection:
+    """Tests against a stand-in server that stalls and fails."""
+
+    def test_slow_query_times_out(self, server):
+        """Test that a statement the server does not answer fails fast."""
+        flask_app, guard = make_guard()
+        with flask_app.test_request_context():
+            connection = guard.connect(**server.kwargs)
+        cur = connection.cursor()
+        cur.execute("SELECT 1")
+
+        started = time.monotonic()
+        with pytest.raises(pymysql.err.OperationalError) as error:
+            cur.execute("SELECT SLEEP(60)")
+
+        assert time.monotonic() - started < 2
+        assert error.value.args[0] == 2013
+        assert guard.stats()["backends"][backend_of(server.kwargs)]["failures"] == 1
+
+    def test_stalled_server_opens_circuit(self):
+        """Test that once connections keep timing out, none are attempted."""
+        server = StandInServer(stall=True)
+        flask_app, guard = make_guard()
+        try:
+            with flask_app.test_request_context():
+                for _ in range(3):
+                    with pytest.raises(pymysql.err.OperationalError):
+                        guard.connect(**server.kwargs)
+                started = time.monotonic()
+                with pytest.raises(DatabaseUnavailable):
+                    guard.connect(**server.kwargs)
+        finally:
+            server.close()
+
+        assert time.monotonic() - started < 0.1
+        assert server.accepted == 3
+
+    def test_failing_queries_and_recovery(self, server):
+        """Test that dropped connections open it and a probe closes it."""
+        flask_app, guard = make_guard(DB_BREAKER_MIN_CALLS=6)
+        backend = backend_of(server.kwargs)
+        with flask_app.test_request_context():
+            for _ in range(3):
+                connection = guard.connect(**server.kwargs)
+                with pytest.raises(pymysql.err.OperationalError):
+                    connection.cursor().execute("SELECT 'CRASH'")
+            assert guard.stats()["backends"][backend]["state"] == OPEN
+            with pytest.raises(DatabaseUnavailable):
+                guard.connect(**server.kwargs)
+            assert server.accepted == 3
+
+            time.sleep(0.25)
+            connection = guard.connect(**server.kwargs)
+            connection.cursor().execute("SELECT 1")
+
+        assert server.queries[-1] == "SELECT 1"
+        assert guard.stats()["backends"][backend]["state"] == CLOSED
+
+    def test_statement_errors_do_not_count(self):
+        """Test that a wrong statement says nothing about the server."""
+        _, guard = make_guard(DB_BREAKER_MIN_CALLS=1)
+
+        def bad_statement():
+            raise pymysql.err.ProgrammingError(1064, "You have an error")
+
+        with pytest.raises(pymysql.err.ProgrammingError):
+            guard.call("primary:3306", bad_statement)
+
+        assert guard.stats()["backends"]["primary:3306"]["failures"] == 0
+
+    def test_timeouts_only_in_requests(self):
+        """Test that commands connect without a statement timeout."""
+        opened = []
+        flask_app, _ = make_guard()
+        guard = DatabaseGuard(flask_app, connect=lambda g, b, **kw: opened.append(kw))
+
+        with flask_app.app_context():
+            guard.connect(host="primary")
+        with flask_app.test_request_context():
+            guard.connect(host="primary")
+
+        assert "read_timeout" not in opened[0]
+        assert opened[1]["read_timeout"] == opened[1]["write_timeout"] == 0.2
+        assert opened[0]["connect_timeout"] == 3
+
+
+class TestFallbacks:
+    """Tests for the pages served while the database is unavailable."""
+
+    def open_primary_circuit(self):
+        guard = app.extensions["db_guard"]
+        breaker = guard.breaker(backend_of(app.config["pymysql_kwargs"]))
+        for _ in range(app.config["DB_BREAKER_MIN_CALLS"]):
+            breaker.record(True)
+
+    def test_unavailable_page(self, authenticated_session, mock_cursor):
+        """Test that a database outage is a 503 to retry, not a 500."""
+        mock_cursor.execute.side_effect = DatabaseUnavailable("primary")
+
+        response = authenticated_session.get("/dashboard")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "15"
+        assert b"Temporarily Unavailable" in response.data
+
+    def test_cached_doctor_header(self, authenticated_session, mock_cursor):
+        """Test that the header read earlier is shown during an outage."""
+        authenticated_session.get("/register-patient")
+        mock_cursor.execute.side_effect = DatabaseUnavailable("primary")
+
+        response = authenticated_session.get("/register-patient")
+
+        assert response.status_code == 200
+        assert b"John Doe" in response.data
+
+    def test_dashboard_during_outage(self, authenticated_session, mock_cursor):
+        """Test that the dashboard renders when header and summary both fail."""
+        authenticated_session.get("/register-patient")
+        mock_cursor.execute.reset_mock()
+        mock_cursor.execute.side_effect = DatabaseUnavailable("primary")
+
+        response = authenticated_session.get("/dashboard")
+
+        assert response.status_code == 200
+        assert b"John Doe" in response.data
+        assert b"read-only" in response.data
+        assert response.headers["Cache-Control"] == "no-store"
+        # Both the header and the summary were tried
+        assert mock_cursor.execute.call_count == 2
+
+    def test_read_only_banner(self, authenticated_session, mock_cursor):
+        """Test the banner while the primary's circuit is open."""
+        response = authenticated_session.get("/register-patient")
+        assert b"read-only" not in response.data
+
+        self.open_primary_circuit()
+        response = authenticated_session.get("/register-patient")
+
+        assert b"read-only" in response.data
+        assert authenticated_session.get("/").status_code == 200
+
+    def test_write_refused_fast(self, authenticated_session, mock_cursor):
+        """Test that registering during an outage says so plainly."""
+        authenticated_session.get("/register-patient")
+        mock_cursor.execute.side_effect = DatabaseUnavailable("primary")
+
+        response = authenticated_session.post(
+            "/register-patient", data={"first_name": "Jane"}, follow_redirects=True
+        )
+
+        assert response.request.path == "/register-patient"
+        assert b"temporarily unavailable" in response.data
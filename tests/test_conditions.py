@@ -0,0 +1,154 @@
+"""Tests for normalized clinical terms and autocomplete."""
+
+from unittest.mock import MagicMock, patch
+
+import conditions
+
+
+class TestSplitTerms:
+    """Tests for parsing the free-text columns."""
+
+    def test_splits_and_strips_line_endings(self):
+        """Test values like those in the SQL dump."""
+        assert conditions.split_terms("Typhoid, Hepatitis B\r\n") == {
+            "typhoid": "Typhoid",
+            "hepatitis b": "Hepatitis B",
+        }
+
+    def test_drops_placeholders_and_duplicates(self):
+        """Test that 'None' and repeated terms are ignored."""
+        assert conditions.split_terms("None") == {}
+        assert conditions.split_terms("Dust;  dust ,Pollen.") == {
+            "dust": "Dust",
+            "pollen": "Pollen",
+        }
+
+
+class TestSync:
+    """Tests for keeping the join table in step with the text columns."""
+
+    def test_sync_links_terms(self, mock_cursor):
+        """Test that terms are upserted and linked to the patient."""
+        mock_cursor.fetchall.return_value = [{"id": 3}, {"id": 4}]
+
+        names = conditions.sync_patient_terms(
+            mock_cursor, 5, 12, "allergies", "Dust, Pollen"
+        )
+
+        assert names == ["Dust", "Pollen"]
+        links = mock_cursor.executemany.call_args_list[-1].args[1]
+        assert links == [(3, 5, 12), (4, 5, 12)]
+
+    def test_sync_with_empty_text_only_unlinks(self, mock_cursor):
+        """Test that clearing a field removes its links."""
+        assert conditions.sync_patient_terms(mock_cursor, 5, 12, "vaccines", "") == []
+        assert mock_cursor.execute.call_count == 1
+        assert not mock_cursor.executemany.called
+
+    def test_deleted_patients_left_out(self, mock_cursor):
+        """Test that search and backfill skip soft-deleted patients."""
+        mock_cursor.fetchall.return_value = []
+        connection = MagicMock()
+        connection.cursor.return_value = mock_cursor
+
+        conditions.find_patients(mock_cursor, 1, "allergies", "Penicillin")
+        conditions.backfill(connection, log=lambda _: None)
+
+        search, backfill = (call.args[0] for call in mock_cursor.execute.call_args_list)
+        assert "p.deleted_at IS NULL" in search
+        assert "deleted_at IS NULL" in backfill
+
+
+class TestTermTrie:
+    """Tests for the autocomplete trie."""
+
+    def test_complete_orders_by_usage(self):
+        """Test that the most used terms come first."""
+        trie = conditions.TermTrie(k=2)
+        trie.add("Penicillin", 5)
+        trie.add("Peanuts", 9)
+        trie.add("Pollen", 1)
+
+        assert trie.complete("pe") == ["Peanuts", "Penicillin"]
+        assert trie.complete("PEN") == ["Penicillin"]
+        assert trie.complete("x") == []
+
+    def test_add_accumulates_usage(self):
+        """Test that re-adding a term raises its rank."""
+        trie = conditions.TermTrie()
+        trie.add("Dust", 1)
+        trie.add("Diabetes", 2)
+        trie.add("dust", 2)
+
+        assert trie.complete("d") == ["Dust", "Diabetes"]
+        assert len(trie) == 2
+
+    def test_index_loads_once(self):
+        """Test that the index loads lazily and caches the tries."""
+        load = MagicMock(return_value=[("allergies", "Penicillin", 3)])
+        index = conditions.TermIndex(load)
+
+        assert index.complete(1, "allergies", "pen") == ["Penicillin"]
+        assert index.complete(1, "vaccines", "pen") == []
+        load.assert_called_once_with(1)
+
+    def test_index_is_per_doctor(self):
+        """Test that a doctor is offered only their own patients' terms."""
+        terms = {1: [("allergies", "Penicillin", 3)], 2: [("allergies", "Pollen", 1)]}
+        index = conditions.TermIndex(terms.get, max_doctors=1)
+
+        assert index.complete(1, "allergies", "p") == ["Penicillin"]
+        assert index.complete(2, "allergies", "p") == ["Pollen"]
+        index.add(2, "allergies", ["Peanuts"])
+        assert index.complete(2, "allergies", "pe") == ["Peanuts"]
+        # Only the most recent doctor's tries are kept
+        assert list(index._tries) == [2]
+
+    def test_load_term_usage_filters_by_doctor(self, mock_cursor):
+        """Test that usage is read from the doctor's own links."""
+        mock_cursor.fetchall.return_value = [
+            {"kind": "allergies", "name": "Penicillin", "usage_count": 2}
+        ]
+
+        assert conditions.load_term_usage(mock_cursor, 7) == [
+            ("allergies", "Penicillin", 2)
+        ]
+        query, params = mock_cursor.execute.call_args.args
+        assert "pt.doctor_id = %s" in query
+        assert params == (7,)
+
+
+class TestConditionRoutes:
+    """Tests for searching and autocomplete routes."""
+
+    def test_my_patients_filters_by_condition(
+        self, authenticated_session, mock_mysql, mock_cursor, sample_doctor
+    ):
+        """Test that a condition search uses the join table."""
+        mock_cursor.fetchall.return_value = []
+        mock_cursor.fetchone.return_value = sample_doctor
+
+        response = authenticated_session.get(
+            "/my-patients?kind=allergies&term=Penicillin"
+        )
+
+        assert response.status_code == 200
+        query, params = mock_cursor.execute.call_args_list[0].args
+        assert "patient_clinical_terms" in query
+        assert params == (1, "allergies", "penicillin")
+
+    def test_autocomplete(self, authenticated_session):
+        """Test that suggestions come from the term index."""
+        with patch("views.patients.term_index") as term_index:
+            term_index.complete.return_value = ["Penicillin"]
+            response = authenticated_session.get(
+                "/terms/autocomplete?kind=allergies&q=pe"
+            )
+
+        assert response.get_json() == {"suggestions": ["Penicillin"]}
+        term_index.complete.assert_called_once_with(1, "allergies", "pe")
+
+    def test_autocomplete_rejects_unknown_kind(self, authenticated_session):
+        """Test that only known kinds are accepted."""
+        response = authenticated_session.get("/terms/autocomplete?kind=x&q=pe")
+        assert response.status_code == 400
@@ -18,6 +18,7 @@ class TestDashboard:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
 
         response = authenticated_session.get("/dashboard")
@@ -55,6 +56,7 @@ class TestMyProfile:
             "phone_number": sample_doctor["phone_number"],
             "work_address": sample_doctor["work_address"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
             "nationality": sample_doctor["nationality"],
             "license_number": sample_doctor["license_number"],
         }
@@ -75,6 +77,7 @@ class TestMyProfile:
             "phone_number": sample_doctor["phone_number"],
             "work_address": sample_doctor["work_address"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
             "nationality": sample_doctor["nationality"],
             "license_number": sample_doctor["license_number"],
         }
@@ -90,6 +93,7 @@ class TestMyProfile:
                 "phone_number": "1111111111",
                 "work_address": "456 New St",
                 "specialty": "Neurology",
+                "profile_picture": None,
                 "nationality": "American",
                 "license_number": "LIC999",
             },
@@ -100,6 +104,24 @@ class TestMyProfile:
         assert mock_cursor.execute.called
         assert mock_mysql.connection.commit.called
 
+    def test_my_profile_post_without_changes_skips_write(
+        self, authenticated_session, mock_mysql, mock_cursor, sample_doctor
+    ):
+        """Test that disabled (unsent) and unchanged fields are not written."""
+        mock_cursor.fetchone.return_value = {
+            "first_name": sample_doctor["first_name"],
+            "last_name": sample_doctor["last_name"],
+            "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
+        }
+
+        response = authenticated_session.post(
+            "/my-profile", data={"first_name": sample_doctor["first_name"]}
+        )
+
+        assert response.status_code == 302
+        assert not mock_mysql.connection.commit.called
+
     def test_my_profile_not_found(self, authenticated_session, mock_mysql, mock_cursor):
         """Test my-profile when user profile doesn't exist."""
         mock_cursor.fetchone.return_value = None
@@ -131,6 +153,7 @@ class TestUpdatePassword:
             "phone_number": sample_doctor["phone_number"],
             "work_address": sample_doctor["work_address"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
             "nationality": sample_doctor["nationality"],
             "license_number": sample_doctor["license_number"],
         }
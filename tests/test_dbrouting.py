@@ -0,0 +1,129 @@
+"""Tests for read replica routing."""
+
+from unittest.mock import MagicMock
+
+import pymysql
+from flask import Flask, session
+
+from dbrouting import DatabaseRouter
+
+PRIMARY = MagicMock(name="primary")
+
+
+class FakeServers:
+    """Stands in for pymysql.connect against several database instances."""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.opened = []
+
+    def connect(self, **kwargs):
+        if kwargs["host"] in self.down:
+            raise pymysql.err.OperationalError(2003, "Can't connect")
+        connection = MagicMock(name=kwargs["host"])
+        connection.host = kwargs["host"]
+        self.opened.append(connection)
+        return connection
+
+
+def make_router(servers, replicas=("replica-1", "replica-2"), **config):
+    flask_app = Flask(__name__)
+    flask_app.secret_key = "test"
+    flask_app.config["pymysql_kwargs"] = {"host": "primary", "db": "medixbridge"}
+    flask_app.config["DB_REPLICAS"] = [{"host": host} for host in replicas]
+    flask_app.config.update(config)
+    router = DatabaseRouter(flask_app, primary=lambda: PRIMARY, connect=servers.connect)
+    return flask_app, router
+
+
+def read(flask_app, router, pinned_for=None):
+    with flask_app.test_request_context():
+        if pinned_for is not None:
+            session["db_primary_until"] = pinned_for
+        return router.reader()
+
+
+class TestDatabaseRouter:
+    """Tests for round-robin, health and read-your-writes pinning."""
+
+    def test_reads_round_robin_over_replicas(self):
+        """Test that consecutive requests alternate between replicas."""
+        servers = FakeServers()
+        flask_app, router = make_router(servers)
+
+        hosts = [read(flask_app, router).host for _ in range(4)]
+
+        assert hosts == ["replica-1", "replica-2", "replica-1", "replica-2"]
+        assert servers.opened[0].close.called
+        assert router.stats()["replicas"][0]["reads"] == 2
+
+    def test_reader_reused_within_request(self):
+        """Test that one request opens a single replica connection."""
+        servers = FakeServers()
+        flask_app, router = make_router(servers)
+
+        with flask_app.test_request_context():
+            assert router.reader() is router.reader()
+
+        assert len(servers.opened) == 1
+
+    def test_without_replicas_reads_use_primary(self):
+        """Test that an unconfigured router is a no-op."""
+        flask_app, router = make_router(FakeServers(), replicas=())
+
+        with flask_app.test_request_context():
+            assert router.reader() is PRIMARY
+            router.pin()
+            assert "db_primary_until" not in session
+
+    def test_pin_after_write_reads_primary(self):
+        """Test that a session that just wrote reads its own writes."""
+        servers = FakeServers()
+        flask_app, router = make_router(servers, DB_PRIMARY_PIN_SECONDS=5)
+
+        with flask_app.test_request_context():
+            router.pin()
+            pinned_until = session["db_primary_until"]
+
+        assert read(flask_app, router, pinned_for=pinned_until) is PRIMARY
+        assert read(flask_app, router, pinned_for=pinned_until - 5).host == "replica-1"
+        assert servers.opened and len(servers.opened) == 1
+
+    def test_unhealthy_replica_skipped_until_retry(self, monkeypatch):
+        """Test that a replica that fails to connect is taken out of rotation."""
+        servers = FakeServers(down={"replica-1"})
+        flask_app, router = make_router(servers, DB_REPLICA_RETRY_SECONDS=30)
+        clock = [1000.0]
+        monkeypatch.setattr("dbrouting.time.monotonic", lambda: clock[0])
+
+        hosts = [read(flask_app, router).host for _ in range(3)]
+        assert hosts == ["replica-2"] * 3
+        assert router.stats()["replicas"][0]["up"] is False
+
+        servers.down.clear()
+        clock[0] += 31
+        hosts = {read(flask_app, router).host for _ in range(2)}
+        assert hosts == {"replica-1", "replica-2"}
+
+    def test_all_replicas_down_falls_back_to_primary(self):
+        """Test that reads keep working when every replica is down."""
+        servers = FakeServers(down={"replica-1", "replica-2"})
+        flask_app, router = make_router(servers)
+
+        assert read(flask_app, router) is PRIMARY
+        assert router.stats()["primary_reads"] == 1
+
+    def test_check_pings_replicas(self):
+        """Test that an explicit health check restores a recovered replica."""
+        servers = FakeServers(down={"replica-2"})
+        _, router = make_router(servers)
+
+        assert router.check() == {0: True, 1: False}
+        servers.down.clear()
+        assert router.check() == {0: True, 1: True}
+        assert all(replica["up"] for replica in router.stats()["replicas"])
+
+
+def test_stats_endpoint_requires_login(client):
+    """Test that routing stats are only shown to signed-in doctors."""
+    assert client.get("/db-routing-stats").status_code == 401
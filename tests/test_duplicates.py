@@ -0,0 +1,174 @@
+"""Tests for duplicate patient detection."""
+
+import pytest
+
+import duplicates
+from tests.sqlite import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE patients_db (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT,
+    last_name TEXT, birth_date TEXT, health_insurance_number TEXT,
+    email_address TEXT, phone_number TEXT, deleted_at TIMESTAMP
+);
+CREATE TABLE patients_archive (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT,
+    last_name TEXT, birth_date TEXT, health_insurance_number TEXT,
+    email_address TEXT, phone_number TEXT, deleted_at TIMESTAMP
+);
+CREATE TABLE patient_match_keys (
+    doctor_id INTEGER, match_key TEXT, patient_id INTEGER,
+    PRIMARY KEY (doctor_id, match_key, patient_id)
+);
+"""
+
+JANE = {
+    "first_name": "Jane",
+    "last_name": "Smith",
+    "birth_date": "1990-05-15",
+    "health_insurance_number": "ab-1234",
+    "email_address": "Jane@Example.com",
+    "phone_number": "+1 555 010 2030",
+}
+
+
+@pytest.fixture
+def database():
+    database = SQLiteDatabase(SCHEMA)
+    patients = [
+        (1, 1, JANE),
+        (2, 1, {**JANE, "last_name": "Smyth", "email_address": ""}),
+        (3, 1, {**JANE, "first_name": "Joan", "health_insurance_number": "ZZ-9"}),
+        (
+            4,
+            1,
+            {
+                **JANE,
+                "first_name": "Peter",
+                "last_name": "Jones",
+                "health_insurance_number": "XY-9999",
+            },
+        ),
+        (5, 2, JANE),
+    ]
+    cur = database.cursor()
+    for patient_id, doctor_id, patient in patients:
+        cur.execute(
+            f"""
+            INSERT INTO patients_db (id, doctor_id, {", ".join(patient)})
+            VALUES (%s, %s, {", ".join(["%s"] * len(patient))})
+            """,
+            (patient_id, doctor_id, *patient.values()),
+        )
+        duplicates.sync_keys(cur, doctor_id, patient_id, patient)
+    database.commit()
+    return database
+
+
+class TestKeysAndScore:
+    """Tests for blocking keys and pairwise scores."""
+
+    def test_soundex(self):
+        """Test Soundex codes, including the h/w rule."""
+        assert duplicates.soundex("robert") == "r163"
+        assert duplicates.soundex("rupert") == "r163"
+        assert duplicates.soundex("ashcraft") == "a261"
+        assert duplicates.soundex("li") == "l000"
+
+    def test_match_keys(self):
+        """Test that the keys are normalized and skip missing fields."""
+        assert duplicates.match_keys(JANE) == {
+            "dl:1990-05-15:s530",
+            "df:1990-05-15:j500",
+            "hi:AB1234",
+            "em:jane@example.com",
+        }
+        assert duplicates.match_keys({"first_name": "Jane"}) == set()
+
+    @pytest.mark.parametrize(
+        "other",
+        [
+            {**JANE, "last_name": "Smyth"},
+            {**JANE, "first_name": "Smith", "last_name": "Jane"},
+            {**JANE, "birth_date": "1990-15-05", "email_address": None},
+            {**JANE, "first_name": "Jané", "phone_number": "0555 010 2030"},
+        ],
+    )
+    def test_likely_same_person(self, other):
+        """Test typos, swapped names and swapped day and month."""
+        assert duplicates.score(JANE, other) >= duplicates.THRESHOLD
+
+    def test_different_person(self):
+        """Test that sharing a birth date and an email is not enough."""
+        other = {**JANE, "first_name": "Peter", "last_name": "Jones"}
+        other["health_insurance_number"] = "XY-9999"
+
+        assert duplicates.score(JANE, other) < duplicates.THRESHOLD
+
+
+class TestLookups:
+    """Tests for the live check, the batch scan and the backfill."""
+
+    def test_find_candidates(self, database):
+        """Test that candidates come from the doctor's own patients."""
+        found = duplicates.find_candidates(
+            database.cursor(), 1, {**JANE, "last_name": "Smithe"}, exclude_id=2
+        )
+
+        assert [row["id"] for _, row in found] == [1, 3]
+        assert found[0][0] >= found[1][0]
+
+    def test_finds_archived_patients(self, database):
+        """Test that a patient moved to the archive is still a candidate."""
+        database.db.execute(
+            "INSERT INTO patients_archive SELECT * FROM patients_db WHERE id = 1"
+        )
+        database.db.execute("DELETE FROM patients_db WHERE id = 1")
+
+        found = duplicates.find_candidates(database.cursor(), 1, JANE, exclude_id=2)
+
+        assert [row["id"] for _, row in found] == [1, 3]
+
+    def test_scan_pairs_within_blocks(self, database):
+        """Test that the scan reports each likely pair once, per doctor."""
+        pairs = list(duplicates.scan(database, log=lambda _: None))
+
+        assert [(d, a, b) for d, a, b, _ in pairs] == [(1, 1, 2), (1, 1, 3), (1, 2, 3)]
+
+    def test_large_blocks_skipped(self, database, monkeypatch):
+        """Test that keys shared by too many patients pair nobody."""
+        monkeypatch.setattr(duplicates, "MAX_BLOCK", 1)
+
+        assert list(duplicates.scan(database, 1, log=lambda _: None)) == []
+
+    def test_backfill(self, database):
+        """Test that the backfill recomputes every patient's keys."""
+        database.db.execute("DELETE FROM patient_match_keys")
+
+        assert duplicates.backfill(database, chunk_size=2, log=lambda _: None) == 5
+        assert database.rows(
+            "SELECT match_key FROM patient_match_keys WHERE patient_id = 5"
+        ) == [(key,) for key in sorted(duplicates.match_keys(JANE))]
+
+
+class TestDuplicatesRoute:
+    """Tests for the duplicates endpoint."""
+
+    def test_requires_login(self, client):
+        """Test that the check is only served to signed-in doctors."""
+        assert client.get("/patients/duplicates").status_code == 401
+
+    def test_lists_candidates(self, authenticated_session, mock_cursor):
+        """Test that likely duplicates come back with a link to them."""
+        mock_cursor.fetchall.side_effect = [
+            [{"patient_id": 7}],
+            [{"id": 7, **JANE}],
+        ]
+
+        response = authenticated_session.get(
+            "/patients/duplicates",
+            query_string={**JANE, "last_name": "Smyth"},
+        )
+
+        found = response.get_json()["duplicates"]
+        assert [(d["patient_id"], d["url"]) for d in found] == [(7, "/edit-patient/7")]
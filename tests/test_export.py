@@ -0,0 +1,203 @@
+"""Tests for the columnar analytics export."""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pyarrow.dataset as ds
+import pytest
+
+import export
+
+STARTED_AT = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def patient_row(patient_id, doctor_id):
+    row = dict.fromkeys(export.PATIENT_SCHEMA.names, "x")
+    row.update(
+        id=patient_id,
+        birth_date=date(1990, 1, 1),
+        height=Decimal("180.0"),
+        weight=Decimal("80.0"),
+        bmi=None,
+        doctor_id=doctor_id,
+        updated_at=datetime(2025, 2, 1),
+    )
+    return tuple(row.values())
+
+
+def doctor_row(doctor_id):
+    row = dict.fromkeys(export.TABLES["doctors_db"]["schema"].names, "x")
+    row.update(id=doctor_id, birth_date=date(1980, 1, 1), updated_at=STARTED_AT)
+    return tuple(row.values())
+
+
+@pytest.fixture
+def connection():
+    """A connection whose streaming cursors serve rows with fetchmany."""
+    tables = {
+        "patients_db": [patient_row(i, i % 2 + 1) for i in range(1, 6)],
+        "patients_archive": [patient_row(6, 1)],
+        "patient_tombstones": [(2, 7, STARTED_AT)],
+        "doctors_db": [doctor_row(1), doctor_row(2)],
+    }
+    streams = []
+
+    def cursor(cursor_class=None):
+        cur = MagicMock()
+        cur.fetchone.return_value = (STARTED_AT,)
+
+        def execute(query, params=()):
+            if " FROM " in query:
+                cur.rows = list(tables[query.split(" FROM ")[1].split()[0]])
+
+        def fetchmany(size):
+            chunk, cur.rows = cur.rows[:size], cur.rows[size:]
+            return chunk
+
+        cur.execute.side_effect = execute
+        cur.fetchmany.side_effect = fetchmany
+        streams.append((cursor_class, cur))
+        return cur
+
+    conn = MagicMock()
+    conn.cursor.side_effect = cursor
+    conn.streams = streams
+    return conn
+
+
+class TestExport:
+    """Tests for streaming tables into partitioned datasets."""
+
+    def test_full_export_partitions_by_doctor(self, connection, tmp_path):
+        """Test that every row is written, one file per chunk and doctor."""
+        written = export.export(connection, tmp_path, chunk_size=2, log=lambda _: 0)
+
+        assert written == {
+            "patients_db": 5,
+            "patients_archive": 1,
+            "patient_tombstones": 1,
+            "doctors_db": 2,
+        }
+        patients = ds.dataset(
+            tmp_path / "patients_db", format="parquet", partitioning="hive"
+        ).to_table()
+        assert sorted(patients["id"].to_pylist()) == [1, 2, 3, 4, 5]
+        assert patients["height"].to_pylist()[0] == Decimal("180.0")
+        assert min((tmp_path / "patients_db").iterdir()).name == "doctor_id=1"
+        assert all(
+            cursor_class is export.SSCursor
+            for cursor_class, cur in connection.streams
+            if cur.fetchmany.called
+        )
+
+    def test_reads_in_chunks_in_primary_key_order(self, connection, tmp_path):
+        """Test that rows are pulled chunk by chunk, ordered by id."""
+        export.export(
+            connection, tmp_path, tables=["patients_db"], chunk_size=2, log=print
+        )
+
+        _, cur = connection.streams[-1]
+        assert cur.execute.call_args.args[0].endswith(
+            "WHERE deleted_at IS NULL ORDER BY doctor_id, id"
+        )
+        assert [c.args for c in cur.fetchmany.call_args_list] == [(2,)] * 4
+
+    def test_chunks_hold_one_doctor_each(self):
+        """Test that partitioned chunks are filled per doctor, not per read."""
+        rows = [patient_row(i, doctor) for i, doctor in enumerate([1, 1, 1, 2, 3, 3])]
+        cur = MagicMock()
+        cur.fetchmany.side_effect = [rows[:2], rows[2:4], rows[4:], []]
+
+        batches = export.iter_chunks(
+            cur, "patients_db", export.TABLES["patients_db"], chunk_size=2
+        )
+
+        assert [batch["doctor_id"].to_pylist() for batch in batches] == [
+            [1, 1],
+            [1],
+            [2],
+            [3, 3],
+        ]
+
+    def test_incremental_uses_previous_high_water_mark(self, connection, tmp_path):
+        """Test that the second run only asks for rows changed since the first."""
+        export.export(connection, tmp_path, log=lambda _: 0)
+        state = json.loads((tmp_path / export.STATE_FILE).read_text())
+        assert state["patients_db"] == STARTED_AT.isoformat()
+
+        export.export(connection, tmp_path, incremental=True, log=lambda _: 0)
+
+        _, cur = connection.streams[-1]
+        query, params = cur.execute.call_args.args
+        assert "WHERE updated_at >= %s" in query
+        assert params == (STARTED_AT,)
+
+    def test_shards_keep_their_own_files_and_marks(self, connection, tmp_path):
+        """Test that a shard's run neither overwrites nor moves the primary's."""
+        export.export(connection, tmp_path, log=lambda _: 0)
+        export.export(
+            connection,
+            tmp_path,
+            tables=export.SHARDED_TABLES,
+            shard="shard-1",
+            log=lambda _: 0,
+        )
+
+        state = json.loads((tmp_path / export.STATE_FILE).read_text())
+        assert set(state) == set(export.TABLES) | {
+            f"{table}@shard-1" for table in export.SHARDED_TABLES
+        }
+        patients = ds.dataset(
+            tmp_path / "patients_db", format="parquet", partitioning="hive"
+        ).to_table()
+        assert patients.num_rows == 10
+
+    def test_archive_and_deletions(self, connection, tmp_path):
+        """Test that archived patients and tombstones are exported too."""
+        export.export(
+            connection,
+            tmp_path,
+            incremental=True,
+            tables=["patients_archive", "patient_tombstones"],
+            log=lambda _: 0,
+        )
+        export.export(
+            connection,
+            tmp_path,
+            incremental=True,
+            tables=["patients_archive", "patient_tombstones"],
+            log=lambda _: 0,
+        )
+
+        archive_query, params = connection.streams[-2][1].execute.call_args.args
+        assert "LEFT JOIN patient_tombstones t" in archive_query
+        assert "COALESCE(t.deleted_at, a.updated_at) >= %s" in archive_query
+        assert params == (STARTED_AT,)
+        tombstone_query, _ = connection.streams[-1][1].execute.call_args.args
+        assert "NOT EXISTS (SELECT 1 FROM patients_archive" in tombstone_query
+        assert "t.deleted_at >= %s" in tombstone_query
+        tombstones = ds.dataset(
+            tmp_path / "patient_tombstones", format="parquet"
+        ).to_table()
+        assert tombstones.to_pylist()[0] == {
+            "doctor_id": 2,
+            "patient_id": 7,
+            "deleted_at": STARTED_AT,
+        }
+
+    def test_arrow_format(self, connection, tmp_path):
+        """Test that Arrow IPC files can be read back."""
+        export.export(
+            connection, tmp_path, fmt="arrow", tables=["doctors_db"], log=print
+        )
+
+        doctors = ds.dataset(tmp_path / "doctors_db", format="ipc").to_table()
+        assert doctors["id"].to_pylist() == [1, 2]
+        assert "password" not in doctors.column_names
+
+    def test_unknown_format(self, connection, tmp_path):
+        """Test that an unsupported format is rejected."""
+        with pytest.raises(ValueError):
+            export.export(connection, tmp_path, fmt="csv")
@@ -0,0 +1,170 @@
+"""Tests for the FHIR R4 export."""
+
+import json
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+import pytest
+from pymysql.cursors import SSDictCursor
+
+import fhir
+
+
+def patient_row(patient_id=1, **values):
+    row = dict.fromkeys(fhir.PATIENT_FIELDS)
+    row.update(
+        id=patient_id,
+        first_name="Jane",
+        last_name="Smith",
+        birth_date=date(1990, 5, 15),
+        gender="Female",
+        email_address="jane@example.com",
+        health_insurance_number="INS1",
+        allergies="Penicillin, none",
+        vaccines="Typhoid\r\nHepatitis B",
+        medications="",
+        updated_at=datetime(2026, 1, 2, 3, 4, 5),
+    )
+    row.update(values)
+    return row
+
+
+def fake_connection(rows):
+    cur = MagicMock()
+    cur.__iter__.return_value = iter(rows)
+    connection = MagicMock()
+    connection.cursor.return_value = cur
+    return connection
+
+
+class TestResources:
+    """Tests for mapping rows to resources."""
+
+    def test_patient_resource(self):
+        """Test demographics; empty columns are left out."""
+        patient = fhir.patient_resource(patient_row())
+
+        assert patient["resourceType"] == "Patient"
+        assert patient["id"] == "1"
+        assert patient["name"][0]["family"] == "Smith"
+        assert patient["gender"] == "female"
+        assert patient["birthDate"] == "1990-05-15"
+        assert patient["identifier"][0]["value"] == "INS1"
+        assert patient["telecom"] == [{"system": "email", "value": "jane@example.com"}]
+        assert patient["meta"]["lastUpdated"].endswith("Z")
+        assert "address" not in patient
+        assert "active" not in patient
+        assert fhir.patient_resource(patient_row(archived=1))["active"] is False
+
+    def test_term_resources_reference_patient(self):
+        """Test that each term becomes a resource with a stable id."""
+        found = list(fhir.resources(patient_row()))
+
+        assert [r["resourceType"] for r in found] == [
+            "Patient",
+            "AllergyIntolerance",
+            "Immunization",
+            "Immunization",
+        ]
+        allergy = found[1]
+        assert allergy["code"] == {"text": "Penicillin"}
+        assert allergy["patient"] == {"reference": "Patient/1"}
+        assert found[2]["occurrenceString"] == "unknown"
+        again = list(fhir.resources(patient_row(vaccines="hepatitis  B")))
+        assert again[-1]["id"] == found[3]["id"]
+
+    def test_resource_types_filter(self):
+        """Test that only the requested types are produced."""
+        found = list(fhir.resources(patient_row(), ("Immunization",)))
+
+        assert {r["resourceType"] for r in found} == {"Immunization"}
+
+
+class TestBundle:
+    """Tests for the paged Bundles."""
+
+    def test_page_with_next_link(self):
+        """Test that the extra row only produces the next link."""
+        rows = [patient_row(1), patient_row(2), patient_row(3)]
+
+        text = "".join(
+            fhir.bundle_page(
+                iter(rows), 2, "http://x/fhir", lambda cursor: f"page?c={cursor}"
+            )
+        )
+        bundle = json.loads(text)
+
+        patients = [e for e in bundle["entry"] if e["search"]["mode"] == "match"]
+        assert [e["resource"]["id"] for e in patients] == ["1", "2"]
+        assert patients[0]["fullUrl"] == "http://x/fhir/Patient/1"
+        assert bundle["link"][1] == {"relation": "next", "url": "page?c=2"}
+
+    def test_last_page(self):
+        """Test that the last page has no next link."""
+        bundle = json.loads(
+            "".join(fhir.bundle_page(iter([]), 2, "http://x/fhir", str))
+        )
+
+        assert bundle["entry"] == []
+        assert [link["relation"] for link in bundle["link"]] == ["self"]
+
+
+class TestExport:
+    """Tests for the NDJSON files and the streaming routes."""
+
+    def test_export_writes_file_per_type(self, tmp_path):
+        """Test one NDJSON file per resource type, across connections."""
+        connections = [fake_connection([patient_row(1)]), fake_connection([])]
+
+        counts = fhir.export_ndjson(connections, tmp_path, log=lambda _: None)
+
+        assert counts["Patient"] == 1
+        assert counts["Immunization"] == 2
+        lines = (tmp_path / "Immunization.ndjson").read_text().splitlines()
+        assert json.loads(lines[0])["vaccineCode"] == {"text": "Typhoid"}
+        assert (tmp_path / "MedicationStatement.ndjson").read_text() == ""
+        assert connections[0].cursor.call_args.args == (SSDictCursor,)
+
+    def test_failed_export_leaves_no_files(self, tmp_path):
+        """Test that a failure partway closes and removes every file."""
+        broken = fake_connection([patient_row(1)])
+        broken.cursor.return_value.__iter__.side_effect = RuntimeError("lost")
+
+        with pytest.raises(RuntimeError):
+            fhir.export_ndjson(
+                [fake_connection([patient_row(2)]), broken],
+                tmp_path,
+                log=lambda _: None,
+            )
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_bundle_route_scoped_to_doctor(
+        self, authenticated_session, mock_connection, mock_cursor
+    ):
+        """Test that the page reads the doctor's patients unbuffered."""
+        mock_cursor.__iter__.return_value = iter([patient_row(7)])
+
+        response = authenticated_session.get("/fhir/Patient?_count=1&_cursor=5")
+
+        assert response.mimetype == fhir.FHIR_JSON
+        assert json.loads(response.data)["entry"][0]["resource"]["id"] == "7"
+        assert mock_connection.cursor.call_args.args == (SSDictCursor,)
+        query, params = mock_cursor.execute.call_args.args
+        assert "FROM patients_archive" in query
+        assert params == [5, 1, 2, 5, 1, 2, 2]
+
+    def test_ndjson_route(self, authenticated_session, mock_cursor):
+        """Test NDJSON streaming and the _type filter."""
+        mock_cursor.__iter__.return_value = iter([patient_row(7)])
+
+        response = authenticated_session.get("/fhir/export.ndjson?_type=Patient")
+
+        lines = response.data.decode().splitlines()
+        assert [json.loads(line)["resourceType"] for line in lines] == ["Patient"]
+        bad = authenticated_session.get("/fhir/export.ndjson?_type=Observation")
+        assert bad.status_code == 400
+
+    def test_requires_login(self, client):
+        """Test that the export is only served to signed-in doctors."""
+        assert client.get("/fhir/Patient").status_code == 401
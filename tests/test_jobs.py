@@ -0,0 +1,256 @@
+"""Tests for the background job queue."""
+
+import io
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+import tasks
+from jobs import JobQueue
+from main import app
+from tests.sqlite import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, payload TEXT,
+    owner_id INTEGER, priority INTEGER, status TEXT, attempts INTEGER,
+    max_attempts INTEGER, run_after TIMESTAMP, locked_by TEXT,
+    locked_until TIMESTAMP, last_error TEXT, created_at TIMESTAMP,
+    updated_at TIMESTAMP, finished_at TIMESTAMP
+);
+"""
+
+
+class SQLiteJobQueue(JobQueue):
+    # SQLite has no row locks to skip; it serializes writers instead
+    lock_clause = ""
+
+
+def make_queue(**config):
+    flask_app = Flask(__name__)
+    flask_app.config.update(JOB_RETRY_DELAY=10, **config)
+    queue = SQLiteJobQueue(flask_app)
+    ran = []
+    queue.handler("ok")(ran.append)
+    queue.handler("urgent", priority=5)(ran.append)
+
+    @queue.handler("broken")
+    def broken(payload):
+        raise ValueError("no such patient")
+
+    return queue, ran
+
+
+def enqueue(queue, database, kind, payload=None, **kwargs):
+    cur = database.cursor()
+    job_id = queue.enqueue(cur, kind, payload or {}, **kwargs)
+    database.commit()
+    return job_id
+
+
+def job(database, job_id):
+    cur = database.cursor()
+    cur.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
+    return cur.fetchone()
+
+
+class TestJobQueue:
+    """Tests for claiming, retries, priorities and leases."""
+
+    def test_runs_jobs_by_priority_then_age(self):
+        """Test that higher priority jobs run first, oldest first within one."""
+        queue, ran = make_queue()
+        database = SQLiteDatabase(SCHEMA)
+        enqueue(queue, database, "ok", {"n": 1})
+        enqueue(queue, database, "urgent", {"n": 2})
+        enqueue(queue, database, "ok", {"n": 3}, priority=9)
+
+        while queue.run_one(database, "worker-1"):
+            pass
+
+        assert ran == [{"n": 3}, {"n": 2}, {"n": 1}]
+        assert database.rows("SELECT DISTINCT status FROM jobs") == [("done",)]
+
+    def test_failed_job_retried_with_backoff_then_given_up(self, monkeypatch):
+        """Test that errors are retried later and kept after the last attempt."""
+        queue, _ = make_queue(JOB_MAX_ATTEMPTS=2)
+        database = SQLiteDatabase(SCHEMA)
+        job_id = enqueue(queue, database, "broken")
+
+        assert queue.run_one(database, "worker-1")
+        first = job(database, job_id)
+        assert first["status"] == "queued"
+        assert "no such patient" in first["last_error"]
+        # Not due yet, so nothing to run
+        assert not queue.run_one(database, "worker-1")
+
+        later = datetime.now() + timedelta(seconds=11)
+        monkeypatch.setattr("jobs.datetime", MagicMock(now=lambda: later))
+        assert queue.run_one(database, "worker-1")
+        assert job(database, job_id)["status"] == "failed"
+        assert job(database, job_id)["attempts"] == 2
+
+    def test_expired_lease_is_claimed_again(self, monkeypatch):
+        """Test that a job whose worker died is picked up by another."""
+        queue, ran = make_queue(JOB_VISIBILITY_TIMEOUT=60)
+        database = SQLiteDatabase(SCHEMA)
+        job_id = enqueue(queue, database, "ok", {"n": 1})
+
+        # worker-1 claims the job and dies without finishing it
+        assert queue.claim(database, "worker-1")["id"] == job_id
+        assert queue.claim(database, "worker-2") is None
+
+        later = datetime.now() + timedelta(seconds=61)
+        monkeypatch.setattr("jobs.datetime", MagicMock(now=lambda: later))
+        assert queue.run_one(database, "worker-2")
+        assert ran == [{"n": 1}]
+        assert job(database, job_id)["attempts"] == 2
+
+        # A late report from the first worker does not undo the result
+        queue._finish(database, {"id": job_id}, "worker-1", "failed", "late")
+        assert job(database, job_id)["status"] == "done"
+
+    def test_queued_jobs_claimed_before_expired_leases(self, monkeypatch):
+        """Test that expired leases are taken once no queued job is due."""
+        queue, _ = make_queue(JOB_VISIBILITY_TIMEOUT=60)
+        database = SQLiteDatabase(SCHEMA)
+        stale = enqueue(queue, database, "urgent", {"n": 1})
+        assert queue.claim(database, "worker-1")["id"] == stale
+        fresh = enqueue(queue, database, "ok", {"n": 2})
+
+        later = datetime.now() + timedelta(seconds=61)
+        monkeypatch.setattr("jobs.datetime", MagicMock(now=lambda: later))
+        assert queue.claim(database, "worker-2")["id"] == fresh
+        assert queue.claim(database, "worker-2")["id"] == stale
+        assert queue.claim(database, "worker-2") is None
+
+    def test_prune_deletes_only_old_finished_jobs(self, monkeypatch):
+        """Test that finished jobs past the retention are deleted."""
+        queue, _ = make_queue(JOB_RETENTION_DAYS=30, JOB_MAX_ATTEMPTS=1)
+        database = SQLiteDatabase(SCHEMA)
+        done = enqueue(queue, database, "ok")
+        enqueue(queue, database, "broken")
+        while queue.run_one(database, "worker-1"):
+            pass
+        queued = enqueue(queue, database, "ok")
+
+        assert queue.prune(database) == 0
+        later = datetime.now() + timedelta(days=31)
+        monkeypatch.setattr("jobs.datetime", MagicMock(now=lambda: later))
+        assert queue.prune(database) == 2
+        assert database.rows("SELECT id FROM jobs") == [(queued,)]
+        assert job(database, done) is None
+
+    def test_enqueue_rejects_unknown_kind(self):
+        """Test that a typo in a job kind fails in the request, not later."""
+        queue, _ = make_queue()
+        with pytest.raises(KeyError):
+            queue.enqueue(MagicMock(), "nope", {})
+
+
+class TestJobRoutes:
+    """Tests for moving request work onto the queue."""
+
+    def test_job_status_requires_login(self, client):
+        """Test that job status is only shown to signed-in doctors."""
+        assert client.get("/jobs/1").status_code == 401
+
+    def test_job_status_of_own_job(self, authenticated_session, mock_cursor):
+        """Test that a doctor can poll their job, scoped by owner."""
+        mock_cursor.fetchone.return_value = {"id": 7, "status": "done"}
+
+        response = authenticated_session.get("/jobs/7")
+
+        assert response.get_json() == {"id": 7, "status": "done"}
+        assert mock_cursor.execute.call_args.args[1] == (7, 1)
+
+    def test_upload_is_spooled_and_queued(
+        self, authenticated_session, mock_cursor, sample_patient, tmp_path, monkeypatch
+    ):
+        """Test that the request stores the upload for a worker, not the BLOB."""
+        monkeypatch.setitem(app.config, "JOB_SPOOL_DIR", str(tmp_path))
+        mock_cursor.fetchone.side_effect = [
+            {
+                "first_name": "John",
+                "last_name": "Doe",
+                "specialty": "Cardiology",
+                "profile_picture": None,
+            },
+            {**sample_patient},
+        ]
+        mock_cursor.lastrowid = 12
+
+        response = authenticated_session.post(
+            "/edit-patient/1",
+            data={"file_upload": (io.BytesIO(b"x" * 100000), "scan.pdf")},
+            content_type="multipart/form-data",
+        )
+
+        assert response.status_code == 302
+        queries = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert not any("file_upload" in query for query in queries)
+        insert = mock_cursor.execute.call_args_list[-1].args
+        assert "INSERT INTO jobs" in insert[0]
+        assert insert[1][0] == tasks.STORE_ATTACHMENT
+        (spooled,) = os.listdir(tmp_path)
+        assert os.path.getsize(tmp_path / spooled) == 100000
+
+    def test_delete_marks_patient_and_queues_purge(
+        self, authenticated_session, mock_cursor, sample_patient
+    ):
+        """Test that the request hides the patient and leaves the purge."""
+        mock_cursor.fetchone.return_value = {"first_name": "Jane"}
+        mock_cursor.rowcount = 1
+
+        authenticated_session.post("/delete-patient/1")
+
+        queries = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert not any(
+            query.lstrip().startswith("DELETE FROM patients_db") for query in queries
+        )
+        assert any("SET deleted_at = NOW()" in query for query in queries)
+        assert "INSERT INTO jobs" in queries[-1]
+        assert mock_cursor.execute.call_args.args[1][0] == tasks.PURGE_PATIENT
+
+    def test_delete_survives_lost_purge_job(
+        self, authenticated_session, mock_cursor, sample_patient
+    ):
+        """Test that a failed enqueue still deletes and audits the patient."""
+        mock_cursor.fetchone.return_value = {"first_name": "Jane"}
+        mock_cursor.rowcount = 1
+
+        with patch("views.patients.queue_job", side_effect=RuntimeError), patch(
+            "views.patients.audit_log"
+        ) as audit_log:
+            authenticated_session.post("/delete-patient/1")
+
+        assert audit_log.record.call_args.args[2] == "delete"
+        with authenticated_session.session_transaction() as sess:
+            assert sess["_flashes"] == [("success", "Patient deleted successfully!")]
+
+
+class TestTasks:
+    """Tests for the job handlers."""
+
+    def test_store_attachment_writes_and_removes_spooled_file(self, tmp_path):
+        """Test that the worker writes the BLOB and cleans up the spool."""
+        path = tmp_path / "upload"
+        path.write_bytes(b"%PDF-1.4")
+        connection = MagicMock()
+        cur = connection.cursor.return_value
+
+        with patch("tasks.shard_router") as shard_router, patch("tasks.audit_log"):
+            shard_router.connection.return_value = connection
+            payload = {"patient_id": 1, "doctor_id": 2, "path": str(path)}
+            tasks.store_attachment(payload)
+            # Running the job again after a crash is harmless
+            tasks.store_attachment(payload)
+
+        assert cur.execute.call_count == 1
+        params = cur.execute.call_args.args[1]
+        assert params[0] == b"%PDF-1.4"
+        assert params[-2:] == (1, 2)
+        assert not path.exists()
@@ -0,0 +1,103 @@
+"""Tests for height/weight parsing and the numeric column migration."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+import measurements
+
+
+class TestParsing:
+    """Tests for turning form and legacy strings into numbers."""
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("180", 180.0),
+            (" 172.5 cm ", 172.5),
+            ("1.80", 180.0),
+            ("1,65 m", 165.0),
+            ("70 in", 177.8),
+            ("", None),
+            (None, None),
+        ],
+    )
+    def test_parse_height(self, value, expected):
+        """Test accepted height formats."""
+        assert measurements.parse_height(value) == expected
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [("60", 60.0), ("84 kg", 84.0), ("154 lbs", 69.9), ("", None)],
+    )
+    def test_parse_weight(self, value, expected):
+        """Test accepted weight formats."""
+        assert measurements.parse_weight(value) == expected
+
+    @pytest.mark.parametrize("value", ["13", "tall", "180 furlongs", "-180"])
+    def test_parse_height_rejects_bad_values(self, value):
+        """Test that implausible or unreadable heights raise ValueError."""
+        with pytest.raises(ValueError):
+            measurements.parse_height(value)
+
+
+class TestMigration:
+    """Tests for the varchar to decimal migration."""
+
+    def test_migrate_backfills_in_chunks(self):
+        """Test that legacy strings are cleaned and bad values reported."""
+        cursor = MagicMock()
+        cursor.fetchall.side_effect = [
+            [{"name": "height", "column_type": "varchar(50)"}],
+            [
+                {"id": 1, "height": "13", "weight": "190"},
+                {"id": 2, "height": "150", "weight": "60"},
+            ],
+            [{"id": 11, "height": "", "weight": ""}],
+            [],
+            [{"name": "height", "column_type": "varchar(50)"}],
+            [],
+        ]
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+
+        rejected = measurements.migrate(connection, chunk_size=2, log=lambda _: None)
+
+        assert rejected == [(1, "height", "13")]
+        updates = [call.args[1] for call in cursor.executemany.call_args_list]
+        assert updates == [
+            [(None, 190.0, 1), (150.0, 60.0, 2)],
+            [(None, None, 11)],
+        ]
+        queries = [call.args[0] for call in cursor.execute.call_args_list]
+        for table in ("patients_db", "patients_archive"):
+            assert any(f"ALTER TABLE {table}" in q and "bmi" in q for q in queries)
+
+    def test_migrate_is_idempotent(self):
+        """Test that already migrated tables are left alone."""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            {"name": "height", "column_type": "decimal(5,1)"},
+            {"name": "bmi", "column_type": measurements.BMI_TYPE},
+        ]
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+
+        assert measurements.migrate(connection, log=lambda _: None) == []
+        assert cursor.execute.call_count == len(measurements.MEASURED_TABLES)
+
+    def test_migrate_widens_narrow_bmi(self):
+        """Test that a bmi column from the first migration is widened."""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            {"name": "height", "column_type": "decimal(5,1)"},
+            {"name": "bmi", "column_type": "decimal(4,1)"},
+        ]
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+
+        measurements.migrate(connection, log=lambda _: None)
+
+        query = cursor.execute.call_args.args[0]
+        assert "MODIFY bmi decimal(6,1)" in query
+        assert "patients_archive" in query
@@ -0,0 +1,150 @@
+"""Tests for the rendered patient list cache."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from extensions import db_router
+from main import app
+from pagecache import PageCache
+
+
+def make_cache(**config):
+    flask_app = Flask(__name__)
+    flask_app.config.update(PAGE_CACHE_ENABLED=True, **config)
+    return PageCache(flask_app)
+
+
+class TestPageCache:
+    """Tests for generations, eviction and stats."""
+
+    def test_bump_invalidates_doctor_pages(self):
+        """Test that a write makes only that doctor's pages stale."""
+        cache = make_cache()
+        cache.set(1, (), b"doctor 1", cache.generation(1))
+        cache.set(2, (), b"doctor 2", cache.generation(2))
+
+        cache.bump(1)
+
+        assert cache.get(1, ()) is None
+        assert cache.get(2, ()) == b"doctor 2"
+        assert cache.stats()["entries"] == 1
+
+    def test_page_rendered_during_write_is_dropped(self):
+        """Test that a page read before a bump is never stored."""
+        cache = make_cache()
+        generation = cache.generation(1)
+        cache.bump(1)
+
+        cache.set(1, (), b"stale", generation)
+
+        assert cache.get(1, ()) is None
+
+    def test_evicts_least_recently_used(self):
+        """Test that memory stays within the byte budget."""
+        cache = make_cache(PAGE_CACHE_MAX_BYTES=10)
+        cache.set(1, ("page", "1"), b"aaaa", 0)
+        cache.set(1, ("page", "2"), b"bbbb", 0)
+        cache.get(1, ("page", "1"))
+        cache.set(1, ("page", "3"), b"cccc", 0)
+
+        assert cache.get(1, ("page", "2")) is None
+        assert cache.get(1, ("page", "1")) == b"aaaa"
+        stats = cache.stats()
+        assert stats["bytes"] == 8
+        assert stats["evictions"] == 1
+        assert stats["hit_rate"] == round(2 / 3, 3)
+
+
+class TestMyPatientsCache:
+    """Tests for caching the my-patients route."""
+
+    @pytest.fixture(autouse=True)
+    def enabled(self, monkeypatch):
+        monkeypatch.setitem(app.config, "PAGE_CACHE_ENABLED", True)
+
+    def test_off_by_default(
+        self, authenticated_session, mock_cursor, sample_doctor, sample_patient
+    ):
+        """Test that without the setting every visit queries the database."""
+        assert not PageCache(Flask(__name__)).enabled
+        app.config["PAGE_CACHE_ENABLED"] = False
+        mock_cursor.fetchall.return_value = [dict(sample_patient, patient_id=1)]
+        mock_cursor.fetchone.return_value = sample_doctor
+
+        authenticated_session.get("/my-patients")
+        queries = mock_cursor.execute.call_count
+        authenticated_session.get("/my-patients")
+
+        assert mock_cursor.execute.call_count > queries
+
+    def test_hit_skips_database(
+        self, authenticated_session, mock_cursor, sample_doctor, sample_patient
+    ):
+        """Test that a second visit is served without any query."""
+        mock_cursor.fetchall.return_value = [dict(sample_patient, patient_id=1)]
+        mock_cursor.fetchone.return_value = sample_doctor
+
+        first = authenticated_session.get("/my-patients")
+        queries = mock_cursor.execute.call_count
+        second = authenticated_session.get("/my-patients")
+
+        assert second.data == first.data
+        assert mock_cursor.execute.call_count == queries
+
+    def test_delete_invalidates(
+        self, authenticated_session, mock_cursor, sample_doctor, sample_patient
+    ):
+        """Test that deleting a patient re-renders the list."""
+        mock_cursor.fetchall.return_value = [dict(sample_patient, patient_id=1)]
+        mock_cursor.fetchone.return_value = sample_doctor
+        authenticated_session.get("/my-patients")
+
+        authenticated_session.post("/delete-patient/1", follow_redirects=True)
+        mock_cursor.fetchall.return_value = []
+        queries = mock_cursor.execute.call_count
+        response = authenticated_session.get("/my-patients")
+
+        assert mock_cursor.execute.call_count > queries
+        assert b"Jane" not in response.data
+
+    def test_flash_shown_once_then_cached(
+        self, authenticated_session, mock_cursor, sample_doctor, sample_patient
+    ):
+        """Test that a pending message is rendered, not cached, and that the
+        next visit uses the cache again."""
+        mock_cursor.fetchall.return_value = [dict(sample_patient, patient_id=1)]
+        mock_cursor.fetchone.return_value = sample_doctor
+        with authenticated_session.session_transaction() as sess:
+            sess["_flashes"] = [("success", "Patient deleted successfully!")]
+
+        flashed = authenticated_session.get("/my-patients")
+        authenticated_session.get("/my-patients")
+        queries = mock_cursor.execute.call_count
+        cached = authenticated_session.get("/my-patients")
+
+        assert b"Patient deleted successfully!" in flashed.data
+        assert flashed.headers["Cache-Control"] == "no-store"
+        assert b"Patient deleted successfully!" not in cached.data
+        assert mock_cursor.execute.call_count == queries
+
+    def test_cached_pages_read_from_primary(
+        self,
+        monkeypatch,
+        authenticated_session,
+        mock_cursor,
+        sample_doctor,
+        sample_patient,
+    ):
+        """Test that a lagging replica never fills the cache."""
+        replica = MagicMock()
+        monkeypatch.setitem(app.config, "DB_REPLICAS", [{"host": "replica"}])
+        monkeypatch.setattr(db_router, "connect", lambda **kwargs: replica)
+        mock_cursor.fetchall.return_value = [dict(sample_patient, patient_id=1)]
+        mock_cursor.fetchone.return_value = sample_doctor
+
+        response = authenticated_session.get("/my-patients")
+
+        assert b"Jane" in response.data
+        assert not replica.cursor.called
@@ -1,5 +1,7 @@
 """Tests for patient management routes."""
 
+from unittest.mock import patch
+
 
 class TestRegisterPatient:
     """Tests for the register-patient route."""
@@ -18,6 +20,7 @@ class TestRegisterPatient:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
 
         response = authenticated_session.get("/register-patient")
@@ -33,6 +36,7 @@ class TestRegisterPatient:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
 
         response = authenticated_session.post(
@@ -67,6 +71,19 @@ class TestRegisterPatient:
         assert mock_cursor.execute.called
         assert mock_mysql.connection.commit.called
 
+    def test_register_patient_queued_by_another_doctor(
+        self, authenticated_session, mock_mysql, mock_cursor, sample_doctor
+    ):
+        """Test that an offline registration is refused under another session."""
+        mock_cursor.fetchone.return_value = {**sample_doctor, "profile_picture": None}
+
+        response = authenticated_session.post(
+            "/register-patient", data={"first_name": "Patient", "submitted_by": "2"}
+        )
+
+        assert response.status_code == 409
+        assert not mock_mysql.connection.commit.called
+
     def test_register_patient_doctor_not_found(
         self, authenticated_session, mock_mysql, mock_cursor
     ):
@@ -111,6 +128,7 @@ class TestMyPatients:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
 
         response = authenticated_session.get("/my-patients")
@@ -125,6 +143,7 @@ class TestMyPatients:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
 
         response = authenticated_session.get("/my-patients")
@@ -152,6 +171,20 @@ class TestDeletePatient:
         assert mock_cursor.execute.called
         assert mock_mysql.connection.commit.called
 
+    def test_delete_patient_connection_error(self, authenticated_session, mock_mysql):
+        """Test that failing to connect is reported, not a crash."""
+        with patch(
+            "views.patients.shard_router.connection",
+            side_effect=RuntimeError("no route to shard"),
+        ):
+            response = authenticated_session.post(
+                "/delete-patient/1", follow_redirects=True
+            )
+
+        assert response.status_code == 200
+        assert b"no route to shard" in response.data
+        assert not mock_mysql.connection.rollback.called
+
 
 class TestEditPatient:
     """Tests for the edit-patient route."""
@@ -176,13 +209,15 @@ class TestEditPatient:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
-        patient_data = {**sample_patient}
+        patient_data = {**sample_patient, "bmi": 24.7}
 
         mock_cursor.fetchone.side_effect = [doctor_data, patient_data]
 
         response = authenticated_session.get("/edit-patient/1")
         assert response.status_code == 200
+        assert b'id="bmi" value="24.7"' in response.data
 
     def test_edit_patient_post_success(
         self,
@@ -199,16 +234,18 @@ class TestEditPatient:
             "first_name": sample_doctor["first_name"],
             "last_name": sample_doctor["last_name"],
             "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
         }
         # Create complete patient data with all required fields including file_upload
         patient_data = {
             **sample_patient,
             "file_upload": None,  # Ensure file_upload key exists
         }
-        # First fetchone: doctor before update
+        # First fetchone: doctor before update, then the stored patient
         # After redirect: doctor fetch, then patient fetch
         mock_cursor.fetchone.side_effect = [
             doctor_data,  # Initial doctor fetch
+            patient_data,  # Stored patient used for change detection
             doctor_data,  # Doctor fetch after redirect
             patient_data,  # Patient fetch after redirect
         ]
@@ -245,6 +282,84 @@ class TestEditPatient:
         assert mock_cursor.execute.called
         assert mock_mysql.connection.commit.called
 
+    def test_edit_patient_post_updates_only_changed_fields(
+        self,
+        authenticated_session,
+        mock_mysql,
+        mock_cursor,
+        sample_doctor,
+        sample_patient,
+    ):
+        """Test that only modified columns are written."""
+        doctor_data = {
+            "first_name": sample_doctor["first_name"],
+            "last_name": sample_doctor["last_name"],
+            "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
+        }
+        stored = {**sample_patient, "height": "180", "weight": "75"}
+        mock_cursor.fetchone.side_effect = [doctor_data, stored]
+
+        response = authenticated_session.post(
+            "/edit-patient/1",
+            data={
+                "first_name": "Jane",
+                "last_name": "Doe",
+                "birth_date": "1990-05-15",
+                "email": "jane.smith@example.com",
+                "height": "180",
+                "weight": "75.0",
+            },
+        )
+
+        assert response.status_code == 302
+        (update_sql, params), *_ = [
+            call.args
+            for call in mock_cursor.execute.call_args_list
+            if call.args[0].startswith("UPDATE patients_db")
+        ]
+        assert update_sql.startswith("UPDATE patients_db SET last_name = %s WHERE")
+        assert params == ("Doe", 1, 1)
+        # A changed name changes the duplicate detection keys
+        keys = mock_cursor.executemany.call_args.args[1]
+        assert (1, "dl:1990-05-15:d000", 1) in keys
+        assert mock_mysql.connection.commit.called
+        with authenticated_session.session_transaction() as sess:
+            assert "Changed: last name." in sess["_flashes"][0][1]
+
+    def test_edit_patient_post_without_changes_skips_write(
+        self,
+        authenticated_session,
+        mock_mysql,
+        mock_cursor,
+        sample_doctor,
+        sample_patient,
+    ):
+        """Test that re-submitting an untouched form does not write."""
+        doctor_data = {
+            "first_name": sample_doctor["first_name"],
+            "last_name": sample_doctor["last_name"],
+            "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
+        }
+        mock_cursor.fetchone.side_effect = [doctor_data, {**sample_patient}]
+
+        response = authenticated_session.post(
+            "/edit-patient/1",
+            data={
+                "first_name": "Jane",
+                "last_name": "Smith",
+                "email": "jane.smith@example.com",
+            },
+        )
+
+        assert response.status_code == 302
+        assert not any(
+            call.args[0].lstrip().startswith("UPDATE")
+            for call in mock_cursor.execute.call_args_list
+        )
+        assert not mock_mysql.connection.commit.called
+
     def test_edit_patient_doctor_not_found(
         self, authenticated_session, mock_mysql, mock_cursor
     ):
@@ -0,0 +1,138 @@
+"""Tests for attachment previews."""
+
+import io
+import random
+
+import pytest
+from PIL import Image
+
+import previews
+
+
+def noisy_image(size, fmt):
+    # Random pixels barely compress, so the source is as large as it gets
+    pixels = random.Random(0).randbytes(size[0] * size[1] * 3)
+    image = Image.frombytes("RGB", size, pixels)
+    out = io.BytesIO()
+    image.save(out, fmt)
+    return out.getvalue()
+
+
+class TestMakePreview:
+    """Tests for rendering previews."""
+
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+    def test_image_preview_is_small_whatever_the_source(self, fmt):
+        """Test that a large photo becomes a thumbnail of a few KB."""
+        blob = noisy_image((2400, 1600), fmt)
+
+        preview = previews.make_preview(blob)
+
+        assert len(blob) > 500 * 1024
+        assert len(preview) <= previews.MAX_BYTES
+        thumbnail = Image.open(io.BytesIO(preview))
+        assert thumbnail.format == "WEBP"
+        assert max(thumbnail.size) <= max(previews.MAX_SIZE)
+        assert thumbnail.size[0] > thumbnail.size[1]
+
+    def test_pdf_preview_renders_first_page(self):
+        """Test that a PDF gets a render of its first page."""
+        out = io.BytesIO()
+        pages = [Image.new("RGB", (595, 842), color) for color in ("red", "blue")]
+        pages[0].save(out, "PDF", save_all=True, append_images=pages[1:])
+
+        preview = previews.make_preview(out.getvalue())
+
+        thumbnail = Image.open(io.BytesIO(preview)).convert("RGB")
+        assert thumbnail.size[1] == max(previews.MAX_SIZE)
+        red, _, blue = thumbnail.getpixel((10, 10))
+        assert red > 200 and blue < 50
+
+    def test_other_files_have_no_preview(self):
+        """Test that unknown or damaged files are stored without preview."""
+        assert previews.make_preview(b"plain text notes") is None
+        assert previews.make_preview(b"%PDF-1.4 truncated") is None
+        assert previews.make_preview(b"\x89PNG\r\n\x1a\n broken") is None
+
+    def test_detect_type(self):
+        """Test that downloads are served with a type from the content."""
+        assert previews.detect_type(b"%PDF-1.7") == "application/pdf"
+        assert previews.detect_type(noisy_image((8, 8), "PNG")) == "image/png"
+        assert previews.detect_type(b"notes") == "application/octet-stream"
+
+
+class TestPreviewRoutes:
+    """Tests for serving attachments and previews."""
+
+    def test_requires_login(self, client):
+        """Test that attachments are only served to signed-in doctors."""
+        assert client.get("/patient-file/1/preview").status_code == 401
+
+    def test_versioned_preview_cached_for_good(
+        self, authenticated_session, mock_cursor
+    ):
+        """Test that the digest URL is immutable and revalidated by ETag."""
+        mock_cursor.fetchone.return_value = {
+            "data": b"RIFF-preview",
+            "file_type": "application/pdf",
+            "file_digest": "abc123",
+        }
+
+        response = authenticated_session.get("/patient-file/1/preview?v=abc123")
+
+        assert response.data == b"RIFF-preview"
+        assert response.mimetype == "image/webp"
+        assert response.cache_control.private
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 365 * 24 * 3600
+        assert mock_cursor.execute.call_args.args[1] == (1, 1)
+
+        response = authenticated_session.get(
+            "/patient-file/1/preview", headers={"If-None-Match": '"abc123"'}
+        )
+        assert response.status_code == 304
+        assert response.cache_control.no_cache
+
+    def test_download_uses_stored_type(self, authenticated_session, mock_cursor):
+        """Test that the download is served as an attachment of its type."""
+        mock_cursor.fetchone.return_value = {
+            "data": b"%PDF-1.4",
+            "file_type": "application/pdf",
+            "file_digest": "abc123",
+        }
+
+        response = authenticated_session.get("/patient-file/1?v=abc123")
+
+        assert response.mimetype == "application/pdf"
+        assert response.headers["Content-Disposition"].startswith("attachment")
+
+    def test_missing_file_is_not_found(self, authenticated_session, mock_cursor):
+        """Test that a patient without a preview gets a 404."""
+        mock_cursor.fetchone.return_value = {
+            "data": None,
+            "file_type": "text/plain",
+            "file_digest": "abc123",
+        }
+
+        assert authenticated_session.get("/patient-file/1/preview").status_code == 404
+
+    def test_edit_page_does_not_load_attachment(
+        self, authenticated_session, mock_cursor, sample_patient
+    ):
+        """Test that the edit page shows the preview without the BLOB."""
+        mock_cursor.fetchone.side_effect = [
+            {
+                "first_name": "John",
+                "last_name": "Doe",
+                "specialty": "Cardiology",
+                "profile_picture": None,
+            },
+            {**sample_patient, "has_file": 1, "has_preview": 1, "file_digest": "d1"},
+        ]
+
+        response = authenticated_session.get("/edit-patient/1")
+
+        query = mock_cursor.execute.call_args.args[0]
+        assert "SELECT *" not in query
+        assert "file_upload IS NOT NULL" in query
+        assert b"/patient-file/1/preview?v=d1" in response.data
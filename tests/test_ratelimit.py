@@ -0,0 +1,105 @@
+"""Tests for signin rate limiting."""
+
+from unittest.mock import MagicMock
+
+from flask import Flask, request
+
+from main import app
+from ratelimit import MemoryBackend, RedisBackend, SigninLimiter
+
+
+class TestTokenBuckets:
+    """Tests for the bucket backends and the limiter."""
+
+    def test_bucket_refills_over_time(self):
+        """Test that a drained bucket allows again once a token refilled."""
+        backend = MemoryBackend()
+
+        assert backend.take("k", 2, 1.0, now=0) == 0
+        assert backend.take("k", 2, 1.0, now=0) == 0
+        assert backend.take("k", 2, 1.0, now=0.5) == 0.5
+        assert backend.take("k", 2, 1.0, now=1.0) == 0
+
+    def test_evicts_least_recently_used(self):
+        """Test that the structure stays bounded."""
+        backend = MemoryBackend(max_keys=2)
+        for key in ("a", "b", "a", "c"):
+            backend.take(key, 5, 1.0, now=0)
+
+        assert list(backend._buckets) == ["a", "c"]
+
+    def test_limiter_counts_rejections_by_scope(self):
+        """Test that the IP bucket is checked before the email bucket."""
+        flask_app = Flask(__name__)
+        flask_app.config["RATELIMIT_SIGNIN_IP"] = (2, 0.001)
+        flask_app.config["RATELIMIT_SIGNIN_EMAIL"] = (1, 0.001)
+        limiter = SigninLimiter(flask_app)
+
+        assert limiter.check("10.0.0.1", "A@example.com") == 0
+        assert limiter.check("10.0.0.2", " a@example.com") > 0
+        assert limiter.check("10.0.0.1", "b@example.com") == 0
+        assert limiter.check("10.0.0.1", "c@example.com") > 0
+
+        assert limiter.stats() == {"ip": 1, "email": 1}
+
+    def test_shared_backend_is_pluggable(self):
+        """Test that a Redis backend runs the bucket script per key."""
+        client = MagicMock()
+        client.register_script.return_value.return_value = b"0"
+        limiter = SigninLimiter(Flask(__name__), backend=RedisBackend(client))
+
+        assert limiter.check("10.0.0.1", "a@example.com") == 0
+        keys = [
+            c.kwargs["keys"] for c in client.register_script.return_value.call_args_list
+        ]
+        assert keys == [
+            ["medix:signin:ip:10.0.0.1"],
+            ["medix:signin:email:a@example.com"],
+        ]
+
+    def test_client_address_behind_proxy(self):
+        """Test that clients behind a trusted proxy get their own buckets."""
+        flask_app = Flask(__name__)
+        flask_app.config["TRUSTED_PROXIES"] = 1
+        flask_app.config["RATELIMIT_SIGNIN_IP"] = (1, 1 / 60)
+        limiter = SigninLimiter(flask_app)
+        flask_app.add_url_rule(
+            "/signin",
+            "signin",
+            lambda: str(limiter.check(request.remote_addr, request.args["email"])),
+        )
+        client = flask_app.test_client()
+
+        def attempt(forwarded_for, email):
+            headers = {"X-Forwarded-For": forwarded_for}
+            return client.get(f"/signin?email={email}", headers=headers).data
+
+        assert attempt("203.0.113.7", "a@example.com") == b"0"
+        assert attempt("198.51.100.2", "b@example.com") == b"0"
+        assert attempt("203.0.113.7", "c@example.com") != b"0"
+
+
+class TestSigninRateLimit:
+    """Tests for rate limiting on the signin route."""
+
+    def test_rejects_before_querying_database(
+        self, client, mock_mysql, mock_cursor, sample_doctor
+    ):
+        """Test that excess attempts get a 429 without touching the database."""
+        mock_cursor.fetchone.return_value = sample_doctor
+        capacity, _ = app.config["RATELIMIT_SIGNIN_EMAIL"]
+        data = {"email_address": "john.doe@example.com", "password": "wrong"}
+
+        for _ in range(capacity):
+            assert client.post("/signin", data=data).status_code == 302
+        response = client.post("/signin", data=data)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert b"Too many sign-in attempts" in response.data
+        assert mock_cursor.execute.call_count == capacity
+
+    def test_stats_endpoint(self, authenticated_session):
+        """Test that rejection counters are exposed."""
+        response = authenticated_session.get("/signin-rate-limit")
+        assert response.get_json() == {"rejected": {"ip": 0, "email": 0}}
@@ -0,0 +1,73 @@
+"""Tests for compact row records."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from pymysql.cursors import Cursor
+
+import records
+
+Visit = records.record_type("Visit", ("id", "first_name", "birth_date"))
+
+
+class TestRecords:
+    """Tests for the slotted record classes."""
+
+    def test_attribute_and_key_access(self):
+        """Test that records read like rows of either cursor class."""
+        visit = Visit(1, "Jane", None)
+
+        assert visit.first_name == "Jane"
+        assert visit["first_name"] == "Jane"
+        assert visit.get("nope", "default") == "default"
+        assert visit._asdict() == {"id": 1, "first_name": "Jane", "birth_date": None}
+        assert visit == Visit(1, "Jane", None)
+        assert repr(visit) == "Visit(id=1, first_name='Jane', birth_date=None)"
+        with pytest.raises(KeyError):
+            visit["nope"]
+
+    def test_no_instance_dict(self):
+        """Test that records carry no per-row dict."""
+        visit = Visit(1, "Jane", None)
+
+        assert not hasattr(visit, "__dict__")
+        with pytest.raises(AttributeError):
+            visit.extra = 1
+
+    def test_invalid_field_names_rejected(self):
+        """Test that field names must be distinct identifiers (they go into code)."""
+        with pytest.raises(ValueError):
+            records.record_type("Bad", ("id", "x); import os; (y"))
+        with pytest.raises(ValueError):
+            records.record_type("Bad", ("id", "class"))
+        with pytest.raises(ValueError):
+            records.record_type("Bad", ("id", "id"))
+
+    def test_fetch_records_from_tuple_and_dict_cursors(self):
+        """Test conversion of tuple rows, and dict rows by column name."""
+        cur = MagicMock()
+        cur.fetchall.return_value = [(1, "Jane", None), (2, "John", "1990-01-01")]
+        assert records.fetch_records(cur, Visit)[1] == Visit(2, "John", "1990-01-01")
+
+        cur.fetchall.return_value = [
+            {"birth_date": None, "first_name": "Jane", "id": 1, "extra": 0}
+        ]
+        assert records.fetch_records(cur, Visit) == [Visit(1, "Jane", None)]
+
+
+class TestMyPatientsRows:
+    """Tests for the records on the My Patients page."""
+
+    def test_list_uses_tuple_cursor(
+        self, authenticated_session, mock_connection, mock_cursor, sample_doctor
+    ):
+        """Test that the page renders records built from tuple rows."""
+        mock_cursor.fetchall.return_value = [
+            (7, "Ada", "Lovelace", "1815-12-10", "Female", "ada@example.com", "I7")
+        ]
+        mock_cursor.fetchone.return_value = sample_doctor
+        response = authenticated_session.get("/my-patients")
+
+        assert mock_connection.cursor.call_args_list[0].args == (Cursor,)
+        assert b"Lovelace" in response.data
+        assert b"/edit-patient/7" in response.data
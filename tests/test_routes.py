@@ -1,5 +1,7 @@
 """Tests for basic routes and error handlers."""
 
+from views import static
+
 
 class TestRootRoute:
     """Tests for the root route."""
@@ -23,6 +25,17 @@ class TestStaticFiles:
         # Should return 200 if file exists, or 404 if not
         assert response.status_code in [200, 404]
 
+    def test_built_homepage_preferred(self, client, monkeypatch, tmp_path):
+        """Test that the homepage and its stylesheet come from the build."""
+        (tmp_path / "css").mkdir()
+        (tmp_path / "index.html").write_text("<style>built</style>")
+        (tmp_path / "css" / "site.0123456789.css").write_text("body{}")
+        monkeypatch.setattr(static, "FRONTEND_DIST_DIR", str(tmp_path))
+
+        assert client.get("/").data == b"<style>built</style>"
+        assert client.get("/css/site.0123456789.css").data == b"body{}"
+        assert client.get("/css/styles.css").status_code == 200
+
 
 class TestErrorHandlers:
     """Tests for error handlers."""
@@ -0,0 +1,261 @@
+"""Tests for sharding patient data by doctor."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+import sharding
+from sharding import ShardMoving, ShardRouter
+from tests.sqlite import SQLiteDatabase, stored_columns
+
+SCHEMA = """
+CREATE TABLE patients_db (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT,
+    allergies TEXT, chronic_diseases TEXT, vaccines TEXT, medications TEXT,
+    updated_at TEXT, height REAL, weight REAL,
+    bmi REAL GENERATED ALWAYS AS (ROUND(weight / (height * height) * 10000, 1))
+);
+CREATE TABLE patients_archive (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT,
+    allergies TEXT, chronic_diseases TEXT, vaccines TEXT, medications TEXT,
+    updated_at TEXT, height REAL, weight REAL,
+    bmi REAL GENERATED ALWAYS AS (ROUND(weight / (height * height) * 10000, 1))
+);
+CREATE TABLE patient_clinical_terms (
+    term_id INTEGER, doctor_id INTEGER, patient_id INTEGER
+);
+CREATE TABLE doctor_patient_stats (
+    doctor_id INTEGER, dimension TEXT, bucket TEXT, patient_count INTEGER,
+    PRIMARY KEY (doctor_id, dimension, bucket)
+);
+CREATE TABLE appointments (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, patient_id INTEGER,
+    starts_at TEXT, ends_at TEXT, status TEXT, notes TEXT, created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE patient_tombstones (
+    doctor_id INTEGER, patient_id INTEGER,
+    deleted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (doctor_id, patient_id)
+);
+CREATE TABLE patient_match_keys (
+    doctor_id INTEGER, match_key TEXT, patient_id INTEGER,
+    PRIMARY KEY (doctor_id, match_key, patient_id)
+);
+CREATE TABLE doctor_shards (
+    doctor_id INTEGER PRIMARY KEY, shard TEXT, moving INTEGER DEFAULT 0
+);
+"""
+
+
+@pytest.fixture(autouse=True)
+def sqlite_columns(monkeypatch):
+    monkeypatch.setattr(sharding.schema, "stored_columns", stored_columns)
+
+
+@pytest.fixture
+def no_term_sync(monkeypatch):
+    """Term links use MySQL-only SQL; record the calls instead"""
+    calls = []
+    monkeypatch.setattr(
+        sharding.conditions,
+        "sync_patient_terms",
+        lambda cur, doctor_id, patient_id, kind, text: calls.append(
+            (patient_id, kind, text)
+        ),
+    )
+    return calls
+
+
+def add_patients(shard, doctor_id, ids, updated_at="2025-06-01 00:00:00"):
+    shard.db.executemany(
+        "INSERT INTO patients_db (id, doctor_id, first_name, allergies, updated_at, "
+        "height, weight) VALUES (?, ?, ?, ?, ?, 180, 81)",
+        [(i, doctor_id, f"Patient {i}", "Penicillin", updated_at) for i in ids],
+    )
+    shard.db.commit()
+
+
+class TestMoveDoctor:
+    """Tests for the online rebalancing tool."""
+
+    def test_moves_patients_and_changes_made_during_copy(self, no_term_sync):
+        """Test that writes racing the bulk copy still reach the new shard."""
+        directory, source, target = (SQLiteDatabase(SCHEMA) for _ in range(3))
+        add_patients(source, 1, range(1, 8))
+        add_patients(source, 2, [100])
+        source.db.execute(
+            "INSERT INTO patients_archive (id, doctor_id, first_name) "
+            "VALUES (50, 1, 'Archived')"
+        )
+        source.db.execute(
+            "INSERT INTO doctor_patient_stats VALUES (1, 'registered_month', "
+            "'2025-06', 7)"
+        )
+        source.db.executemany(
+            "INSERT INTO appointments (id, doctor_id, patient_id, status) "
+            "VALUES (?, ?, ?, 'scheduled')",
+            [(1, 1, 2), (2, 2, 100)],
+        )
+        source.db.commit()
+        seen_during_freeze = []
+
+        def in_flight_writes(grace):
+            # Requests that passed the moving check before the flag was set
+            seen_during_freeze.extend(
+                directory.rows("SELECT shard, moving FROM doctor_shards")
+            )
+            source.db.execute(
+                "UPDATE patients_db SET first_name = 'Renamed', updated_at = ? "
+                "WHERE id = 3",
+                ("2026-01-01 00:00:05",),
+            )
+            source.db.execute("DELETE FROM patients_db WHERE id = 5")
+            source.db.execute(
+                "INSERT INTO patients_archive (id, doctor_id, first_name) "
+                "SELECT id, doctor_id, first_name FROM patients_db WHERE id = 7"
+            )
+            source.db.execute("DELETE FROM patients_db WHERE id = 7")
+            source.db.commit()
+
+        moved = sharding.move_doctor(
+            directory,
+            source,
+            target,
+            1,
+            "primary",
+            "shard-b",
+            chunk_size=3,
+            log=lambda message: None,
+            sleep=in_flight_writes,
+        )
+
+        assert moved == 5
+        assert seen_during_freeze == [("primary", 1)]
+        assert directory.rows("SELECT shard, moving FROM doctor_shards") == [
+            ("shard-b", 0)
+        ]
+        assert target.rows("SELECT id FROM patients_db ORDER BY id") == [
+            (1,),
+            (2,),
+            (3,),
+            (4,),
+            (6,),
+        ]
+        assert target.rows("SELECT id FROM patients_archive ORDER BY id") == [
+            (7,),
+            (50,),
+        ]
+        assert target.rows("SELECT first_name FROM patients_db WHERE id = 3") == [
+            ("Renamed",)
+        ]
+        # The generated BMI is computed again rather than copied
+        assert target.rows("SELECT bmi FROM patients_db WHERE id = 1") == [(25.0,)]
+        assert target.rows("SELECT patient_count FROM doctor_patient_stats") == [(7,)]
+        assert target.rows("SELECT id, patient_id FROM appointments") == [(1, 2)]
+        assert source.rows("SELECT id FROM appointments") == [(2,)]
+        assert source.rows("SELECT doctor_id FROM patients_db") == [(2,)]
+        assert source.rows("SELECT COUNT(*) FROM patients_archive") == [(0,)]
+        assert ({call[0] for call in no_term_sync}) == {1, 2, 3, 4, 6, 7, 50}
+
+    def test_failure_keeps_doctor_on_source(self, no_term_sync):
+        """Test that a failed move is undone and writes are allowed again."""
+        directory, source, target = (SQLiteDatabase(SCHEMA) for _ in range(3))
+        add_patients(source, 1, [1, 2])
+
+        def fail(grace):
+            raise RuntimeError("target went away")
+
+        with pytest.raises(RuntimeError):
+            sharding.move_doctor(
+                directory, source, target, 1, "shard-a", "shard-b", sleep=fail
+            )
+
+        assert directory.rows("SELECT shard, moving FROM doctor_shards") == [
+            ("shard-a", 0)
+        ]
+        assert target.rows("SELECT COUNT(*) FROM patients_db") == [(0,)]
+        assert source.rows("SELECT COUNT(*) FROM patients_db") == [(2,)]
+
+
+def make_router(directory_rows=(), shards=("shard-a", "shard-b")):
+    flask_app = Flask(__name__)
+    flask_app.config["pymysql_kwargs"] = {"host": "primary"}
+    flask_app.config["DB_SHARDS"] = {name: {"host": name} for name in shards}
+    primary = MagicMock(name="primary")
+    cursor = primary.cursor.return_value
+    cursor.fetchone.side_effect = list(directory_rows)
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(MagicMock(name=kwargs["host"], host=kwargs["host"]))
+        return opened[-1]
+
+    router = ShardRouter(flask_app, primary=lambda: primary, connect=connect)
+    return flask_app, router, primary, opened
+
+
+class TestShardRouter:
+    """Tests for the directory lookup and connection routing."""
+
+    def test_routes_doctor_to_directory_shard(self):
+        """Test that a doctor's queries go to the shard in the directory."""
+        flask_app, router, primary, opened = make_router(
+            [{"shard": "shard-b", "moving": 0}]
+        )
+
+        with flask_app.app_context():
+            connection = router.connection(7)
+            assert connection.host == "shard-b"
+            assert router.reader(7) is connection
+        assert opened[0].close.called
+        assert primary.cursor.return_value.execute.call_count == 1
+
+    def test_unlisted_doctor_stays_on_primary(self):
+        """Test that doctors from before sharding keep using the primary."""
+        flask_app, router, primary, opened = make_router([None])
+
+        with flask_app.app_context():
+            assert router.connection(7) is primary
+        assert opened == []
+
+    def test_writes_refused_while_moving(self):
+        """Test that the directory flag stops writes but not reads."""
+        flask_app, router, _, _ = make_router([{"shard": "shard-a", "moving": 1}])
+
+        with flask_app.app_context():
+            with pytest.raises(ShardMoving):
+                router.connection(7)
+            assert router.reader(7).host == "shard-a"
+
+    def test_fresh_reads_skip_replicas(self):
+        """Test that fresh reads on the primary shard use the primary."""
+        flask_app, router, primary, _ = make_router([None, None])
+        replica = MagicMock()
+        router.reader_of_primary = lambda: replica
+
+        with flask_app.app_context():
+            assert router.reader(7) is replica
+            assert router.reader(7, fresh=True) is primary
+
+    def test_assign_picks_least_loaded_shard(self):
+        """Test that new doctors go to the shard with the fewest doctors."""
+        _, router, _, _ = make_router()
+        cur = MagicMock()
+        cur.fetchall.return_value = [
+            {"shard": "shard-a", "doctors": 5},
+            {"shard": "shard-b", "doctors": 2},
+        ]
+
+        assert router.assign(cur, 42) == "shard-b"
+        assert cur.execute.call_args.args[1] == (42, "shard-b")
+
+    def test_without_shards_everything_on_primary(self):
+        """Test that an unconfigured router never touches the directory."""
+        flask_app, router, primary, _ = make_router(shards=())
+
+        with flask_app.app_context():
+            assert router.connection(7) is primary
+            assert router.assign(MagicMock(), 7) == "primary"
+        assert not primary.cursor.called
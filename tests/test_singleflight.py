@@ -0,0 +1,215 @@
+"""Tests for collapsing concurrent identical reads."""
+
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pymysql
+import pytest
+from flask import Flask
+
+from singleflight import SingleFlight
+
+
+def make_flight(**config):
+    flask_app = Flask(__name__)
+    flask_app.config.update(config)
+    return SingleFlight(flask_app)
+
+
+def run_concurrently(flight, key, function, count):
+    """Call ``flight.do`` from `count` threads; returns results, errors"""
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(flight.do(key, function))
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+class TestSingleFlight:
+    """Tests for the threaded and asyncio entry points."""
+
+    def test_threads_share_one_call(self):
+        """Test that overlapping calls run the function once."""
+        flight = make_flight()
+        release = threading.Event()
+        executions = []
+
+        def query():
+            executions.append(1)
+            release.wait(5)
+            return ["row"]
+
+        threads, results, _ = run_concurrently(flight, "key", query, 5)
+        # Let every thread join the flight before the leader finishes
+        while flight.stats()["calls"] < 5:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(executions) == 1
+        assert results == [["row"]] * 5
+        stats = flight.stats()
+        assert stats["executed"] == 1
+        assert stats["collapsed"] == 4
+        assert stats["in_flight"] == 0
+        assert stats["collapse_rate"] == 0.8
+
+    def test_error_reaches_waiters(self):
+        """Test that waiters see the leader's error, and the key is freed."""
+        flight = make_flight()
+        release = threading.Event()
+
+        def query():
+            release.wait(5)
+            raise RuntimeError("lost connection")
+
+        threads, results, errors = run_concurrently(flight, "key", query, 3)
+        while flight.stats()["calls"] < 3:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == []
+        assert [str(e) for e in errors] == ["lost connection"] * 3
+        assert flight.do("key", lambda: "fresh") == "fresh"
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test that only calls overlapping in time are shared."""
+        flight = make_flight()
+        values = iter([1, 2])
+
+        assert flight.do("key", lambda: next(values)) == 1
+        assert flight.do("key", lambda: next(values)) == 2
+        assert flight.stats()["collapsed"] == 0
+
+    def test_waiter_runs_call_after_timeout(self):
+        """Test that a stuck leader does not hold its waiters forever."""
+        flight = make_flight(SINGLE_FLIGHT_TIMEOUT=0.01)
+        release = threading.Event()
+        threads, results, _ = run_concurrently(
+            flight, "key", lambda: release.wait(5) and "leader", 1
+        )
+        while flight.stats()["in_flight"] < 1:
+            pass
+
+        assert flight.do("key", lambda: "own") == "own"
+        release.set()
+        threads[0].join()
+        assert results == ["leader"]
+        assert flight.stats()["timeouts"] == 1
+
+    def test_coroutines_share_one_call(self):
+        """Test that overlapping coroutines await a single call."""
+        flight = make_flight()
+        executions = []
+
+        async def query():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return ["row"]
+
+        async def main():
+            return await asyncio.gather(
+                *(flight.do_async("key", query) for _ in range(4))
+            )
+
+        assert asyncio.run(main()) == [["row"]] * 4
+        assert len(executions) == 1
+        assert flight.stats()["collapsed"] == 3
+
+    def test_cancelled_waiter_leaves_call_running(self):
+        """Test that cancelling one coroutine does not fail the others."""
+        flight = make_flight()
+
+        async def query():
+            await asyncio.sleep(0.01)
+            return "row"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("key", query))
+            waiter = asyncio.ensure_future(flight.do_async("key", query))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            return await leader
+
+        assert asyncio.run(main()) == "row"
+
+    def test_disabled(self):
+        """Test that every call runs when the layer is switched off."""
+        flight = make_flight(SINGLE_FLIGHT_ENABLED=False)
+
+        assert flight.do("key", lambda: 1) == 1
+        assert flight.stats()["calls"] == 0
+
+
+class TestDashboardReads:
+    """Tests for the reads routed through the layer."""
+
+    def test_dashboard_reads_are_shared(
+        self, authenticated_session, mock_cursor, sample_doctor
+    ):
+        """Test that the dashboard's header and summary go through it."""
+        from extensions import single_flight
+
+        single_flight.clear()
+        mock_cursor.fetchone.return_value = sample_doctor
+        mock_cursor.fetchall.return_value = []
+        authenticated_session.get("/dashboard")
+
+        assert single_flight.stats()["calls"] == 2
+        response = authenticated_session.get("/single-flight-stats")
+        assert response.get_json()["executed"] == 2
+
+    def test_shared_header_leaves_session_to_each_request(
+        self, authenticated_session, mock_cursor, sample_doctor
+    ):
+        """Test that the shared read does not touch the leader's session."""
+
+        def run_elsewhere(name, doctor_id, function):
+            # As if another request, or none at all, ran the shared call
+            outcome = []
+            thread = threading.Thread(target=lambda: outcome.append(_call(function)))
+            thread.start()
+            thread.join()
+            if isinstance(outcome[0], pymysql.err.OperationalError):
+                raise outcome[0]
+            return outcome[0]
+
+        mock_cursor.fetchone.return_value = sample_doctor
+        mock_cursor.fetchall.return_value = []
+        with patch("views.profile.shared_read", side_effect=run_elsewhere):
+            assert authenticated_session.get("/dashboard").status_code == 200
+            with authenticated_session.session_transaction() as session:
+                assert session["doctor_header"]["first_name"] == "John"
+
+            # The fallback to the session happens in the request as well
+            mock_cursor.execute.side_effect = [
+                None,  # the patient list
+                pymysql.err.OperationalError(2013, "Lost connection"),
+            ]
+            response = authenticated_session.get("/my-patients")
+
+        assert response.status_code == 200
+        assert b"John" in response.data
+
+
+def _call(function):
+    from main import app
+
+    with app.app_context():
+        try:
+            return function()
+        except pymysql.err.OperationalError as e:
+            return e
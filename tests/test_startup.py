@@ -0,0 +1,69 @@
+"""Tests for application startup cost."""
+
+import json
+import os
+import subprocess
+import sys
+
+from main import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a cold ``import main`` (which creates the app) may take. Override
+# with the environment variable on slow CI machines.
+STARTUP_BUDGET = float(os.environ.get("MEDIX_STARTUP_BUDGET", "1.0"))
+
+# Loaded on first use only
+LAZY_MODULES = ("numpy", "pyarrow", "rjsmin", "PIL", "pypdfium2", "analytics", "export")
+
+COLD_START = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def cold_start():
+    """Import the app in a fresh interpreter, so nothing is cached"""
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+class TestStartup:
+    """Tests for the application factory and lazy loading."""
+
+    def test_cold_start_within_budget(self):
+        """Test that importing and creating the app stays within budget."""
+        # Best of three, so one slow run on a busy machine does not fail it
+        elapsed = min(cold_start()["elapsed"] for _ in range(3))
+        assert (
+            elapsed <= STARTUP_BUDGET
+        ), f"cold start took {elapsed:.3f}s, budget is {STARTUP_BUDGET:.3f}s"
+
+    def test_heavy_subsystems_not_loaded_on_startup(self):
+        """Test that optional heavy dependencies are imported lazily."""
+        assert cold_start()["loaded"] == []
+
+    def test_blueprints_and_commands_registered(self):
+        """Test that the factory registers every blueprint and command."""
+        assert set(app.blueprints) == {
+            "auth",
+            "profile",
+            "patients",
+            "appointments",
+            "fhir",
+            "jobs",
+            "static",
+        }
+        assert "export-analytics" in app.cli.commands
@@ -0,0 +1,126 @@
+"""Tests for the incrementally maintained dashboard statistics."""
+
+from datetime import date
+
+import stats
+
+
+def deltas(cursor):
+    """Flatten the counter deltas passed to executemany."""
+    return sorted(
+        (dimension, bucket, delta)
+        for call in cursor.executemany.call_args_list
+        for _, dimension, bucket, delta in call.args[1]
+    )
+
+
+class TestCounterMaintenance:
+    """Tests for the write-path counter updates."""
+
+    def test_record_created_counts_every_dimension(self, mock_cursor):
+        """Test that a new patient increments each of its buckets."""
+        stats.record_created(
+            mock_cursor,
+            1,
+            {"gender": "Female", "birth_date": "1990-05-15", "blood_group": "a+"},
+            today=date(2024, 6, 3),
+        )
+
+        assert deltas(mock_cursor) == [
+            ("birth_year", "1990", 1),
+            ("blood_group", "A+", 1),
+            ("gender", "female", 1),
+            ("registered_month", "2024-06", 1),
+            ("total", "", 1),
+        ]
+
+    def test_record_updated_moves_only_changed_buckets(self, mock_cursor):
+        """Test that an edit decrements the old bucket and increments the new."""
+        stored = {
+            "gender": "female",
+            "birth_date": date(1990, 5, 15),
+            "blood_group": "A+",
+        }
+
+        stats.record_updated(mock_cursor, 1, stored, {"blood_group": "O-"})
+
+        assert deltas(mock_cursor) == [
+            ("blood_group", "A+", -1),
+            ("blood_group", "O-", 1),
+        ]
+
+    def test_record_updated_ignores_unrelated_fields(self, mock_cursor):
+        """Test that edits to other columns leave the counters alone."""
+        stats.record_updated(mock_cursor, 1, {}, {"doctors_note": "Follow up"})
+        assert not mock_cursor.executemany.called
+
+    def test_record_deleted_keeps_registrations(self, mock_cursor):
+        """Test that deletes do not touch monthly registration counts."""
+        stats.record_deleted(
+            mock_cursor, 1, {"gender": "male", "birth_date": "", "blood_group": ""}
+        )
+
+        assert deltas(mock_cursor) == [
+            ("birth_year", "unknown", -1),
+            ("blood_group", "unknown", -1),
+            ("gender", "male", -1),
+            ("total", "", -1),
+        ]
+
+
+class TestLoadSummary:
+    """Tests for shaping the counters for the dashboard."""
+
+    def test_load_summary(self, mock_cursor):
+        """Test that birth years are folded into age bands at read time."""
+        mock_cursor.fetchall.return_value = [
+            {"dimension": "total", "bucket": "", "patient_count": 4},
+            {"dimension": "gender", "bucket": "male", "patient_count": 3},
+            {"dimension": "gender", "bucket": "female", "patient_count": 1},
+            {"dimension": "birth_year", "bucket": "2010", "patient_count": 1},
+            {"dimension": "birth_year", "bucket": "1990", "patient_count": 2},
+            {"dimension": "birth_year", "bucket": "unknown", "patient_count": 1},
+            {"dimension": "registered_month", "bucket": "2024-05", "patient_count": 2},
+        ]
+
+        summary = stats.load_summary(mock_cursor, 1, today=date(2024, 6, 3))
+
+        assert summary["total_patients"] == 4
+        assert summary["gender"] == {"female": 1, "male": 3}
+        assert summary["age_bands"]["0-17"] == 1
+        assert summary["age_bands"]["18-34"] == 2
+        assert summary["age_bands"]["unknown"] == 1
+        assert list(summary["recent_registrations"]) == [
+            "2024-01",
+            "2024-02",
+            "2024-03",
+            "2024-04",
+            "2024-05",
+            "2024-06",
+        ]
+        assert summary["recent_registrations"]["2024-05"] == 2
+
+
+class TestDashboardStatistics:
+    """Tests for the statistics rendered on the dashboard."""
+
+    def test_dashboard_renders_summary(
+        self, authenticated_session, mock_mysql, mock_cursor, sample_doctor
+    ):
+        """Test that the dashboard shows the stored counters."""
+        mock_cursor.fetchone.return_value = {
+            "first_name": sample_doctor["first_name"],
+            "last_name": sample_doctor["last_name"],
+            "specialty": sample_doctor["specialty"],
+            "profile_picture": None,
+        }
+        mock_cursor.fetchall.return_value = [
+            {"dimension": "blood_group", "bucket": "AB-", "patient_count": 7},
+        ]
+
+        response = authenticated_session.get("/dashboard")
+
+        assert response.status_code == 200
+        assert b"AB-" in response.data
+        # Only the doctor lookup and one counter query hit the database
+        assert mock_cursor.execute.call_count == 2
@@ -0,0 +1,148 @@
+"""Tests for incremental patient sync."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import sync
+from tests.sqlite import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE patients_db (
+    id INTEGER PRIMARY KEY, doctor_id INTEGER, first_name TEXT,
+    version INTEGER DEFAULT 1, updated_at TIMESTAMP, deleted_at TIMESTAMP
+);
+CREATE TABLE patient_tombstones (
+    doctor_id INTEGER, patient_id INTEGER, deleted_at TIMESTAMP,
+    PRIMARY KEY (doctor_id, patient_id)
+);
+"""
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(
+        sync, "PATIENT_FIELDS", ("id", "first_name", "version", "updated_at")
+    )
+    database = SQLiteDatabase(SCHEMA, parse_timestamps=True)
+    database.db.executemany(
+        "INSERT INTO patients_db (id, doctor_id, first_name, updated_at) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (1, 1, "Ada", NOW - timedelta(days=3)),
+            (2, 1, "Bea", NOW - timedelta(days=2)),
+            (3, 1, "Cy", NOW - timedelta(days=2)),
+            (4, 2, "Dee", NOW - timedelta(days=1)),
+        ],
+    )
+    database.db.commit()
+    return database
+
+
+def sync_all(database, cursor=None, now=NOW, limit=500):
+    """Follow pages until ``has_more`` is false; returns pages, cursor"""
+    pages = []
+    while True:
+        page = sync.changes(database.cursor(), 1, cursor, limit, now=now)
+        pages.append(page)
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            return pages, cursor
+
+
+class TestChanges:
+    """Tests for paging through changes."""
+
+    def test_first_sync_pages_through_caseload(self, database):
+        """Test a full sync in pages, in (updated_at, id) order."""
+        pages, _ = sync_all(database, limit=2)
+
+        assert [[p["id"] for p in page["patients"]] for page in pages] == [
+            [1, 2],
+            [3],
+        ]
+        assert pages[0]["patients"][0] == {
+            "id": 1,
+            "first_name": "Ada",
+            "version": 1,
+            "updated_at": "2026-02-26T12:00:00",
+        }
+        assert all(page["deleted"] == [] for page in pages)
+
+    def test_next_sync_returns_only_changes(self, database):
+        """Test that an up-to-date client only receives edits and deletions."""
+        _, cursor = sync_all(database)
+        later = NOW + timedelta(hours=1)
+        database.db.execute(
+            "UPDATE patients_db SET first_name = 'Bee', version = 2, updated_at = ? "
+            "WHERE id = 2",
+            (later - timedelta(minutes=5),),
+        )
+        database.db.execute(
+            "INSERT INTO patient_tombstones VALUES (1, 3, ?)",
+            (later - timedelta(minutes=4),),
+        )
+        database.db.execute("DELETE FROM patients_db WHERE id = 3")
+
+        pages, cursor = sync_all(database, cursor, now=later)
+
+        assert [
+            (p["id"], p["first_name"], p["version"]) for p in pages[0]["patients"]
+        ] == [(2, "Bee", 2)]
+        assert pages[0]["deleted"] == [3]
+        pages, _ = sync_all(database, cursor, now=later)
+        assert pages == [{**pages[0], "patients": [], "deleted": []}]
+
+    def test_recent_writes_wait_to_settle(self, database):
+        """Test that rows stamped within the settle lag come next time."""
+        database.db.execute(
+            "UPDATE patients_db SET updated_at = ? WHERE id = 1",
+            (NOW - timedelta(seconds=1),),
+        )
+
+        pages, cursor = sync_all(database)
+
+        assert [p["id"] for p in pages[0]["patients"]] == [2, 3]
+        later = NOW + timedelta(seconds=sync.SETTLE_SECONDS)
+        pages, _ = sync_all(database, cursor, now=later)
+        assert [p["id"] for p in pages[0]["patients"]] == [1]
+
+    def test_bad_and_expired_cursors(self, database):
+        """Test that clients with unusable cursors are told so."""
+        with pytest.raises(ValueError):
+            sync.changes(database.cursor(), 1, "not-a-cursor", now=NOW)
+
+        old = sync.encode_cursor(NOW - timedelta(days=sync.TOMBSTONE_DAYS + 1), 1)
+        with pytest.raises(sync.CursorExpired):
+            sync.changes(database.cursor(), 1, old, now=NOW)
+
+
+class TestSyncRoutes:
+    """Tests for the sync endpoint and the tombstones of deletions."""
+
+    def test_requires_login(self, client):
+        """Test that changes are only served to signed-in doctors."""
+        assert client.get("/patients/changes").status_code == 401
+
+    def test_malformed_cursor(self, authenticated_session, mock_cursor):
+        """Test that a malformed cursor is a client error."""
+        mock_cursor.fetchone.return_value = {"now": NOW}
+
+        response = authenticated_session.get("/patients/changes?cursor=zz")
+
+        assert response.status_code == 400
+
+    def test_delete_leaves_tombstone(
+        self, authenticated_session, mock_cursor, sample_patient
+    ):
+        """Test that deleting a patient records it for sync clients."""
+        mock_cursor.fetchone.return_value = sample_patient
+        mock_cursor.rowcount = 1
+
+        authenticated_session.post("/delete-patient/1")
+
+        query, rows = mock_cursor.executemany.call_args.args
+        assert "patient_tombstones" in query
+        assert rows == [(1, 1)]
@@ -0,0 +1,10 @@
+"""Blueprints for the web app, registered by :func:`main.create_app`.
+
+* :mod:`views.auth` -- signin, signup and logout
+* :mod:`views.profile` -- dashboard and the doctor's own profile
+* :mod:`views.patients` -- patient records, history, search and analytics
+* :mod:`views.appointments` -- appointments and the dashboard calendars
+* :mod:`views.fhir` -- FHIR R4 export of the doctor's patients
+* :mod:`views.jobs` -- status of background jobs
+* :mod:`views.static` -- the static homepage and the service worker
+"""
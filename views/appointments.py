@@ -0,0 +1,182 @@
+"""Appointments: the dashboard calendars' data, free slots, booking and
+cancelling. All responses are JSON."""
+
+from datetime import date, datetime, time, timedelta
+
+from flask import Blueprint, request, session
+
+import appointments
+import archive
+from extensions import db_router, shard_router
+from sharding import ShardMoving
+
+bp = Blueprint("appointments", __name__)
+
+# Longest span the calendar endpoint returns at once
+MAX_CALENDAR_MONTHS = 12
+
+# Free slots are offered within these hours
+WORKING_HOURS = (time(8, 0), time(18, 0))
+
+
+def _month(value, default):
+    return appointments.parse_month(value) if value else default
+
+
+@bp.route("/appointments/calendar")
+def calendar():
+    """A doctor's appointments between two months (``YYYY-MM``, inclusive)
+    and the number on each day. Defaults to the three months on the
+    dashboard."""
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    this_month = date.today().replace(day=1)
+    try:
+        first = _month(request.args.get("from"), this_month - timedelta(days=1))
+        last = _month(request.args.get("to"), this_month + timedelta(days=31))
+    except ValueError:
+        return {"error": "from and to must be months as YYYY-MM"}, 400
+    months = (last.year - first.year) * 12 + last.month - first.month + 1
+    if not 0 < months <= MAX_CALENDAR_MONTHS:
+        return {"error": f"Ask for 1 to {MAX_CALENDAR_MONTHS} months at once"}, 400
+
+    doctor_id = session["user_id"]
+    start, end = appointments.month_bounds(first, last)
+    cur = shard_router.reader(doctor_id).cursor()
+    try:
+        index = appointments.load_index(cur, doctor_id, start, end)
+    finally:
+        cur.close()
+
+    return {
+        "from": first.strftime("%Y-%m"),
+        "to": last.strftime("%Y-%m"),
+        "days": appointments.calendar(index, start, end),
+        "appointments": [
+            appointments.serialize(row) for _, _, row in index.overlapping(start, end)
+        ],
+    }
+
+
+@bp.route("/appointments/free-slots")
+def free_slots():
+    """Start times of free slots of `duration` minutes on `date`"""
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    try:
+        day = datetime.strptime(request.args["date"], "%Y-%m-%d").date()
+        duration = timedelta(minutes=int(request.args.get("duration", 30)))
+    except (KeyError, ValueError):
+        return {"error": "date (YYYY-MM-DD) and duration (minutes) required"}, 400
+    error = appointments.validate(datetime.min, datetime.min + duration)
+    if error:
+        return {"error": error}, 400
+
+    doctor_id = session["user_id"]
+    start = datetime.combine(day, WORKING_HOURS[0])
+    end = datetime.combine(day, WORKING_HOURS[1])
+    cur = shard_router.reader(doctor_id).cursor()
+    try:
+        index = appointments.load_index(cur, doctor_id, start, end)
+    finally:
+        cur.close()
+
+    return {
+        "date": day.isoformat(),
+        "duration": duration.seconds // 60,
+        "slots": [
+            slot.strftime("%H:%M") for slot in index.free_slots(start, end, duration)
+        ],
+    }
+
+
+@bp.route("/appointments", methods=["POST"])
+def book():
+    """Book an appointment; answers 409 with the conflicting ones if the
+    doctor is busy at that time"""
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        patient_id = int(data["patient_id"])
+        starts_at = datetime.fromisoformat(data["starts_at"])
+        ends_at = starts_at + timedelta(minutes=int(data.get("duration", 30)))
+    except (KeyError, TypeError, ValueError):
+        return {
+            "error": "patient_id, starts_at (ISO date and time) and duration "
+            "(minutes) required"
+        }, 400
+    error = appointments.validate(starts_at, ends_at)
+    if error:
+        return {"error": error}, 400
+
+    doctor_id = session["user_id"]
+    try:
+        connection = shard_router.connection(doctor_id)
+    except ShardMoving as e:
+        return {"error": str(e)}, 503
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT id FROM patients_db
+            WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+            """,
+            (patient_id, doctor_id),
+        )
+        if not cur.fetchone() and not archive.restore(cur, doctor_id, patient_id):
+            return {"error": "Patient not found"}, 404
+
+        appointment_id, conflicts = appointments.book(
+            cur, doctor_id, patient_id, starts_at, ends_at, data.get("notes")
+        )
+        if conflicts:
+            connection.rollback()
+            return {
+                "error": "The doctor already has an appointment at that time",
+                "conflicts": [appointments.serialize(row) for row in conflicts],
+            }, 409
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    db_router.pin()
+    return {
+        "appointment": {
+            "id": appointment_id,
+            "patient_id": patient_id,
+            "starts_at": starts_at.isoformat(timespec="minutes"),
+            "ends_at": ends_at.isoformat(timespec="minutes"),
+            "status": appointments.SCHEDULED,
+            "notes": data.get("notes"),
+        }
+    }, 201
+
+
+@bp.route("/appointments/<int:appointment_id>/cancel", methods=["POST"])
+def cancel(appointment_id):
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    doctor_id = session["user_id"]
+    try:
+        connection = shard_router.connection(doctor_id)
+    except ShardMoving as e:
+        return {"error": str(e)}, 503
+    cur = connection.cursor()
+    try:
+        cancelled = appointments.cancel(cur, doctor_id, appointment_id)
+        connection.commit()
+    finally:
+        cur.close()
+
+    if not cancelled:
+        return {"error": "Appointment not found"}, 404
+    db_router.pin()
+    return {"id": appointment_id, "status": appointments.CANCELLED}
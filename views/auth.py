@@ -0,0 +1,131 @@
+"""Signin, signup and logout."""
+
+import math
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from extensions import db_router, mysql, shard_router, signin_limiter
+
+bp = Blueprint("auth", __name__)
+
+
+@bp.route("/signin", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
+def signin():
+    if request.method == "POST":
+        # Retrieve form data
+        email_address = request.form["email_address"]
+        password = request.form["password"]
+
+        # Turn away floods before spending a query and a password hash on them
+        wait = signin_limiter.check(request.remote_addr, email_address)
+        if wait:
+            retry_after = max(1, math.ceil(wait))
+            flash(
+                "Too many sign-in attempts. "
+                f"Please try again in {retry_after} seconds.",
+                "danger",
+            )
+            return (
+                render_template("signin.html"),
+                429,
+                {"Retry-After": str(retry_after)},
+            )
+
+        # Query the database for user
+        connection = db_router.reader()
+        cur = connection.cursor()
+        cur.execute(
+            "SELECT * FROM doctors_db WHERE email_address = %s", (email_address,)
+        )
+        user = cur.fetchone()
+        cur.close()
+
+        # Check if user exists and password matches
+        if user and check_password_hash(user["password"], password):
+            # Set session and redirect to a dashboard or home page
+            session["logged_in"] = True
+            session["user_id"] = user["id"]
+            flash("Logged in successfully!", "success")
+            return redirect(
+                url_for("profile.dashboard")
+            )  # Replace 'dashboard' with your actual route
+
+        flash("Invalid email or password.", "danger")
+        return redirect(url_for("auth.signin"))
+
+    # Render the signin page
+    return render_template("signin.html")
+
+
+@bp.route("/signin-rate-limit")
+def signin_rate_limit():
+    """Rejected signin attempts since startup, for monitoring"""
+    if "logged_in" not in session:
+        return {"error": "Not logged in"}, 401
+    return {"rejected": signin_limiter.stats()}
+
+
+@bp.route("/signup", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
+def signup():
+    if request.method == "POST":
+        # Retrieve form data
+        first_name = request.form["first_name"]
+        last_name = request.form["last_name"]
+        birth_date = request.form["birth_date"]
+        gender = request.form["gender"]
+        license_number = request.form["license_number"]
+        nationality = request.form["nationality"]
+        email_address = request.form["email_address"]
+        phone_number = request.form["phone_number"]
+        work_address = request.form["work_address"]
+        specialty = request.form["specialty"]
+        password = request.form["password"]
+
+        # Hash the password
+        hashed_password = generate_password_hash(password)
+
+        # Insert new user into the database
+        cur = mysql.connection.cursor()
+        cur.execute(
+            """
+            INSERT INTO doctors_db 
+            (first_name, last_name, birth_date, gender, license_number, nationality, 
+            email_address, phone_number, work_address, specialty, password)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+            (
+                first_name,
+                last_name,
+                birth_date,
+                gender,
+                license_number,
+                nationality,
+                email_address,
+                phone_number,
+                work_address,
+                specialty,
+                hashed_password,
+            ),
+        )
+        # Place the new doctor's patient data on the least loaded shard
+        shard_router.assign(cur, cur.lastrowid)
+        mysql.connection.commit()
+        cur.close()
+        db_router.pin()
+
+        # Set a flash message and redirect to the login page
+        flash("Account created successfully! Please log in.", "success")
+        return redirect(url_for("auth.signin"))
+
+    # Render the signup page
+    return render_template("signup.html")
+
+
+@bp.route("/logout")
+def logout():
+    session.clear()
+    flash("You have been logged out.", "success")
+    return redirect(url_for("auth.signin"))
@@ -0,0 +1,69 @@
+"""FHIR R4 read access to the signed-in doctor's patients, see :mod:`fhir`."""
+
+from flask import Blueprint, Response, request, session, stream_with_context, url_for
+
+import fhir
+from extensions import shard_router
+
+bp = Blueprint("fhir", __name__)
+
+DEFAULT_COUNT = 100
+MAX_COUNT = 1000
+
+
+@bp.route("/fhir/Patient")
+def patients():
+    """A page of patients and their resources as a ``searchset`` Bundle.
+
+    Pages are addressed by the last patient id of the previous page
+    (``_cursor``), which the ``next`` link carries.
+    """
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    doctor_id = session["user_id"]
+    count = request.args.get("_count", DEFAULT_COUNT, type=int)
+    after_id = request.args.get("_cursor", 0, type=int)
+    if not 1 <= count <= MAX_COUNT:
+        return {"error": f"_count must be between 1 and {MAX_COUNT}"}, 400
+
+    def page_url(cursor):
+        args = {"_count": count}
+        if cursor is not None:
+            args["_cursor"] = cursor
+        elif after_id:
+            args["_cursor"] = after_id
+        return url_for("fhir.patients", _external=True, **args)
+
+    # One row more than the page tells whether there is a next one
+    rows = fhir.iter_patients(
+        shard_router.reader(doctor_id), doctor_id, after_id, limit=count + 1
+    )
+    base_url = url_for("fhir.patients", _external=True).rsplit("/", 1)[0]
+    return Response(
+        stream_with_context(fhir.bundle_page(rows, count, base_url, page_url)),
+        mimetype=fhir.FHIR_JSON,
+    )
+
+
+@bp.route("/fhir/export.ndjson")
+def export_ndjson():
+    """Every patient resource as NDJSON, optionally only ``_type=A,B``"""
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    doctor_id = session["user_id"]
+    types = fhir.RESOURCE_TYPES
+    if request.args.get("_type"):
+        types = tuple(request.args["_type"].split(","))
+        unknown = set(types) - set(fhir.RESOURCE_TYPES)
+        if unknown:
+            return {"error": f"Unsupported _type: {', '.join(sorted(unknown))}"}, 400
+
+    rows = fhir.iter_patients(shard_router.reader(doctor_id), doctor_id)
+    response = Response(
+        stream_with_context(fhir.ndjson_lines(rows, types)),
+        mimetype=fhir.FHIR_NDJSON,
+    )
+    response.headers["Content-Disposition"] = "attachment; filename=patients.ndjson"
+    return response
@@ -0,0 +1,41 @@
+"""Helpers shared by the edit forms, which only write changed columns."""
+
+
+def field_changed(stored, submitted):
+    """Compare a stored column value with a submitted form value"""
+    if stored is None or stored == "":
+        return submitted not in (None, "")
+    if isinstance(submitted, float):
+        try:
+            return float(stored) != submitted
+        except (TypeError, ValueError):
+            return True
+    return str(stored) != str(submitted)
+
+
+def changed_fields(stored, submitted):
+    """Return the submitted columns whose values differ from the stored row.
+
+    Fields the form did not send (``None``), such as disabled inputs, are
+    treated as unchanged rather than cleared.
+    """
+    return {
+        column: value
+        for column, value in submitted.items()
+        if value is not None and field_changed(stored.get(column), value)
+    }
+
+
+def update_changed_columns(cur, table, changes, where):
+    """Issue an UPDATE that only touches the columns in `changes`"""
+    assignments = ", ".join(f"{column} = %s" for column in changes)
+    conditions = " AND ".join(f"{column} = %s" for column in where)
+    cur.execute(
+        f"UPDATE {table} SET {assignments} WHERE {conditions}",
+        (*changes.values(), *where.values()),
+    )
+
+
+def describe_fields(columns):
+    """Human-readable list of column names for flash messages"""
+    return ", ".join(column.replace("_", " ") for column in columns)
@@ -0,0 +1,25 @@
+"""Status of background jobs, for pages waiting on one."""
+
+from flask import Blueprint, session
+
+from extensions import job_queue, mysql
+
+bp = Blueprint("jobs", __name__)
+
+
+@bp.route("/jobs/<int:job_id>")
+def job_status(job_id):
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    # The queue lives on the primary; read it there so a job is visible
+    # as soon as the request that queued it returns
+    cur = mysql.connection.cursor()
+    try:
+        job = job_queue.status(cur, job_id, session["user_id"])
+    finally:
+        cur.close()
+
+    if job is None:
+        return {"error": "Job not found"}, 404
+    return job
@@ -0,0 +1,788 @@
+"""Patient records: registration, the patient list, editing, history,
+condition search and cohort analytics."""
+
+import logging
+import uuid
+
+from flask import (
+    Blueprint,
+    abort,
+    flash,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from pymysql.cursors import Cursor
+
+import archive
+import conditions
+import duplicates
+import measurements
+import previews
+import records
+import stats
+import sync
+import tasks
+from audit import describe_changes, fetch_history
+from circuit import DatabaseUnavailable
+from extensions import (
+    audit_log,
+    db_guard,
+    db_router,
+    job_queue,
+    mysql,
+    page_cache,
+    shard_router,
+    shared_read,
+    single_flight,
+    term_index,
+)
+from sharding import ShardMoving
+from views.forms import changed_fields, describe_fields, update_changed_columns
+from views.profile import load_doctor
+from views.responses import versioned
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("patients", __name__)
+
+HISTORY_PAGE_SIZE = 50
+SYNC_PAGE_SIZE = 500
+
+# Editable columns, in form order. Only columns listed here can end up in a
+# generated UPDATE statement.
+PATIENT_EDITABLE_FIELDS = (
+    "first_name",
+    "last_name",
+    "birth_date",
+    "gender",
+    "nationality",
+    "health_insurance_number",
+    "email_address",
+    "phone_number",
+    "address",
+    "emergency_contact_name",
+    "emergency_contact_number",
+    "height",
+    "weight",
+    "blood_group",
+    "genotype",
+    "allergies",
+    "chronic_diseases",
+    "disabilities",
+    "vaccines",
+    "medications",
+    "doctors_note",
+)
+
+
+@bp.route("/page-cache-stats")
+def page_cache_stats():
+    """Hit rate and size of the rendered page cache, for monitoring"""
+    if "logged_in" not in session:
+        return {"error": "Not logged in"}, 401
+    return page_cache.stats()
+
+
+@bp.route("/single-flight-stats")
+def single_flight_stats():
+    """Identical concurrent reads collapsed into one query, for monitoring"""
+    if "logged_in" not in session:
+        return {"error": "Not logged in"}, 401
+    return single_flight.stats()
+
+
+@bp.route("/db-circuit-stats")
+def db_circuit_stats():
+    """State of the circuit to each database server, for monitoring"""
+    if "logged_in" not in session:
+        return {"error": "Not logged in"}, 401
+    return db_guard.stats()
+
+
+@bp.route("/db-routing-stats")
+def db_routing_stats():
+    """Replica health and reads per backend, for monitoring"""
+    if "logged_in" not in session:
+        return {"error": "Not logged in"}, 401
+    return db_router.stats()
+
+
+def queue_job(kind, payload, doctor_id):
+    """Add a job on the primary, where the queue lives, and return its id"""
+    cur = mysql.connection.cursor()
+    try:
+        job_id = job_queue.enqueue(cur, kind, payload, owner_id=doctor_id)
+        mysql.connection.commit()
+    finally:
+        cur.close()
+    return job_id
+
+
+@bp.route("/patients/changes")
+def patient_changes():
+    """Patients changed and deleted since ``?cursor=``, for sync clients.
+
+    Without a cursor, pages through every patient. Each page returns the
+    cursor for the next request; ``has_more`` says whether to ask again
+    right away.
+    """
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    doctor_id = session["user_id"]
+    limit = request.args.get("limit", SYNC_PAGE_SIZE, type=int)
+    if not 1 <= limit <= SYNC_PAGE_SIZE:
+        return {"error": f"limit must be between 1 and {SYNC_PAGE_SIZE}"}, 400
+
+    # A lagging replica would let the cursor pass rows it has not received
+    cur = shard_router.reader(doctor_id, fresh=True).cursor()
+    try:
+        return sync.changes(cur, doctor_id, request.args.get("cursor"), limit)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except sync.CursorExpired:
+        return {"error": "Cursor expired, sync again without one", "resync": True}, 410
+    finally:
+        cur.close()
+
+
+@bp.route("/patients/duplicates")
+def possible_duplicates():
+    """Patients that may be the one described by the query string, for the
+    live warning on the registration form"""
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    doctor_id = session["user_id"]
+    patient = {field: request.args.get(field) for field in duplicates.MATCH_FIELDS}
+    cur = shard_router.reader(doctor_id).cursor()
+    try:
+        candidates = duplicates.find_candidates(
+            cur, doctor_id, patient, request.args.get("exclude", type=int)
+        )
+    finally:
+        cur.close()
+    return {
+        "duplicates": [
+            {
+                "patient_id": row["id"],
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "birth_date": str(row["birth_date"] or ""),
+                "score": likelihood,
+                "url": url_for("patients.edit_patient", patient_id=row["id"]),
+            }
+            for likelihood, row in candidates
+        ]
+    }
+
+
+@bp.route("/register-patient", methods=["GET", "POST"])
+def register_patient():
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to register a patient.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    # Fetch doctor's details using the PRIMARY_KEY `id` from doctors_db
+    user_id = session[
+        "user_id"
+    ]  # Assuming `user_id` is stored in the session upon login
+    doctor = load_doctor(user_id)
+
+    if not doctor:
+        flash("Doctor's details could not be found.", "danger")
+        return redirect(url_for("profile.dashboard"))
+
+    if request.method == "POST":
+        # A registration queued offline is replayed by the service worker
+        # with whatever session the browser has by then
+        submitted_by = request.form.get("submitted_by")
+        if submitted_by and submitted_by != str(user_id):
+            return "Registration was queued by another doctor.", 409
+
+        # Retrieve form data
+        values = {
+            column: request.form.get(column) for column in PATIENT_EDITABLE_FIELDS
+        }
+        values["email_address"] = request.form.get("email")
+
+        # Insert patient data into the database along with the doctor_id
+        connection = cur = None
+        try:
+            # Patients live on their doctor's shard
+            connection = shard_router.connection(doctor["id"])
+            values["height"] = measurements.parse_height(values["height"])
+            values["weight"] = measurements.parse_weight(values["weight"])
+
+            cur = connection.cursor()
+            # The form warns about likely duplicates as it is filled in;
+            # this catches submissions that went ahead regardless
+            candidates = duplicates.find_candidates(cur, doctor["id"], values)
+            cur.execute(
+                f"""
+                INSERT INTO patients_db (doctor_id, {", ".join(values)})
+                VALUES ({", ".join(["%s"] * (len(values) + 1))})
+                """,
+                (doctor["id"], *values.values()),
+            )
+            patient_id = cur.lastrowid
+            stats.record_created(cur, doctor["id"], values)
+            duplicates.sync_keys(cur, doctor["id"], patient_id, values)
+            terms = {
+                kind: conditions.sync_patient_terms(
+                    cur, doctor["id"], patient_id, kind, values[kind]
+                )
+                for kind in conditions.KINDS
+            }
+            connection.commit()
+            page_cache.bump(doctor["id"])
+            db_router.pin()
+            for kind, names in terms.items():
+                term_index.add(doctor["id"], kind, names)
+            audit_log.record(
+                doctor["id"], patient_id, "create", describe_changes(None, values)
+            )
+            flash("Patient registered successfully!", "success")
+            if candidates:
+                flash(
+                    "This patient may already be registered as: "
+                    + ", ".join(
+                        f"{row['first_name']} {row['last_name']} (#{row['id']})"
+                        for _, row in candidates
+                    ),
+                    "warning",
+                )
+        except (ShardMoving, DatabaseUnavailable) as e:
+            flash(str(e), "warning")
+        except Exception as e:
+            if connection is not None:
+                connection.rollback()
+            flash(f"An error occurred: {e}", "danger")
+        finally:
+            if cur is not None:
+                cur.close()
+
+        return redirect(url_for("patients.register_patient"))
+
+    # Render the registration form with doctor's details
+    return render_template(
+        "register-patient.html",
+        doctor_first_name=doctor["first_name"],
+        doctor_last_name=doctor["last_name"],
+        doctor_specialty=doctor["specialty"],
+        doctor_avatar=doctor["profile_picture"],
+    )
+
+
+def load_patient_list(doctor_id, archived, condition_kind, condition_term, fresh=False):
+    """Rows of My Patients: archived, matching a condition, or all active.
+
+    A tuple cursor and slotted records keep long lists small in memory.
+    With `fresh`, read from the primary, never a replica.
+    """
+    cur = shard_router.reader(doctor_id, fresh=fresh).cursor(Cursor)
+    try:
+        if archived:
+            return archive.list_archived(cur, doctor_id)
+        if condition_term:
+            return conditions.find_patients(
+                cur, doctor_id, condition_kind, condition_term
+            )
+        cur.execute(
+            """
+            SELECT 
+                patients_db.id AS patient_id,
+                patients_db.first_name,
+                patients_db.last_name,
+                patients_db.birth_date,
+                patients_db.gender,
+                patients_db.email_address,
+                patients_db.health_insurance_number
+            FROM 
+                patients_db
+            WHERE 
+                patients_db.doctor_id = %s
+                AND patients_db.deleted_at IS NULL
+            """,
+            (doctor_id,),
+        )
+        return records.fetch_records(cur, records.PatientListRow)
+    finally:
+        cur.close()
+
+
+@bp.route("/my-patients", methods=["GET", "POST"])
+def my_patients():
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to view your patients.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    # Fetch the doctor's ID from the session
+    user_id = session["user_id"]
+
+    # Rendered pages are cached per doctor and query string. A page showing
+    # flash messages is rendered afresh and kept nowhere, so they are
+    # neither lost nor shown again.
+    variant = tuple(sorted(request.args.items(multi=True)))
+    use_cache = not session.get("_flashes")
+    if use_cache:
+        page = page_cache.get(user_id, variant)
+        if page is not None:
+            return page
+    generation = page_cache.generation(user_id)
+    # Only pages read from the primary are stored: a lagging replica could
+    # return rows from before the write that started this generation
+    fill_cache = use_cache and page_cache.enabled
+
+    # Optional filter on an allergy, vaccine, medication or chronic disease
+    condition_kind = request.args.get("kind")
+    condition_term = request.args.get("term", "").strip()
+    if condition_kind not in conditions.KINDS:
+        condition_term = ""
+
+    # Archived patients are listed on request only; by default the list
+    # and search read the active ones in patients_db
+    archived = request.args.get("archived") == "1"
+
+    # Concurrent loads of the same list share one query
+    patients = shared_read(
+        ("patient-list", fill_cache, archived, condition_kind, condition_term),
+        user_id,
+        lambda: load_patient_list(
+            user_id, archived, condition_kind, condition_term, fresh=fill_cache
+        ),
+    )
+
+    # Calculate the total number of patients
+    total_patients = len(patients)
+
+    # Fetch doctor details for the header
+    doctor = load_doctor(user_id, fresh=fill_cache, shared=True)
+
+    if not doctor:
+        flash("Unable to fetch doctor information.", "danger")
+        return redirect(url_for("profile.dashboard"))
+
+    # Render the my-patients.html template
+    page = render_template(
+        "my-patients.html",
+        doctor_first_name=doctor["first_name"],
+        doctor_last_name=doctor["last_name"],
+        doctor_specialty=doctor["specialty"],
+        doctor_avatar=doctor["profile_picture"],
+        total_patients=total_patients,
+        patients=patients,
+        condition_kinds=conditions.KINDS,
+        condition_kind=condition_kind if condition_term else None,
+        condition_term=condition_term,
+        archived=archived,
+    ).encode()
+    # A page rendered while writes are refused carries the read-only banner
+    if not use_cache:
+        return page, {"Cache-Control": "no-store"}
+    if fill_cache and db_guard.writable():
+        page_cache.set(user_id, variant, page, generation)
+    return page
+
+
+@bp.route("/delete-patient/<int:patient_id>", methods=["POST"])
+def delete_patient(patient_id):
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to delete a patient.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    doctor_id = session["user_id"]
+
+    connection = None
+    try:
+        connection = shard_router.connection(doctor_id)
+        cur = connection.cursor()
+
+        # Keep the deleted values in the audit trail
+        cur.execute(
+            f"""
+            SELECT {", ".join(PATIENT_EDITABLE_FIELDS)} FROM patients_db
+            WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+            """,
+            (patient_id, doctor_id),
+        )
+        stored = cur.fetchone()
+
+        # Hide the patient now; removing the row and its attachment is left
+        # to a background job
+        cur.execute(
+            """
+            UPDATE patients_db SET deleted_at = NOW()
+            WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+            """,
+            (patient_id, doctor_id),
+        )
+        if stored and cur.rowcount:
+            stats.record_deleted(cur, doctor_id, stored)
+            conditions.delete_patient_terms(cur, patient_id)
+            duplicates.delete_keys(cur, doctor_id, patient_id)
+            sync.record_deleted(cur, [(doctor_id, patient_id)])
+        connection.commit()
+        cur.close()
+        page_cache.bump(doctor_id)
+        db_router.pin()
+
+        if stored:
+            audit_log.record(
+                doctor_id,
+                patient_id,
+                "delete",
+                {column: [value, None] for column, value in stored.items()},
+            )
+            # The queue may be on another database than the patient, so the
+            # job cannot commit with the deletion; a lost one is queued
+            # again by ``flask purge-deleted``
+            try:
+                queue_job(
+                    tasks.PURGE_PATIENT,
+                    {"patient_id": patient_id, "doctor_id": doctor_id},
+                    doctor_id,
+                )
+            except Exception:
+                logger.exception("Could not queue the purge of patient %s", patient_id)
+
+        flash("Patient deleted successfully!", "success")
+    except ShardMoving as e:
+        flash(str(e), "warning")
+    except Exception as e:
+        if connection is not None:
+            connection.rollback()
+        flash(f"An error occurred while deleting the patient: {e}", "danger")
+
+    return redirect(url_for("patients.my_patients"))
+
+
+@bp.route("/edit-patient/<int:patient_id>", methods=["GET", "POST"])
+def edit_patient(patient_id):
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to edit a patient's details.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    doctor_id = session["user_id"]  # Retrieve logged-in doctor's ID
+
+    # Fetch the logged-in doctor's details
+    connection = db_router.reader()
+    cur = connection.cursor()
+    cur.execute(
+        """
+        SELECT first_name, last_name, specialty, profile_picture
+        FROM doctors_db
+        WHERE id = %s
+        """,
+        (doctor_id,),
+    )
+    doctor = cur.fetchone()
+
+    if not doctor:
+        flash("Doctor details could not be retrieved.", "danger")
+        return redirect(url_for("auth.signin"))
+
+    # Handle POST request for updating the patient's data
+    if request.method == "POST":
+        shard_connection = None
+        try:
+            data = request.form
+            uploaded_file = request.files.get("file_upload")  # Get uploaded file
+
+            has_upload = bool(uploaded_file and uploaded_file.filename)
+
+            # Prepare data; fields missing from the form stay untouched
+            submitted = {column: data.get(column) for column in PATIENT_EDITABLE_FIELDS}
+            submitted["email_address"] = data.get("email")
+            if submitted["height"]:
+                submitted["height"] = measurements.parse_height(submitted["height"])
+            if submitted["weight"]:
+                submitted["weight"] = measurements.parse_weight(submitted["weight"])
+
+            # Create a new cursor on the doctor's shard
+            cur.close()
+            shard_connection = shard_router.connection(doctor_id)
+            cur = shard_connection.cursor()
+
+            # Compare against the stored record so only modified columns
+            # are written
+            cur.execute(
+                f"""
+                SELECT {", ".join(PATIENT_EDITABLE_FIELDS)} FROM patients_db
+                WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+                """,
+                (patient_id, doctor_id),
+            )
+            stored = cur.fetchone()
+            if not stored and archive.restore(cur, doctor_id, patient_id):
+                shard_connection.commit()
+                page_cache.bump(doctor_id)
+                cur.execute(
+                    f"""
+                    SELECT {", ".join(PATIENT_EDITABLE_FIELDS)} FROM patients_db
+                    WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+                    """,
+                    (patient_id, doctor_id),
+                )
+                stored = cur.fetchone()
+            if not stored:
+                flash("Patient not found.", "danger")
+                return redirect(url_for("patients.my_patients"))
+
+            changes = changed_fields(stored, submitted)
+            for column in measurements.MEASUREMENT_FIELDS:
+                # A cleared measurement is stored as NULL
+                if changes.get(column) == "":
+                    changes[column] = None
+
+            if not changes and not has_upload:
+                flash("No changes to save.", "info")
+                return redirect(url_for("patients.edit_patient", patient_id=patient_id))
+
+            if changes:
+                update_changed_columns(
+                    cur,
+                    "patients_db",
+                    changes,
+                    {"id": patient_id, "doctor_id": doctor_id},
+                )
+                stats.record_updated(cur, doctor_id, stored, changes)
+                if any(field in changes for field in duplicates.MATCH_FIELDS):
+                    duplicates.sync_keys(
+                        cur, doctor_id, patient_id, {**stored, **changes}
+                    )
+                terms = {
+                    kind: conditions.sync_patient_terms(
+                        cur, doctor_id, patient_id, kind, changes[kind]
+                    )
+                    for kind in conditions.KINDS
+                    if kind in changes
+                }
+
+                shard_connection.commit()
+                page_cache.bump(doctor_id)
+                db_router.pin()
+                for kind, names in terms.items():
+                    term_index.add(doctor_id, kind, names)
+                audit_log.record(
+                    doctor_id, patient_id, "update", describe_changes(stored, changes)
+                )
+
+            message = "Patient details updated successfully!"
+            if changes:
+                message += f" Changed: {describe_fields(changes)}."
+            if has_upload:
+                # Stage the upload on disk and let a worker write the BLOB,
+                # so the request does not wait on the size of the file
+                path = job_queue.spool_path(uuid.uuid4().hex)
+                uploaded_file.save(path)
+                queue_job(
+                    tasks.STORE_ATTACHMENT,
+                    {"patient_id": patient_id, "doctor_id": doctor_id, "path": path},
+                    doctor_id,
+                )
+                message += " The attachment is being saved and will appear shortly."
+            flash(message, "success")
+            return redirect(url_for("patients.edit_patient", patient_id=patient_id))
+        except ShardMoving as e:
+            flash(str(e), "warning")
+            return redirect(url_for("patients.edit_patient", patient_id=patient_id))
+        except Exception as e:
+            if shard_connection is not None:
+                shard_connection.rollback()
+            flash(f"An error occurred: {e}", "danger")
+            return redirect(url_for("patients.edit_patient", patient_id=patient_id))
+        finally:
+            cur.close()
+
+    # Handle GET request to fetch patient data; the attachment itself is
+    # served by patient_file, only whether there is one is needed here
+    cur.close()
+    cur = shard_router.reader(doctor_id).cursor()
+    cur.execute(
+        f"""
+        SELECT id, {", ".join(PATIENT_EDITABLE_FIELDS)}, bmi, file_type, file_size,
+               file_digest, file_upload IS NOT NULL AS has_file,
+               file_preview IS NOT NULL AS has_preview
+        FROM patients_db
+        WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+        """,
+        (patient_id, doctor_id),
+    )
+    patient = cur.fetchone()
+    cur.close()
+
+    if not patient:
+        try:
+            restored = restore_archived(doctor_id, patient_id)
+        except ShardMoving as e:
+            flash(str(e), "warning")
+            return redirect(url_for("patients.my_patients"))
+        if restored:
+            flash("Patient restored from the archive.", "info")
+            return redirect(url_for("patients.edit_patient", patient_id=patient_id))
+        flash("Patient not found.", "danger")
+        return redirect(url_for("patients.my_patients"))
+
+    return render_template(
+        "edit-patient.html",
+        patient=patient,
+        patient_id=patient_id,
+        doctor_first_name=doctor["first_name"],
+        doctor_last_name=doctor["last_name"],
+        doctor_specialty=doctor["specialty"],
+        doctor_avatar=doctor["profile_picture"],
+    )
+
+
+def restore_archived(doctor_id, patient_id):
+    """Move an archived patient back so a page can open it; returns
+    whether it was archived"""
+    connection = shard_router.connection(doctor_id)
+    cur = connection.cursor()
+    try:
+        restored = archive.restore(cur, doctor_id, patient_id)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+    if restored:
+        page_cache.bump(doctor_id)
+        db_router.pin()
+    return restored
+
+
+def send_patient_blob(patient_id, column, mimetype=None):
+    """Response with one of a patient's attachment columns.
+
+    Revalidated by digest, and cached for good when requested under the
+    URL of the current version (``?v=<digest>``).
+    """
+    if "logged_in" not in session or not session["logged_in"]:
+        abort(401)
+    doctor_id = session["user_id"]
+
+    cur = shard_router.reader(doctor_id).cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT {column} AS data, file_type, file_digest FROM patients_db
+            WHERE id = %s AND doctor_id = %s AND deleted_at IS NULL
+            """,
+            (patient_id, doctor_id),
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    if not row or not row["data"]:
+        abort(404)
+
+    response = make_response(row["data"])
+    response.mimetype = mimetype or row["file_type"] or "application/octet-stream"
+    return versioned(response, row["file_digest"])
+
+
+@bp.route("/patient-file/<int:patient_id>")
+def patient_file(patient_id):
+    """A patient's attachment, as a download"""
+    response = send_patient_blob(patient_id, "file_upload")
+    response.headers["Content-Disposition"] = "attachment; filename=uploaded_file"
+    return response
+
+
+@bp.route("/patient-file/<int:patient_id>/preview")
+def patient_file_preview(patient_id):
+    """Thumbnail of a patient's attachment"""
+    return send_patient_blob(patient_id, "file_preview", previews.PREVIEW_TYPE)
+
+
+@bp.route("/patient-history/<int:patient_id>")
+def patient_history(patient_id):
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to view a patient's history.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    doctor_id = session["user_id"]
+    before = request.args.get("before", type=int)
+
+    connection = db_router.reader()
+    cur = connection.cursor()
+    cur.execute(
+        """
+        SELECT first_name, last_name, specialty, profile_picture
+        FROM doctors_db
+        WHERE id = %s
+        """,
+        (doctor_id,),
+    )
+    doctor = cur.fetchone()
+
+    if not doctor:
+        cur.close()
+        flash("Doctor details could not be retrieved.", "danger")
+        return redirect(url_for("auth.signin"))
+
+    # One page of history, addressed by the last audit id seen
+    entries, next_cursor = fetch_history(
+        cur, patient_id, doctor_id, before=before, limit=HISTORY_PAGE_SIZE
+    )
+    cur.close()
+
+    # Entries still waiting for the background writer belong on the first page
+    if before is None:
+        entries = [
+            entry
+            for entry in audit_log.pending_for(patient_id)
+            if entry["doctor_id"] == doctor_id
+        ] + entries
+
+    return render_template(
+        "patient-history.html",
+        patient_id=patient_id,
+        entries=entries,
+        next_cursor=next_cursor,
+        doctor_first_name=doctor["first_name"],
+        doctor_last_name=doctor["last_name"],
+        doctor_specialty=doctor["specialty"],
+        doctor_avatar=doctor["profile_picture"],
+    )
+
+
+@bp.route("/cohort-analytics")
+def cohort_analytics():
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    # NumPy is only loaded once analytics are first requested
+    import analytics
+
+    # Tuple rows feed straight into NumPy without building a dict per patient
+    cur = shard_router.reader(session["user_id"]).cursor(Cursor)
+    try:
+        cohort = analytics.load_cohort(cur, session["user_id"])
+    finally:
+        cur.close()
+
+    return analytics.summarize(cohort)
+
+
+@bp.route("/terms/autocomplete")
+def autocomplete_terms():
+    if "logged_in" not in session or not session["logged_in"]:
+        return {"error": "Not logged in"}, 401
+
+    kind = request.args.get("kind")
+    if kind not in conditions.KINDS:
+        return {"error": f"kind must be one of {', '.join(conditions.KINDS)}"}, 400
+
+    prefix = request.args.get("q", "")
+    suggestions = (
+        term_index.complete(session["user_id"], kind, prefix) if prefix else []
+    )
+    return {"suggestions": suggestions}
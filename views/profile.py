@@ -0,0 +1,346 @@
+"""The dashboard and the signed-in doctor's own profile."""
+
+import functools
+
+import pymysql
+from flask import (
+    Blueprint,
+    abort,
+    flash,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import avatars
+import stats
+from extensions import db_router, mysql, page_cache, shard_router, shared_read
+from views.forms import changed_fields, describe_fields, update_changed_columns
+from views.responses import versioned
+
+bp = Blueprint("profile", __name__)
+
+# Editable columns, in form order. Only columns listed here can end up in a
+# generated UPDATE statement.
+DOCTOR_EDITABLE_FIELDS = (
+    "first_name",
+    "last_name",
+    "birth_date",
+    "gender",
+    "email_address",
+    "phone_number",
+    "work_address",
+    "specialty",
+    "nationality",
+    "license_number",
+)
+
+# Columns of the page headers, and where the signed-in doctor's are kept
+HEADER_FIELDS = ("first_name", "last_name", "specialty", "profile_picture")
+HEADER_KEY = "doctor_header"
+
+
+def read_doctor(doctor_id, fresh=False):
+    """Header columns of a doctor, read from a replica, or with `fresh`
+    from the primary.
+
+    Touches nothing of the request, so concurrent requests can share it.
+    """
+    connection = db_router.primary() if fresh else db_router.reader()
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT id, {", ".join(HEADER_FIELDS)}
+            FROM doctors_db WHERE id = %s
+            """,
+            (doctor_id,),
+        )
+        return cur.fetchone()
+    finally:
+        cur.close()
+
+
+def load_doctor(doctor_id, fresh=False, shared=False):
+    """Name, specialty and avatar version of a doctor, for page headers.
+
+    The signed-in doctor's header is kept in their session, and served from
+    there while the database cannot be reached, so pages that need nothing
+    else still render. With `fresh`, read from the primary, never a replica.
+    With `shared`, concurrent identical reads share one query; the session
+    is still read and written by each request.
+    """
+    try:
+        if shared:
+            doctor = shared_read(
+                ("doctor-header", fresh),
+                doctor_id,
+                functools.partial(read_doctor, doctor_id, fresh),
+            )
+        else:
+            doctor = read_doctor(doctor_id, fresh)
+    except pymysql.err.OperationalError:
+        header = session.get(HEADER_KEY)
+        if header and header["id"] == doctor_id:
+            return header
+        raise
+    if doctor and doctor_id == session.get("user_id"):
+        header = {"id": doctor_id, **{field: doctor[field] for field in HEADER_FIELDS}}
+        if session.get(HEADER_KEY) != header:
+            session[HEADER_KEY] = header
+    return doctor
+
+
+def load_summary(doctor_id):
+    cur = shard_router.reader(doctor_id).cursor()
+    try:
+        return stats.load_summary(cur, doctor_id)
+    finally:
+        cur.close()
+
+
+@bp.route("/dashboard")
+def dashboard():
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to access the dashboard.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    user_id = session["user_id"]
+
+    # Concurrent dashboards of the same doctor (a shared screen and its
+    # staff) share one query each
+    doctor = load_doctor(user_id, shared=True)
+
+    # Check if doctor data is retrieved successfully
+    if not doctor:
+        flash("User not found.", "danger")
+        return redirect(url_for("auth.signin"))
+
+    # Caseload statistics are pre-aggregated, so this reads a few rows only.
+    # They live on the doctor's shard with the patients. While the database
+    # cannot be reached the page still renders, without them.
+    read_only = {}
+    try:
+        summary = shared_read("summary", user_id, lambda: load_summary(user_id))
+    except pymysql.err.OperationalError:
+        summary = stats.summarize({})
+        read_only = {"database_read_only": True}
+
+    # The service worker must not show the flash messages, or the empty
+    # statistics, again later
+    no_store = session.get("_flashes") or read_only
+    headers = {"Cache-Control": "no-store"} if no_store else {}
+
+    # Render the dashboard template with the doctor's data
+    page = render_template(
+        "dashboard.html",
+        doctor_first_name=doctor["first_name"],
+        doctor_last_name=doctor["last_name"],
+        doctor_specialty=doctor["specialty"],
+        doctor_avatar=doctor["profile_picture"],
+        summary=summary,
+        **read_only,
+    )
+    return page, headers
+
+
+@bp.route("/my-profile", methods=["GET", "POST"])
+def my_profile():
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to access your profile.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    user_id = session["user_id"]
+
+    if request.method == "POST":
+        # Get updated form data from the request
+        submitted = {
+            column: request.form.get(column) for column in DOCTOR_EDITABLE_FIELDS
+        }
+
+        # Only write the columns that actually changed
+        try:
+            cur = mysql.connection.cursor()
+            cur.execute(
+                f"""
+                SELECT {", ".join(DOCTOR_EDITABLE_FIELDS)}
+                FROM doctors_db WHERE id = %s
+                """,
+                (user_id,),
+            )
+            stored = cur.fetchone()
+            if not stored:
+                flash("User profile not found.", "danger")
+                return redirect(url_for("profile.dashboard"))
+
+            changes = changed_fields(stored, submitted)
+            if not changes:
+                flash("No changes to save.", "info")
+                return redirect(url_for("profile.my_profile"))
+
+            update_changed_columns(cur, "doctors_db", changes, {"id": user_id})
+            mysql.connection.commit()
+            # The patient list pages show the doctor's name and specialty
+            page_cache.bump(user_id)
+            db_router.pin()
+        except Exception:
+            mysql.connection.rollback()
+            raise
+        finally:
+            cur.close()
+
+        # Display a success message listing the changed fields
+        flash(
+            f"Profile updated successfully! Changed: {describe_fields(changes)}.",
+            "success",
+        )
+        return redirect(url_for("profile.my_profile"))
+
+    # Query the database to fetch the user's current profile data
+    connection = db_router.reader()
+    cur = connection.cursor()
+    cur.execute(
+        """
+        SELECT first_name, last_name, birth_date, gender, email_address, 
+               phone_number, work_address, specialty, nationality, license_number,
+               profile_picture
+        FROM doctors_db WHERE id = %s
+        """,
+        (user_id,),
+    )
+    user_profile = cur.fetchone()
+    cur.close()
+
+    if not user_profile:
+        flash("User profile not found.", "danger")
+        return redirect(url_for("profile.dashboard"))
+
+    # Render the my-profile page with user profile data
+    return render_template("my-profile.html", user_profile=user_profile)
+
+
+@bp.route("/my-profile/avatar", methods=["POST"])
+def upload_avatar():
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to change your picture.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    user_id = session["user_id"]
+
+    # Resized and encoded here, once, rather than on every page view
+    if request.form.get("remove"):
+        variants = None
+    else:
+        upload = request.files.get("avatar")
+        if not upload or not upload.filename:
+            flash("Please choose a picture to upload.", "warning")
+            return redirect(url_for("profile.my_profile"))
+        try:
+            variants = avatars.make_variants(upload.read())
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("profile.my_profile"))
+
+    cur = mysql.connection.cursor()
+    try:
+        if variants:
+            avatars.save(cur, user_id, variants)
+        else:
+            avatars.remove(cur, user_id)
+        mysql.connection.commit()
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
+    # Cached patient list pages embed the header picture
+    page_cache.bump(user_id)
+    db_router.pin()
+
+    flash(
+        "Profile picture updated." if variants else "Profile picture removed.",
+        "success",
+    )
+    return redirect(url_for("profile.my_profile"))
+
+
+@bp.route("/avatar/<variant>")
+def avatar(variant):
+    """The signed-in doctor's picture in one of :data:`avatars.VARIANTS`"""
+    if "logged_in" not in session or not session["logged_in"]:
+        abort(401)
+    if variant not in avatars.VARIANTS:
+        abort(404)
+
+    cur = db_router.reader().cursor()
+    try:
+        stored = avatars.load(cur, session["user_id"], variant)
+    finally:
+        cur.close()
+    if not stored:
+        abort(404)
+
+    image, version = stored
+    response = make_response(image)
+    response.mimetype = "image/webp"
+    return versioned(response, version)
+
+
+@bp.route("/update-password", methods=["POST"])
+def update_password():
+    if "logged_in" not in session or not session["logged_in"]:
+        flash("Please log in to update your password.", "warning")
+        return redirect(url_for("auth.signin"))
+
+    # Fetch the logged-in user's ID
+    user_id = session["user_id"]
+
+    # Retrieve form data
+    old_password = request.form.get("old_password")
+    new_password = request.form.get("new_password")
+    confirm_password = request.form.get("confirm_password")
+
+    # Check if new password and confirm password match
+    if new_password != confirm_password:
+        flash("New password and confirm password do not match.", "danger")
+        return redirect(url_for("profile.my_profile"))
+
+    try:
+        # Fetch user's current password hash from the database
+        connection = mysql.connect
+        cur = connection.cursor()
+        cur.execute("SELECT password FROM doctors_db WHERE id = %s", (user_id,))
+        user = cur.fetchone()
+        cur.close()
+
+        if not user:
+            flash("User not found.", "danger")
+            return redirect(url_for("auth.signin"))
+
+        # Verify the old password
+        if not check_password_hash(user["password"], old_password):
+            return {"error": "Incorrect old password"}, 400
+
+        # Hash the new password
+        hashed_password = generate_password_hash(new_password)
+
+        # Update the password in the database
+        cur = mysql.connection.cursor()
+        cur.execute(
+            "UPDATE doctors_db SET password = %s WHERE id = %s",
+            (hashed_password, user_id),
+        )
+        mysql.connection.commit()
+        cur.close()
+        db_router.pin()
+
+        flash("Password updated successfully!", "success")
+        return redirect(url_for("profile.my_profile"))
+
+    except Exception as e:
+        flash(f"An error occurred: {e}", "danger")
+        return redirect(url_for("profile.my_profile"))
@@ -0,0 +1,25 @@
+"""Helpers shared by the views that send stored files and images."""
+
+from flask import request
+
+# These URLs carry the content's digest, so a cached copy can never be
+# stale and browsers may keep it for a year without asking again
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def versioned(response, version):
+    """Cache headers for content addressed by ``?v=<version>``.
+
+    Revalidated by version, and cached for good when requested under the
+    URL of the current version. Only the signed-in doctor may see these
+    responses, so never in shared caches.
+    """
+    response.cache_control.private = True
+    if version:
+        response.set_etag(version)
+        if request.args.get("v") == version:
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+    return response.make_conditional(request)
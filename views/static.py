@@ -0,0 +1,67 @@
+"""The static homepage from ``frontend/`` and the service worker."""
+
+import logging
+import os
+
+import pymysql
+from flask import (
+    Blueprint,
+    current_app,
+    render_template,
+    send_file,
+    send_from_directory,
+)
+from werkzeug.utils import safe_join
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("static", __name__)
+
+FRONTEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend"
+)
+# Written by ``flask build-assets``: the homepage with its critical CSS
+# inline and the purged stylesheet it loads
+FRONTEND_DIST_DIR = os.path.join(FRONTEND_DIR, "dist")
+
+
+@bp.route("/")
+def serve_index():
+    """Serve the index.html file as the root page, the built one if any"""
+    built = os.path.join(FRONTEND_DIST_DIR, "index.html")
+    if os.path.isfile(built):
+        return send_file(built)
+    return send_file(os.path.join(FRONTEND_DIR, "index.html"))
+
+
+@bp.route("/<path:filename>")
+def serve_static(filename):
+    """Serve static files from the frontend directory, built files first"""
+    built = safe_join(FRONTEND_DIST_DIR, filename)
+    if built is not None and os.path.isfile(built):
+        return send_from_directory(FRONTEND_DIST_DIR, filename)
+    return send_from_directory(FRONTEND_DIR, filename)
+
+
+@bp.route("/sw.js")
+def service_worker():
+    # Served from the root so the worker's scope covers every page
+    return current_app.response_class(
+        current_app.extensions["assets"].service_worker(),
+        mimetype="application/javascript",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@bp.app_errorhandler(404)
+def page_not_found(e):
+    return render_template("404.html"), 404
+
+
+@bp.app_errorhandler(pymysql.err.OperationalError)
+def database_unavailable(e):
+    # A stalled or unreachable database, or its circuit open: the request
+    # can be retried once it recovers, so it is not a server error
+    logger.warning("Database unavailable for this request: %s", e)
+    retry_after = current_app.config["DB_BREAKER_RESET_SECONDS"]
+    return render_template("503.html"), 503, {"Retry-After": str(retry_after)}